@@ -5,20 +5,56 @@ from hat.json.data import (Array,
                            Data,
                            equals,
                            clone,
-                           flatten)
+                           flatten,
+                           fingerprint,
+                           intern,
+                           Interner,
+                           Table,
+                           TableRow,
+                           cow_clone,
+                           materialize,
+                           CowObject,
+                           CowArray,
+                           Stats,
+                           stats)
 from hat.json.path import (Path,
                            get,
                            set_,
                            remove,
+                           set_many,
+                           remove_many,
+                           compile_path,
+                           CompiledPath,
+                           create_selector,
+                           MemoizedSelector,
                            Storage)
+from hat.json.query import (QuerySelector,
+                            Predicate,
+                            QuerySegment,
+                            Query,
+                            compile_query,
+                            CompiledQuery)
 from hat.json.encoder import (Format,
+                              EventType,
+                              Event,
+                              JsonBackend,
+                              PyJsonBackend,
+                              RsJsonBackend,
+                              DefaultJsonBackend,
                               encode,
                               decode,
+                              encode_bytes,
+                              decode_bytes,
                               get_file_format,
                               encode_file,
                               decode_file,
                               encode_stream,
                               decode_stream,
+                              encode_iter,
+                              decode_iter,
+                              decode_iter_parallel,
+                              iter_events,
+                              iter_items,
                               read_conf)
 from hat.json.patch import (diff,
                             patch)
@@ -41,19 +77,55 @@ __all__ = ['Array',
            'equals',
            'clone',
            'flatten',
+           'fingerprint',
+           'intern',
+           'Interner',
+           'Table',
+           'TableRow',
+           'cow_clone',
+           'materialize',
+           'CowObject',
+           'CowArray',
+           'Stats',
+           'stats',
            'Path',
            'get',
            'set_',
            'remove',
+           'set_many',
+           'remove_many',
+           'compile_path',
+           'CompiledPath',
+           'create_selector',
+           'MemoizedSelector',
            'Storage',
+           'QuerySelector',
+           'Predicate',
+           'QuerySegment',
+           'Query',
+           'compile_query',
+           'CompiledQuery',
            'Format',
+           'EventType',
+           'Event',
+           'JsonBackend',
+           'PyJsonBackend',
+           'RsJsonBackend',
+           'DefaultJsonBackend',
            'encode',
            'decode',
+           'encode_bytes',
+           'decode_bytes',
            'get_file_format',
            'encode_file',
            'decode_file',
            'encode_stream',
            'decode_stream',
+           'encode_iter',
+           'decode_iter',
+           'decode_iter_parallel',
+           'iter_events',
+           'iter_items',
            'read_conf',
            'diff',
            'patch',
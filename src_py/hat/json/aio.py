@@ -0,0 +1,239 @@
+"""Asyncio JSON data storage"""
+
+from collections.abc import AsyncIterator
+import asyncio
+import collections
+
+from hat.json.data import Data
+from hat.json.path import Path, Storage
+
+
+class SubscriptionClosedError(Exception):
+    """Subscription closed error"""
+
+
+class AsyncStorage:
+    """Asyncio JSON data storage
+
+    Observable JSON data state where changes are delivered to subscribers
+    through awaitable per-subscriber queues (instead of synchronous
+    callbacks). Writers are not blocked by subscribers processing changes,
+    except when queue of non coalescing subscriber is full (back-pressure).
+
+    Example::
+
+        storage = AsyncStorage({'a': 1})
+        subscription = storage.subscribe('a')
+
+        await storage.set('a', 2)
+        await storage.set('b', 3)
+
+        assert await subscription.get() == 2
+        assert subscription.empty
+
+    """
+
+    def __init__(self, data: Data = None):
+        self._storage = Storage(data)
+        self._full_subscriptions = set()
+
+    @property
+    def data(self) -> Data:
+        """Data"""
+        return self._storage.data
+
+    def get(self, path: Path, default: Data | None = None) -> Data:
+        """Get data"""
+        return self._storage.get(path, default)
+
+    async def set(self, path: Path, value: Data):
+        """Set data
+
+        If queue of any non coalescing subscription is full, this coroutine
+        waits until queue has free space before data is changed.
+
+        """
+        await self._wait_subscriptions()
+        self._storage.set(path, value)
+
+    async def remove(self, path: Path):
+        """Remove data
+
+        If queue of any non coalescing subscription is full, this coroutine
+        waits until queue has free space before data is changed.
+
+        """
+        await self._wait_subscriptions()
+        self._storage.remove(path)
+
+    def subscribe(self,
+                  path: Path = [],
+                  *,
+                  queue_size: int = 1024,
+                  coalesce: bool = False,
+                  debounce: float | None = None
+                  ) -> 'Subscription':
+        """Create new subscription
+
+        Subscription receives data referenced by `path` each time referenced
+        data changes (see `Storage.register_change_cb`).
+
+        If `coalesce` is ``True``, only latest unread data is kept. If
+        `debounce` is set, only latest data is delivered after there were no
+        changes for `debounce` seconds (implies coalescing). Coalescing
+        subscriptions never block writers.
+
+        Non coalescing subscription queues up to `queue_size` changes. When
+        queue is full, writers wait until subscriber reads queued data.
+
+        """
+        if queue_size < 1:
+            raise ValueError('invalid queue size')
+
+        if debounce is not None and debounce < 0:
+            raise ValueError('invalid debounce')
+
+        return Subscription(self, path, queue_size, coalesce, debounce)
+
+    async def _wait_subscriptions(self):
+        while self._full_subscriptions:
+            subscription = next(iter(self._full_subscriptions))
+            await subscription._not_full.wait()
+
+
+class Subscription:
+    """Storage subscription
+
+    Instances should be created with `AsyncStorage.subscribe`.
+
+    """
+
+    def __init__(self,
+                 storage: AsyncStorage,
+                 path: Path,
+                 queue_size: int,
+                 coalesce: bool,
+                 debounce: float | None):
+        self._full_subscriptions = storage._full_subscriptions
+        self._queue_size = queue_size
+        self._coalesce = coalesce or debounce is not None
+        self._debounce = debounce
+        self._loop = asyncio.get_running_loop()
+        self._queue = collections.deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+        self._debounce_data = None
+        self._debounce_timer = None
+        self._handle = storage._storage.register_change_cb(self._on_change,
+                                                           path)
+
+    @property
+    def is_closed(self) -> bool:
+        """Is subscription closed"""
+        return self._closed
+
+    @property
+    def empty(self) -> bool:
+        """Is queue empty"""
+        return not self._queue
+
+    def close(self):
+        """Close subscription
+
+        Data queued before closing is still available.
+
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._handle.cancel()
+
+        if self._debounce_timer:
+            self._debounce_timer.cancel()
+            self._debounce_timer = None
+
+        self._full_subscriptions.discard(self)
+        self._not_full.set()
+        self._not_empty.set()
+
+    def get_nowait(self) -> Data:
+        """Get queued data without waiting
+
+        Raises:
+            asyncio.QueueEmpty
+            SubscriptionClosedError
+
+        """
+        if not self._queue:
+            if self._closed:
+                raise SubscriptionClosedError()
+
+            raise asyncio.QueueEmpty()
+
+        data = self._queue.popleft()
+
+        if not self._queue:
+            self._not_empty.clear()
+
+        if self._not_full.is_set() or len(self._queue) >= self._queue_size:
+            return data
+
+        self._full_subscriptions.discard(self)
+        self._not_full.set()
+        return data
+
+    async def get(self) -> Data:
+        """Wait for and get queued data
+
+        Raises:
+            SubscriptionClosedError
+
+        """
+        while not self._queue and not self._closed:
+            await self._not_empty.wait()
+
+        return self.get_nowait()
+
+    def __aiter__(self) -> AsyncIterator[Data]:
+        return self
+
+    async def __anext__(self) -> Data:
+        try:
+            return await self.get()
+
+        except SubscriptionClosedError:
+            raise StopAsyncIteration
+
+    def _on_change(self, data):
+        if self._debounce is not None:
+            self._debounce_data = data
+
+            if self._debounce_timer:
+                self._debounce_timer.cancel()
+
+            self._debounce_timer = self._loop.call_later(self._debounce,
+                                                         self._on_debounce)
+            return
+
+        if self._coalesce:
+            self._queue.clear()
+
+        self._queue.append(data)
+        self._not_empty.set()
+
+        if self._coalesce or len(self._queue) < self._queue_size:
+            return
+
+        self._full_subscriptions.add(self)
+        self._not_full.clear()
+
+    def _on_debounce(self):
+        data, self._debounce_data = self._debounce_data, None
+        self._debounce_timer = None
+
+        self._queue.clear()
+        self._queue.append(data)
+        self._not_empty.set()
@@ -1,10 +1,13 @@
 from pathlib import Path
 import argparse
+import contextlib
 import sys
 
+from hat.json.data import stats
 from hat.json.encoder import (Format,
                               decode_file, decode_stream,
-                              encode_file, encode_stream)
+                              encode_file, encode_stream,
+                              decode_iter, get_file_format)
 
 
 def create_argument_parser() -> argparse.ArgumentParser:
@@ -14,10 +17,13 @@ def create_argument_parser() -> argparse.ArgumentParser:
         help="output path or '-' for stdout (default '-')")
     parser.add_argument(
         '--in-format', metavar='FORMAT', type=Format, default=None,
-        help="input format 'json', 'yaml' or 'toml'")
+        help="input format 'json', 'yaml', 'toml' or 'jsonl'")
     parser.add_argument(
         '--out-format', metavar='FORMAT', type=Format, default=None,
-        help="output format 'json', 'yaml' or 'toml'")
+        help="output format 'json', 'yaml', 'toml' or 'jsonl'")
+    parser.add_argument(
+        '--stats', action='store_true',
+        help="output input data statistics instead of input data")
     parser.add_argument(
         'input', metavar='PATH', type=Path, default=Path('-'), nargs='?',
         help="input path or '-' for stdin (default '-')")
@@ -28,26 +34,49 @@ def main():
     parser = create_argument_parser()
     args = parser.parse_args()
 
-    if args.input == Path('-'):
-        in_format = args.in_format or Format.JSON
-        data = decode_stream(sys.stdin, in_format)
+    in_format = args.in_format or (Format.JSON if args.input == Path('-')
+                                   else get_file_format(args.input))
+    out_format = args.out_format or (Format.JSON if args.output == Path('-')
+                                     else get_file_format(args.output))
 
-    else:
-        data = decode_file(args.input, args.in_format)
+    with contextlib.ExitStack() as exit_stack:
+        if args.input == Path('-'):
+            input_stream = sys.stdin
 
-    if args.output == Path('-'):
-        out_format = args.out_format or Format.JSON
+        elif in_format == Format.JSONL:
+            input_stream = exit_stack.enter_context(
+                open(args.input, 'r', encoding='utf-8'))
 
-        if out_format == Format.TOML:
-            stdout, sys.stdout = sys.stdout.detach(), None
+        else:
+            input_stream = None
+
+        # JSON Lines records are converted one at a time
+        if (in_format == Format.JSONL and out_format == Format.JSONL and
+                not args.stats):
+            data = decode_iter(input_stream)
+
+        elif input_stream:
+            data = decode_stream(input_stream, in_format)
 
         else:
-            stdout = sys.stdout
+            data = decode_file(args.input, in_format)
 
-        encode_stream(data, stdout, out_format)
+        if args.stats:
+            data = stats(data)._asdict()
 
-    else:
-        encode_file(data, args.output, args.out_format)
+            # JSON Lines output contains statistics as single line
+            if out_format == Format.JSONL:
+                data = [data]
+
+        if args.output != Path('-'):
+            encode_file(data, args.output, out_format)
+
+        elif out_format == Format.TOML:
+            stdout, sys.stdout = sys.stdout.detach(), None
+            encode_stream(data, stdout, out_format)
+
+        else:
+            encode_stream(data, sys.stdout, out_format)
 
 
 if __name__ == '__main__':
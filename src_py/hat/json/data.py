@@ -1,6 +1,16 @@
 """JSON Data structures"""
 
-from collections.abc import Iterable
+from collections.abc import (Iterable,
+                             Iterator,
+                             Mapping,
+                             MutableMapping,
+                             MutableSequence,
+                             Sequence)
+import array
+import hashlib
+import itertools
+import operator
+import sys
 import typing
 
 
@@ -24,6 +34,9 @@ def equals(a: Data,
     different from default equality comparison, which considers `False`
     equal to `0` and `0.0`; and `True` equal to `1` and `1.0`.
 
+    Comparison is iterative (nesting depth is not limited by recursion limit)
+    and skips traversal of containers which are the same instance.
+
     Example::
 
         assert equals(0, 0.0) is True
@@ -31,38 +44,64 @@ def equals(a: Data,
         assert equals(1, True) is False
 
     """
-    if a is None:
-        return b is None
+    kinds = _kinds
+    a_kind = kinds.get(a.__class__) or _get_kind(a)
+    if a_kind is None:
+        raise TypeError('invalid json type')
+
+    b_kind = kinds.get(b.__class__) or _get_kind(b)
+    if a_kind != b_kind:
+        return False
+
+    if a_kind < _ARRAY:
+        return a == b
+
+    stack = [(a_kind, a, b)]
+    while stack:
+        kind, a, b = stack.pop()
+
+        if a is b:
+            continue
 
-    if isinstance(a, bool):
-        return isinstance(b, bool) and a == b
+        if len(a) != len(b):
+            return False
 
-    if isinstance(a, (int, float)):
-        return (isinstance(b, (int, float)) and
-                not isinstance(b, bool) and
-                a == b)
+        if kind == _ARRAY:
+            pairs = zip(a, b)
 
-    if isinstance(a, str):
-        return isinstance(b, str) and a == b
+        else:
+            pairs = []
+            for key, i in a.items():
+                j = b.get(key, _missing)
+                if j is _missing:
+                    return False
+                pairs.append((i, j))
 
-    if isinstance(a, list):
-        return (isinstance(b, list) and
-                len(a) == len(b) and
-                all(equals(i, j) for i, j in zip(a, b)))
+        for i, j in pairs:
+            i_kind = kinds.get(i.__class__) or _get_kind(i)
+            if i_kind is None:
+                raise TypeError('invalid json type')
 
-    if isinstance(a, dict):
-        return (isinstance(b, dict) and
-                len(a) == len(b) and
-                all(equals(a[key], b[key]) for key in a.keys()))
+            j_kind = kinds.get(j.__class__) or _get_kind(j)
+            if i_kind != j_kind:
+                return False
 
-    raise TypeError('invalid json type')
+            if i_kind < _ARRAY:
+                if i != j:
+                    return False
+
+            elif i is not j:
+                stack.append((i_kind, i, j))
+
+    return True
 
 
 def clone(data: Data) -> Data:
     """Deep clone data
 
-    This function recursively creates new instances of array and object data
-    based on input data. Resulting json data is equal to provided data.
+    This function creates new instances of array and object data based on
+    input data. Resulting json data is equal to provided data. Cloning is
+    iterative so nesting depth is not limited by recursion limit.
 
     Example::
 
@@ -73,13 +112,54 @@ def clone(data: Data) -> Data:
         assert equals(x, y)
 
     """
-    if isinstance(data, list):
-        return [clone(i) for i in data]
+    kinds = _kinds
+    kind = kinds.get(data.__class__) or _get_kind(data)
+    if kind == _ARRAY:
+        result = []
 
-    if isinstance(data, dict):
-        return {k: clone(v) for k, v in data.items()}
+    elif kind == _OBJECT:
+        result = {}
 
-    return data
+    else:
+        return data
+
+    stack = [(kind, data, result)]
+    while stack:
+        kind, src, dst = stack.pop()
+
+        if kind == _ARRAY:
+            for i in src:
+                i_kind = kinds.get(i.__class__) or _get_kind(i)
+                if i_kind == _ARRAY:
+                    i_dst = []
+                    stack.append((i_kind, i, i_dst))
+
+                elif i_kind == _OBJECT:
+                    i_dst = {}
+                    stack.append((i_kind, i, i_dst))
+
+                else:
+                    i_dst = i
+
+                dst.append(i_dst)
+
+        else:
+            for key, i in src.items():
+                i_kind = kinds.get(i.__class__) or _get_kind(i)
+                if i_kind == _ARRAY:
+                    i_dst = []
+                    stack.append((i_kind, i, i_dst))
+
+                elif i_kind == _OBJECT:
+                    i_dst = {}
+                    stack.append((i_kind, i, i_dst))
+
+                else:
+                    i_dst = i
+
+                dst[key] = i_dst
+
+    return result
 
 
 def flatten(data: Data) -> Iterable[Data]:
@@ -96,9 +176,861 @@ def flatten(data: Data) -> Iterable[Data]:
         assert list(flatten(data)) == result
 
     """
-    if isinstance(data, list):
-        for i in data:
-            yield from flatten(i)
+    kinds = _kinds
+    if (kinds.get(data.__class__) or _get_kind(data)) != _ARRAY:
+        yield data
+        return
+
+    stack = [iter(data)]
+    while stack:
+        for i in stack[-1]:
+            if (kinds.get(i.__class__) or _get_kind(i)) == _ARRAY:
+                stack.append(iter(i))
+                break
+
+            yield i
+
+        else:
+            stack.pop()
+
+
+def fingerprint(data: Data,
+                cache: dict[int, tuple[Data, bytes]] | None = None
+                ) -> bytes:
+    """Structural content hash
+
+    Resulting fingerprint is stable between processes and consistent with
+    `equals` - equal data always have the same fingerprint (integer and
+    floating point numbers with the same value are considered equal, `bool`
+    values are not equal to numbers and order of object keys is not
+    significant). Different data have different fingerprints with
+    overwhelming probability.
+
+    If `cache` is provided, it is used for storing and retrieving
+    fingerprints of arrays and objects based on their identity. Cache is
+    valid only while cached data is not modified. Same cache can be used
+    with multiple calls, enabling reuse of fingerprints for subtrees shared
+    between different data.
+
+    Example::
+
+        assert fingerprint({'a': 0, 'b': 1}) == fingerprint({'b': 1, 'a': 0.0})
+        assert fingerprint(1) != fingerprint(True)
+
+    """
+    kinds = _kinds
+    kind = kinds.get(data.__class__) or _get_kind(data)
+    if kind is None:
+        raise TypeError('invalid json type')
+
+    if kind < _ARRAY:
+        return hashlib.blake2b(_encode_scalar(kind, data),
+                               digest_size=_fingerprint_size).digest()
+
+    memo = {}
+    stack = [(kind, data, None, None)]
+    while stack:
+        kind, node, keys, values = stack[-1]
+        node_id = id(node)
+
+        if values is None:
+            entry = memo.get(node_id)
+            if entry is None and cache is not None:
+                entry = cache.get(node_id)
+
+            if entry is not None and entry[0] is node:
+                memo[node_id] = entry
+                stack.pop()
+                continue
+
+            if kind == _ARRAY:
+                values = list(node)
+
+            else:
+                keys = sorted(node)
+                values = [node[key] for key in keys]
+
+            stack[-1] = kind, node, keys, values
+
+            for child in values:
+                child_kind = kinds.get(child.__class__) or _get_kind(child)
+                if child_kind is None:
+                    raise TypeError('invalid json type')
+
+                if child_kind > _STRING:
+                    stack.append((child_kind, child, None, None))
+
+            continue
+
+        stack.pop()
+
+        if kind == _ARRAY:
+            h = hashlib.blake2b(b'[', digest_size=_fingerprint_size)
+            for i in values:
+                h.update(_encode_item(i, memo))
+
+        else:
+            h = hashlib.blake2b(b'{', digest_size=_fingerprint_size)
+            for key, i in zip(keys, values):
+                h.update(_encode_scalar(_STRING, key))
+                h.update(_encode_item(i, memo))
+
+        entry = node, h.digest()
+        memo[node_id] = entry
+
+        if cache is not None:
+            cache[node_id] = entry
+
+    return memo[id(data)][1]
+
+
+def intern(data: Data,
+           interner: typing.Optional['Interner'] = None
+           ) -> Data:
+    """Intern data
+
+    Resulting data is equal to input data, with equal subtrees replaced by
+    single shared instance. If `interner` is ``None``, new `Interner` is
+    used and only subtrees of provided data are shared.
+
+    Shared instances should not be modified.
+
+    Example::
+
+        x = {'a': [1, 2], 'b': [1, 2]}
+        y = intern(x)
+        assert equals(x, y)
+        assert y['a'] is y['b']
+
+    """
+    if interner is None:
+        interner = Interner()
+
+    return interner.intern(data)
+
+
+class Interner:
+    """JSON data interner
+
+    Interner keeps single instance of each distinct string, number, array and
+    object it interned. Interning of data replaces all subtrees with already
+    known instances.
+
+    Subtrees are considered equal only if they have same types, values and
+    object key order (unlike `equals`, interning doesn't change encoded
+    representation of data).
+
+    """
+
+    def __init__(self):
+        self._scalars = {}
+        self._containers = {}
+        self._saved_count = 0
+        self._saved_size = 0
+
+    @property
+    def count(self) -> int:
+        """Number of interned instances"""
+        return len(self._scalars) + len(self._containers)
+
+    @property
+    def saved_count(self) -> int:
+        """Number of instances replaced with interned instances"""
+        return self._saved_count
+
+    @property
+    def saved_size(self) -> int:
+        """Size of instances replaced with interned instances (in bytes)"""
+        return self._saved_size
+
+    def intern(self, data: Data) -> Data:
+        """Intern data"""
+        kinds = _kinds
+        kind = kinds.get(data.__class__) or _get_kind(data)
+        if kind is None:
+            raise TypeError('invalid json type')
+
+        memo = {}
+
+        if kind < _ARRAY:
+            return self._intern_scalar(kind, data, memo)[0]
+
+        stack = [(kind, data, None)]
+        while stack:
+            kind, node, items = stack.pop()
+            entry = memo.get(id(node))
+            if entry is not None and entry[0] is node:
+                continue
+
+            if items is None:
+                items = (list(node) if kind == _ARRAY
+                         else list(node.items()))
+                stack.append((kind, node, items))
+
+                for child in (items if kind == _ARRAY
+                              else (i for _, i in items)):
+                    child_kind = (kinds.get(child.__class__) or
+                                  _get_kind(child))
+                    if child_kind is None:
+                        raise TypeError('invalid json type')
+
+                    if child_kind > _STRING:
+                        stack.append((child_kind, child, None))
+
+                continue
+
+            if kind == _ARRAY:
+                h = hashlib.blake2b(b'[', digest_size=_fingerprint_size)
+                result = []
+
+                for i in items:
+                    i, i_key = self._intern_item(i, memo)
+                    h.update(i_key)
+                    result.append(i)
+
+                is_same = (node.__class__ is list and
+                           all(map(operator.is_, node, result)))
+
+            else:
+                h = hashlib.blake2b(b'{', digest_size=_fingerprint_size)
+                result = {}
+
+                for key, i in items:
+                    key, key_key = self._intern_scalar(_STRING, key, memo)
+                    i, i_key = self._intern_item(i, memo)
+                    h.update(key_key)
+                    h.update(i_key)
+                    result[key] = i
+
+                is_same = (node.__class__ is dict and
+                           all(map(operator.is_, node, result)) and
+                           all(map(operator.is_, node.values(),
+                                   result.values())))
+
+            digest = h.digest()
+            canonical = self._containers.get(digest)
+
+            if canonical is None:
+                canonical = node if is_same else result
+                self._containers[digest] = canonical
+
+            elif canonical is not node:
+                self._saved_count += 1
+                self._saved_size += sys.getsizeof(node)
+
+            memo[id(node)] = node, canonical, b'c' + digest
+
+        return memo[id(data)][1]
+
+    def _intern_item(self, data, memo):
+        kind = _kinds.get(data.__class__) or _get_kind(data)
+        if kind < _ARRAY:
+            return self._intern_scalar(kind, data, memo)
+
+        return memo[id(data)][1:]
+
+    def _intern_scalar(self, kind, data, memo):
+        if kind < _NUMBER:
+            return data, _encode_scalar(kind, data)
+
+        entry = memo.get(id(data))
+        if entry is not None and entry[0] is data:
+            return entry[1:]
+
+        key = _encode_scalar(kind, data, exact=True)
+        value = self._scalars.get(key)
+
+        if value is None:
+            value = data
+            self._scalars[key] = value
+
+        elif value is not data:
+            self._saved_count += 1
+            self._saved_size += sys.getsizeof(data)
+
+        memo[id(data)] = data, value, key
+        return value, key
+
+
+class Table(Sequence):
+    """Columnar JSON Array of JSON Objects
+
+    Table represents array of objects which all have the same keys. Values
+    are stored column-wise - columns containing only integer numbers (in
+    64bit signed range) or only floating point numbers are stored as
+    `array.array` instances; other columns are stored as lists.
+
+    Elements of table are read-only `TableRow` views. Order of keys in all
+    rows is the same as order of keys in first object used for table
+    creation.
+
+    Table is treated as JSON Array by all functions accepting `Data`.
+    Encoding of table to JSON format doesn't require creation of row
+    objects.
+
+    Example::
+
+        data = [{'id': 1, 'value': 1.5}, {'id': 2, 'value': 2.5}]
+        table = Table(data)
+        assert table.column('id') == array.array('q', [1, 2])
+        assert table[1]['value'] == 2.5
+        assert equals(table, data)
+        assert table.to_array() == data
+
+    """
+
+    def __init__(self, rows: Iterable[Object] = ()):
+        rows = list(rows)
+        keys = None
+
+        for row in rows:
+            if (_kinds.get(row.__class__) or _get_kind(row)) != _OBJECT:
+                raise ValueError('invalid row type')
+
+            if keys is None:
+                keys = list(row.keys())
+                key_set = set(keys)
+
+            if len(row) != len(keys) or not key_set.issuperset(row):
+                raise ValueError('rows have different keys')
+
+        self._len = len(rows)
+        self._columns = {key: _create_column([row[key] for row in rows])
+                         for key in (keys or [])}
+
+    @property
+    def keys(self) -> list[str]:
+        """Row keys"""
+        return list(self._columns.keys())
+
+    def column(self, key: str) -> Sequence[Data]:
+        """Get column values
+
+        Resulting sequence should not be modified.
+
+        """
+        return self._columns[key]
+
+    def to_array(self) -> Array:
+        """Create JSON Array"""
+        if not self._columns:
+            return [{} for _ in range(self._len)]
+
+        keys = list(self._columns.keys())
+        return [dict(zip(keys, values))
+                for values in zip(*self._columns.values())]
+
+    @typing.overload
+    def __getitem__(self, index: int) -> 'TableRow': ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> 'Table': ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            table = Table.__new__(Table)
+            table._len = len(range(*index.indices(self._len)))
+            table._columns = {key: column[index]
+                              for key, column in self._columns.items()}
+            return table
+
+        if index < 0:
+            index += self._len
+
+        if not 0 <= index < self._len:
+            raise IndexError('table index out of range')
+
+        return TableRow(self, index)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator['TableRow']:
+        for index in range(self._len):
+            yield TableRow(self, index)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if self is other:
+            return True
+
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+
+        return (len(self) == len(other) and
+                all(i == j for i, j in zip(self, other)))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'Table({self.to_array()!r})'
+
+
+class TableRow(Mapping):
+    """Read-only view of `Table` row"""
+
+    def __init__(self, table: Table, index: int):
+        self._columns = table._columns
+        self._index = index
+
+    def __getitem__(self, key: str) -> Data:
+        return self._columns[key][self._index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __repr__(self) -> str:
+        return f'TableRow({dict(self.items())!r})'
+
+
+def cow_clone(data: Data) -> Data:
+    """Lazy copy-on-write clone
+
+    Arrays and objects are wrapped with `CowArray` and `CowObject` proxies.
+    Underlying data is shallow copied only when proxy is modified for the
+    first time. Nested arrays and objects are wrapped with proxies when
+    accessed.
+
+    Underlying data should not be modified while proxy is used. Proxy can
+    be converted to data with `materialize`.
+
+    Example::
+
+        x = {'a': [1, 2], 'b': {'c': 3}}
+        y = cow_clone(x)
+        y['a'].append(3)
+        z = materialize(y)
+        assert x == {'a': [1, 2], 'b': {'c': 3}}
+        assert z == {'a': [1, 2, 3], 'b': {'c': 3}}
+        assert z['b'] is x['b']
+
+    """
+    kind = _kinds.get(data.__class__) or _get_kind(data)
+
+    if kind == _ARRAY:
+        return CowArray(data)
+
+    if kind == _OBJECT:
+        return CowObject(data)
+
+    return data
+
+
+def materialize(data: Data) -> Data:
+    """Convert copy-on-write proxies to data
+
+    Unmodified parts of underlying data are reused. Proxies contained in
+    built in arrays and objects are not converted.
+
+    """
+    if not isinstance(data, (CowArray, CowObject)):
+        return data
+
+    results = {}
+    stack = [(data, False)]
+    while stack:
+        proxy, expanded = stack.pop()
+        if id(proxy) in results:
+            continue
+
+        if not expanded:
+            stack.append((proxy, True))
+            stack.extend((i, False) for _, i in proxy._get_proxies())
+            continue
+
+        is_same = not proxy._owned
+        items = []
+
+        for key, i in proxy._get_proxies():
+            value = results[id(i)]
+            if value is not i._data:
+                is_same = False
+
+            items.append((key, value))
+
+        if is_same:
+            result = proxy._data
+
+        else:
+            result = (list(proxy._data) if isinstance(proxy, CowArray)
+                      else dict(proxy._data))
+            for key, value in items:
+                result[key] = value
+
+        results[id(proxy)] = result
+
+    return results[id(data)]
+
+
+class CowObject(MutableMapping):
+    """Copy-on-write JSON Object proxy"""
+
+    def __init__(self, data: Object):
+        self._data = data
+        self._owned = False
+        self._children = {}
+
+    def __getitem__(self, key: str) -> Data:
+        if not self._owned:
+            child = self._children.get(key)
+            if child is not None:
+                return child
+
+        value = self._data[key]
+        if isinstance(value, (CowArray, CowObject)):
+            return value
+
+        child = cow_clone(value)
+        if child is not value:
+            if self._owned:
+                self._data[key] = child
+
+            else:
+                self._children[key] = child
+
+        return child
+
+    def __setitem__(self, key: str, value: Data):
+        self._own()
+        self._data[key] = value
+
+    def __delitem__(self, key: str):
+        self._own()
+        del self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: typing.Any) -> bool:
+        return key in self._data
+
+    def __repr__(self) -> str:
+        return f'CowObject({dict(self.items())!r})'
+
+    def _own(self):
+        if self._owned:
+            return
+
+        self._data = dict(self._data)
+        self._data.update(self._children)
+        self._owned = True
+        self._children = None
+
+    def _get_proxies(self):
+        items = self._data.items() if self._owned else self._children.items()
+        return ((key, value) for key, value in items
+                if isinstance(value, (CowArray, CowObject)))
+
+
+class CowArray(MutableSequence):
+    """Copy-on-write JSON Array proxy"""
+
+    def __init__(self, data: Array):
+        self._data = data
+        self._owned = False
+        self._children = {}
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Data: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> Array: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._data)))]
+
+        if index < 0:
+            index += len(self._data)
+
+        if not 0 <= index < len(self._data):
+            raise IndexError('array index out of range')
+
+        if not self._owned:
+            child = self._children.get(index)
+            if child is not None:
+                return child
+
+        value = self._data[index]
+        if isinstance(value, (CowArray, CowObject)):
+            return value
+
+        child = cow_clone(value)
+        if child is not value:
+            if self._owned:
+                self._data[index] = child
+
+            else:
+                self._children[index] = child
+
+        return child
+
+    def __setitem__(self, index: int | slice, value: Data):
+        self._own()
+        self._data[index] = value
+
+    def __delitem__(self, index: int | slice):
+        self._own()
+        del self._data[index]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if self is other:
+            return True
+
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+
+        return (len(self) == len(other) and
+                all(i == j for i, j in zip(self, other)))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'CowArray({list(self)!r})'
+
+    def insert(self, index: int, value: Data):
+        self._own()
+        self._data.insert(index, value)
+
+    def _own(self):
+        if self._owned:
+            return
+
+        self._data = list(self._data)
+        for index, child in self._children.items():
+            self._data[index] = child
+
+        self._owned = True
+        self._children = None
+
+    def _get_proxies(self):
+        items = (enumerate(self._data) if self._owned
+                 else self._children.items())
+        return ((key, value) for key, value in items
+                if isinstance(value, (CowArray, CowObject)))
+
+
+class Stats(typing.NamedTuple):
+    """JSON data statistics"""
+
+    counts: dict[str, int]
+    """number of values per type ('null', 'boolean', 'number', 'string',
+    'array' and 'object')"""
+    max_depth: int
+    """maximum number of nested arrays and objects"""
+    max_width: int
+    """maximum number of array or object elements"""
+    string_size: int
+    """UTF-8 encoded size of strings (including object keys)"""
+    size: int
+    """sum of `sys.getsizeof` sizes"""
+
+
+def stats(data: Data) -> Stats:
+    """Calculate data statistics
+
+    Arrays and objects referenced multiple times are analyzed and counted
+    only once. Counts of other values are based on number of elements in
+    analyzed arrays and objects, while sizes are calculated once for each
+    instance (strings and numbers shared between multiple elements are
+    included only once). Maximum depth takes into account all occurrences
+    of shared arrays and objects.
+
+    Example::
+
+        x = [1, 'abc']
+        result = stats({'a': x, 'b': x})
+        assert result.counts['object'] == 1
+        assert result.counts['array'] == 1
+        assert result.counts['number'] == 1
+        assert result.max_depth == 2
+        assert result.max_width == 2
+        assert result.string_size == 5
+
+    """
+    kinds = _kinds
+    counts = [0] * (len(_kind_names) + 1)
+    max_width = 0
+    string_size = 0
+    size = 0
+    visited = {}
+
+    # depth of each array and object is calculated bottom-up (once all
+    # children are analyzed) so that shared subtrees are analyzed once
+    depths = {}
+
+    stack = [(data, None)]
+    while stack:
+        node, children = stack.pop()
+        if children is not None:
+            depths[id(node)] = 1 + max(map(depths.get, map(id, children),
+                                           itertools.repeat(0)),
+                                       default=0)
+            continue
+
+        kind = kinds.get(node.__class__) or _get_kind(node)
+        if kind is None:
+            raise TypeError('invalid json type')
+
+        if kind < _ARRAY:
+            counts[kind] += 1
+
+        if id(node) in visited:
+            continue
+
+        if kind > _STRING:
+            counts[kind] += 1
+
+        visited[id(node)] = node
+        size += sys.getsizeof(node)
+
+        if kind == _STRING:
+            string_size += len(node.encode('utf-8', 'surrogatepass'))
+
+        if kind < _ARRAY:
+            continue
+
+        max_width = max(max_width, len(node))
+
+        # children of containers other than builtin containers (e.g. table
+        # rows) can be created on each access
+        if kind == _ARRAY:
+            children = node if node.__class__ is list else list(node)
+            stack.append((node, children))
+            stack.extend(zip(children, itertools.repeat(None)))
+            continue
+
+        children = (node.values() if node.__class__ is dict
+                    else list(node.values()))
+        stack.append((node, children))
+        stack.extend(zip(children, itertools.repeat(None)))
+
+        for key in node.keys():
+            if id(key) not in visited:
+                visited[id(key)] = key
+                size += sys.getsizeof(key)
+                string_size += len(key.encode('utf-8', 'surrogatepass'))
+
+    max_depth = depths.get(id(data), 0)
+
+    return Stats(counts={name: counts[kind]
+                         for kind, name in _kind_names.items()},
+                 max_depth=max_depth,
+                 max_width=max_width,
+                 string_size=string_size,
+                 size=size)
+
+
+_missing = object()
+
+_fingerprint_size = 16
+
+(_NULL,
+ _BOOL,
+ _NUMBER,
+ _STRING,
+ _ARRAY,
+ _OBJECT) = range(1, 7)
+
+_kind_names = {_NULL: 'null',
+               _BOOL: 'boolean',
+               _NUMBER: 'number',
+               _STRING: 'string',
+               _ARRAY: 'array',
+               _OBJECT: 'object'}
+
+_kinds = {type(None): _NULL,
+          bool: _BOOL,
+          int: _NUMBER,
+          float: _NUMBER,
+          str: _STRING,
+          list: _ARRAY,
+          dict: _OBJECT}
+
+
+def _get_kind(data):
+    # imported on first use of new class (persistent module imports this
+    # module)
+    from hat.json.persistent import PersistentArray, PersistentObject
+
+    if isinstance(data, bool):
+        kind = _BOOL
+
+    elif isinstance(data, (int, float)):
+        kind = _NUMBER
+
+    elif isinstance(data, str):
+        kind = _STRING
+
+    elif isinstance(data, (list, Table, CowArray, PersistentArray)):
+        kind = _ARRAY
+
+    elif isinstance(data, (dict, TableRow, CowObject, PersistentObject)):
+        kind = _OBJECT
 
     else:
-        yield data
+        return
+
+    _kinds[data.__class__] = kind
+    return kind
+
+
+def _is_object(data):
+    return (_kinds.get(data.__class__) or _get_kind(data)) == _OBJECT
+
+
+def _is_array(data):
+    return (_kinds.get(data.__class__) or _get_kind(data)) == _ARRAY
+
+
+def _encode_scalar(kind, data, exact=False):
+    if kind == _NULL:
+        return b'z'
+
+    if kind == _BOOL:
+        return b't' if data else b'f'
+
+    if kind == _NUMBER:
+        if isinstance(data, float):
+            if exact:
+                return b'd' + float.__repr__(data).encode() + b';'
+
+            data = int(data) if data.is_integer() else float.__repr__(data)
+
+        if isinstance(data, int):
+            data = int.__repr__(data)
+
+        return b'n' + data.encode() + b';'
+
+    data = data.encode('utf-8', 'surrogatepass')
+    return b's' + str(len(data)).encode() + b':' + data
+
+
+def _encode_item(data, memo):
+    kind = _kinds.get(data.__class__) or _get_kind(data)
+    if kind < _ARRAY:
+        return _encode_scalar(kind, data)
+
+    return b'c' + memo[id(data)][1]
+
+
+def _create_column(values):
+    if values and all(i.__class__ is int for i in values):
+        try:
+            return array.array('q', values)
+
+        except OverflowError:
+            pass
+
+    elif values and all(i.__class__ is float for i in values):
+        return array.array('d', values)
+
+    return values
@@ -0,0 +1,258 @@
+"""Durable JSON data storage
+
+Durable storage persists data changes as write-ahead log of JSON Patch
+operations. Log is periodically compacted into data snapshot. On startup,
+data is recovered by loading snapshot and replaying remaining log records.
+
+Storage directory contains two files:
+
+    * ``snapshot.json`` - JSON Object with ``sequence`` (sequence number of
+      last change included in snapshot) and ``data`` (snapshot data)
+    * ``log.jsonl`` - JSON Lines file where each line contains JSON Array
+      with change sequence number and JSON Patch operations
+
+"""
+
+import contextlib
+import os
+import pathlib
+
+from hat.json.data import Data, clone
+from hat.json.encoder import Format, decode, decode_file, encode, encode_file
+from hat.json.patch import diff, patch
+from hat.json.path import Storage
+
+
+class DurableStorage(Storage):
+    """Durable JSON data storage
+
+    Data is recovered from storage directory `path` (directory is created
+    if it doesn't exist). If storage directory doesn't contain snapshot,
+    initial snapshot with `default` data is created.
+
+    Each change (or transaction) is appended to log before it is committed.
+    If appending fails, change is discarded. When log size exceeds
+    `compact_size` bytes, log is compacted into new snapshot.
+    If `sync` is ``True``, files are synchronized with storage device
+    (``fsync``) after each change.
+
+    Example::
+
+        storage = DurableStorage(path, default={})
+        storage.set('a', 1)
+        storage.close()
+
+        storage = DurableStorage(path)
+        assert storage.data == {'a': 1}
+
+    Raises:
+        ValueError: invalid storage directory content
+
+    """
+
+    def __init__(self,
+                 path: pathlib.Path,
+                 default: Data = None,
+                 *,
+                 compact_size: int = 16 * 1024 * 1024,
+                 sync: bool = False,
+                 **kwargs):
+        path.mkdir(parents=True, exist_ok=True)
+
+        self._snapshot_path = path / 'snapshot.json'
+        self._log_path = path / 'log.jsonl'
+        self._compact_size = compact_size
+        self._sync = sync
+
+        has_snapshot = self._snapshot_path.exists()
+        data, self._sequence, self._log_size = _recover(
+            self._snapshot_path, self._log_path, default)
+
+        super().__init__(data, **kwargs)
+
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+        if not has_snapshot:
+            self.compact()
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of last persisted change"""
+        return self._sequence
+
+    @property
+    def log_size(self) -> int:
+        """Current log size in bytes"""
+        return self._log_size
+
+    def close(self):
+        """Close storage
+
+        After closing, changes are no longer persisted.
+
+        """
+        self._log.close()
+
+    def compact(self):
+        """Write snapshot of current data and truncate log"""
+        with self._lock:
+            tmp_path = self._snapshot_path.with_suffix('.json.tmp')
+            encode_file({'sequence': self._sequence, 'data': self._data},
+                        tmp_path, Format.JSON, indent=None)
+
+            if self._sync:
+                _fsync_path(tmp_path)
+
+            os.replace(tmp_path, self._snapshot_path)
+
+            if self._sync:
+                _fsync_path(self._snapshot_path.parent)
+
+            self._log.close()
+            self._log = open(self._log_path, 'w', encoding='utf-8')
+            self._log_size = 0
+
+    def _is_patch_required(self):
+        return True
+
+    def _prepare_commit(self, old_data, new_data, changes, ops):
+        # record is appended before change is committed
+        if ops is None:
+            ops = diff(old_data, new_data)
+
+        if self._log.closed or not ops:
+            return
+
+        sequence = self._sequence + 1
+        record = encode([sequence, ops], indent=None) + '\n'
+
+        try:
+            self._log.write(record)
+            self._log.flush()
+
+            if self._sync:
+                os.fsync(self._log.fileno())
+
+        except BaseException:
+            self._discard_partial_record()
+            raise
+
+        self._sequence = sequence
+        self._log_size += len(record.encode('utf-8'))
+
+    def _on_commit(self, old_data, new_data, changes, ops):
+        if self._log_size > self._compact_size:
+            self.compact()
+
+    def _discard_partial_record(self):
+        with contextlib.suppress(Exception):
+            self._log.close()
+
+        os.truncate(self._log_path, self._log_size)
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+
+def _recover(snapshot_path, log_path, default):
+    if snapshot_path.exists():
+        snapshot = decode_file(snapshot_path, Format.JSON)
+        if not isinstance(snapshot, dict):
+            raise ValueError('invalid snapshot')
+
+        data = snapshot.get('data')
+        sequence = snapshot.get('sequence')
+        if not isinstance(sequence, int) or isinstance(sequence, bool):
+            raise ValueError('invalid snapshot')
+
+    else:
+        data = default
+        sequence = 0
+
+    if not log_path.exists():
+        return data, sequence, 0
+
+    # log records are applied in place
+    if data is default:
+        data = clone(data)
+
+    log_size = 0
+
+    with open(log_path, 'rb') as f:
+        for line in f:
+            # incomplete last record (interrupted write) is discarded
+            if not line.endswith(b'\n'):
+                break
+
+            record_sequence, ops = decode(str(line, 'utf-8'), Format.JSON)
+            log_size += len(line)
+
+            if record_sequence <= sequence:
+                continue
+
+            if record_sequence != sequence + 1:
+                raise ValueError('invalid log sequence')
+
+            for op in ops:
+                data = _apply_op(data, op)
+            sequence = record_sequence
+
+    with open(log_path, 'r+b') as f:
+        f.truncate(log_size)
+
+    return data, sequence, log_size
+
+
+def _apply_op(data, op):
+    if op['op'] not in ('add', 'remove', 'replace'):
+        return patch(data, [op])
+
+    path = _parse_pointer(op['path'])
+    if not path:
+        return patch(data, [op])
+
+    parent = data
+    for key in path[:-1]:
+        parent = parent[int(key) if isinstance(parent, list) else key]
+
+    key = path[-1]
+    if isinstance(parent, list):
+        key = len(parent) if key == '-' else int(key)
+
+        if op['op'] == 'add':
+            if not 0 <= key <= len(parent):
+                raise ValueError('invalid array index')
+
+            parent.insert(key, op['value'])
+            return data
+
+        if not 0 <= key < len(parent):
+            raise ValueError('invalid array index')
+
+    elif not isinstance(parent, dict):
+        raise ValueError('invalid data type')
+
+    elif op['op'] != 'add' and key not in parent:
+        raise ValueError('invalid object key')
+
+    if op['op'] == 'remove':
+        del parent[key]
+
+    else:
+        parent[key] = op['value']
+
+    return data
+
+
+def _parse_pointer(pointer):
+    segments = pointer.split('/')
+    if segments[0] != '':
+        raise ValueError('invalid pointer')
+
+    return [i.replace('~1', '/').replace('~0', '~') for i in segments[1:]]
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
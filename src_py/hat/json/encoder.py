@@ -1,10 +1,25 @@
 """JSON Data encoder/decoder"""
 
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+import abc
+import array
+import codecs
+import collections
+import concurrent.futures
 import enum
+import functools
+import gc
 import io
+import itertools
 import json
+import math
+import mmap
+import os
 import pathlib
+import re
+import secrets
 import sys
+import typing
 
 import tomli_w
 import yaml
@@ -14,7 +29,21 @@ if sys.version_info[:2] >= (3, 11):
 else:
     import tomli as toml
 
-from hat.json.data import Data
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+from hat.json.data import (Data,
+                           Interner,
+                           Table,
+                           TableRow,
+                           CowObject,
+                           CowArray,
+                           clone)
+from hat.json.path import Path, compile_path
+from hat.json.persistent import PersistentArray, PersistentObject
 
 
 class Format(enum.Enum):
@@ -22,6 +51,150 @@ class Format(enum.Enum):
     JSON = 'json'
     YAML = 'yaml'
     TOML = 'toml'
+    JSONL = 'jsonl'
+
+
+class EventType(enum.Enum):
+    """Streaming decoder event type"""
+    START_MAP = 'start_map'
+    END_MAP = 'end_map'
+    START_ARRAY = 'start_array'
+    END_ARRAY = 'end_array'
+    KEY = 'key'
+    VALUE = 'value'
+
+
+Event: typing.TypeAlias = tuple[EventType, Data]
+"""Streaming decoder event (``KEY`` and ``VALUE`` events contain object key
+or scalar value, other events contain ``None``)"""
+
+
+class JsonBackend(abc.ABC):
+    """JSON format encoding backend interface
+
+    All backends encode data without NaN and infinite float values (same as
+    ``allow_nan=False`` in `json` standard library) and decode data
+    equally. Encoded strings can differ in whitespace (other than
+    indentation), escaping of non-ASCII characters and float formatting.
+
+    """
+
+    @abc.abstractmethod
+    def encode(self,
+               data: Data,
+               indent: int | None = None,
+               sort_keys: bool = False
+               ) -> str:
+        """Encode JSON data.
+
+        If `indent` is ``None``, data is encoded as single line. Otherwise,
+        each array element and object member is encoded in separate line,
+        indented with `indent` spaces per nesting level.
+
+        Raises:
+            ValueError: NaN or infinite float value
+            TypeError: data not JSON serializable
+
+        """
+
+    @abc.abstractmethod
+    def decode(self, data_str: str | bytes | bytearray | memoryview) -> Data:
+        """Decode JSON data.
+
+        Binary data should be UTF-8 encoded.
+
+        Raises:
+            ValueError: invalid data
+
+        """
+
+
+class PyJsonBackend(JsonBackend):
+    """Python standard library implementation of JsonBackend"""
+
+    def encode(self,
+               data: Data,
+               indent: int | None = None,
+               sort_keys: bool = False
+               ) -> str:
+        return _encode_json(data, indent, sort_keys)
+
+    def decode(self, data_str: str | bytes | bytearray | memoryview) -> Data:
+        if isinstance(data_str, memoryview):
+            data_str = str(data_str, 'utf-8')
+
+        return json.loads(data_str)
+
+
+class RsJsonBackend(JsonBackend):
+    """Rust (orjson) implementation of JsonBackend
+
+    Data which can not be encoded or decoded equally by orjson (integers
+    exceeding 64 bits, ``indent`` other than ``None`` or ``2``, NaN and
+    infinite float literals, values which are not JSON data but are
+    natively supported by orjson, ...) is processed with `PyJsonBackend`.
+    Tables are encoded column-wise.
+
+    """
+
+    def __init__(self):
+        if not orjson:
+            raise Exception('implementation not available')
+
+        self._py_backend = PyJsonBackend()
+
+    def encode(self,
+               data: Data,
+               indent: int | None = None,
+               sort_keys: bool = False
+               ) -> str:
+        if indent not in (None, 2):
+            return self._py_backend.encode(data, indent, sort_keys)
+
+        if not _is_rs_encodable(data):
+            return self._py_backend.encode(data, indent, sort_keys)
+
+        try:
+            result = _encode_rs_json(data, indent, sort_keys)
+
+        except TypeError:
+            return self._py_backend.encode(data, indent, sort_keys)
+
+        # orjson encodes NaN and infinite floats as null - data is checked
+        # only if result contains null
+        if 'null' in result and _contains_non_finite(data):
+            raise ValueError('Out of range float values are not JSON '
+                             'compliant')
+
+        return result
+
+    def decode(self, data_str: str | bytes | bytearray | memoryview) -> Data:
+        if isinstance(data_str, str):
+            try:
+                data_bytes = data_str.encode('utf-8')
+
+            except UnicodeEncodeError:
+                return self._py_backend.decode(data_str)
+
+        else:
+            data_bytes = data_str
+
+        # orjson decodes integers exceeding 64 bits as floats
+        if _contains_long_number(data_bytes):
+            return self._py_backend.decode(data_str)
+
+        try:
+            return orjson.loads(data_bytes)
+
+        except orjson.JSONDecodeError:
+            return self._py_backend.decode(data_str)
+
+
+if orjson:
+    DefaultJsonBackend: type[JsonBackend] = RsJsonBackend
+
+else:
+    DefaultJsonBackend: type[JsonBackend] = PyJsonBackend
 
 
 def encode(data: Data,
@@ -33,7 +206,10 @@ def encode(data: Data,
 
     In case of TOML format, data must be JSON Object.
 
-    In case of TOML format, `indent` is ignored.
+    In case of JSONL format, data must be JSON Array (each element is
+    encoded as single line).
+
+    In case of TOML or JSONL format, `indent` is ignored.
 
     In case of YAML or TOML format, `sort_keys` is ignored.
 
@@ -45,44 +221,103 @@ def encode(data: Data,
 
     """
     if format == Format.JSON:
-        return json.dumps(data,
-                          indent=indent,
-                          sort_keys=sort_keys,
-                          allow_nan=False)
+        return _json_backend.encode(data, indent, sort_keys)
 
     if format == Format.YAML:
-        dumper = (yaml.CSafeDumper if hasattr(yaml, 'CSafeDumper')
-                  else yaml.SafeDumper)
-        return str(yaml.dump(data, indent=indent, Dumper=dumper))
+        return str(yaml.dump(data, indent=indent, Dumper=_YamlDumper))
 
     if format == Format.TOML:
-        return tomli_w.dumps(data)
+        return tomli_w.dumps(clone(data))
+
+    if format == Format.JSONL:
+        stream = io.StringIO()
+        encode_iter(data, stream, sort_keys)
+        return stream.getvalue()
 
     raise ValueError('unsupported format')
 
 
 def decode(data_str: str,
-           format: Format = Format.JSON
+           format: Format = Format.JSON,
+           interner: Interner | None = None
            ) -> Data:
     """Decode JSON data.
 
+    If `interner` is not ``None``, decoded data is interned.
+
     Args:
         data_str: encoded JSON data
         format: encoding format
+        interner: data interner
 
     """
     if format == Format.JSON:
-        return json.loads(data_str)
+        data = _json_backend.decode(data_str)
 
-    if format == Format.YAML:
+    elif format == Format.YAML:
         loader = (yaml.CSafeLoader if hasattr(yaml, 'CSafeLoader')
                   else yaml.SafeLoader)
-        return yaml.load(io.StringIO(data_str), Loader=loader)
+        data = yaml.load(io.StringIO(data_str), Loader=loader)
 
-    if format == Format.TOML:
-        return toml.loads(data_str)
+    elif format == Format.TOML:
+        data = toml.loads(data_str)
 
-    raise ValueError('unsupported format')
+    elif format == Format.JSONL:
+        data = list(decode_iter(io.StringIO(data_str)))
+
+    else:
+        raise ValueError('unsupported format')
+
+    if interner is not None:
+        data = interner.intern(data)
+
+    return data
+
+
+def encode_bytes(data: Data,
+                 format: Format = Format.JSON,
+                 indent: int | None = None,
+                 sort_keys: bool = False
+                 ) -> bytes:
+    """Encode JSON data as UTF-8 encoded bytes.
+
+    Arguments are the same as for `encode`.
+
+    """
+    return encode(data, format, indent, sort_keys).encode('utf-8')
+
+
+def decode_bytes(data_bytes: bytes | bytearray | memoryview | mmap.mmap,
+                 format: Format = Format.JSON,
+                 interner: Interner | None = None
+                 ) -> Data:
+    """Decode JSON data from UTF-8 encoded bytes.
+
+    Any object supporting buffer protocol (for example `memoryview` or
+    `mmap.mmap`) can be used as `data_bytes` without copying it to `bytes`.
+
+    Example::
+
+        data = {'a': [1, 'b']}
+        assert decode_bytes(encode_bytes(data)) == data
+        assert decode_bytes(memoryview(b'[1, 2]')) == [1, 2]
+
+    Args:
+        data_bytes: encoded JSON data
+        format: encoding format
+        interner: data interner
+
+    """
+    if format != Format.JSON:
+        return decode(str(data_bytes, 'utf-8'), format, interner)
+
+    with memoryview(data_bytes) as view:
+        data = _json_backend.decode(view)
+
+    if interner is not None:
+        data = interner.intern(data)
+
+    return data
 
 
 def get_file_format(path: pathlib.PurePath) -> Format:
@@ -96,6 +331,9 @@ def get_file_format(path: pathlib.PurePath) -> Format:
     if path.suffix == '.toml':
         return Format.TOML
 
+    if path.suffix in ('.jsonl', '.ndjson'):
+        return Format.JSONL
+
     raise ValueError('can not determine format from path suffix')
 
 
@@ -110,7 +348,9 @@ def encode_file(data: Data,
 
     In case of TOML format, data must be JSON Object.
 
-    In case of TOML format, `indent` is ignored.
+    In case of JSONL format, data must be JSON Array.
+
+    In case of TOML or JSONL format, `indent` is ignored.
 
     In case of YAML or TOML format, `sort_keys` is ignored.
 
@@ -137,25 +377,44 @@ def encode_file(data: Data,
 
 
 def decode_file(path: pathlib.PurePath,
-                format: Format | None = None
+                format: Format | None = None,
+                interner: Interner | None = None
                 ) -> Data:
     """Decode JSON data from file.
 
     If `format` is ``None``, encoding format is derived from path suffix.
 
+    If `interner` is not ``None``, decoded data is interned.
+
+    In case of JSON format, file is memory mapped and decoded without
+    reading into intermediate buffer.
+
     Args:
         path: file path
         format: encoding format
+        interner: data interner
 
     """
     if format is None:
         format = get_file_format(path)
 
+    if format == Format.JSON:
+        with open(path, 'rb') as f:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            # empty files and special files can not be mapped
+            except (ValueError, OSError):
+                return decode_bytes(f.read(), format, interner)
+
+            with m:
+                return decode_bytes(m, format, interner)
+
     flags = 'r' if format != Format.TOML else 'rb'
     encoding = 'utf-8' if format != Format.TOML else None
 
     with open(path, flags, encoding=encoding) as f:
-        return decode_stream(f, format)
+        return decode_stream(f, format, interner)
 
 
 def encode_stream(data: Data,
@@ -167,10 +426,12 @@ def encode_stream(data: Data,
 
     In case of TOML format, data must be JSON Object.
 
+    In case of JSONL format, data must be JSON Array.
+
     In case of TOML format, `stream` should be `io.RawIOBase`. For
     other formats, `io.TextIOBase` is expected.
 
-    In case of TOML format, `indent` is ignored.
+    In case of TOML or JSONL format, `indent` is ignored.
 
     In case of YAML or TOML format, `sort_keys` is ignored.
 
@@ -183,52 +444,231 @@ def encode_stream(data: Data,
 
     """
     if format == Format.JSON:
-        json.dump(data, stream,
-                  indent=indent,
-                  sort_keys=sort_keys,
-                  allow_nan=False)
+        stream.write(_json_backend.encode(data, indent, sort_keys))
 
     elif format == Format.YAML:
-        dumper = (yaml.CSafeDumper if hasattr(yaml, 'CSafeDumper')
-                  else yaml.SafeDumper)
         yaml.dump(data, stream,
                   indent=indent,
-                  Dumper=dumper,
+                  Dumper=_YamlDumper,
                   explicit_start=True,
                   explicit_end=True)
 
     elif format == Format.TOML:
-        tomli_w.dump(data, stream)
+        tomli_w.dump(clone(data), stream)
+
+    elif format == Format.JSONL:
+        encode_iter(data, stream, sort_keys)
 
     else:
         raise ValueError('unsupported format')
 
 
 def decode_stream(stream: io.TextIOBase | io.RawIOBase,
-                  format: Format = Format.JSON
+                  format: Format = Format.JSON,
+                  interner: Interner | None = None
                   ) -> Data:
     """Decode JSON data from stream.
 
     In case of TOML format, `stream` should be `io.RawIOBase`. For
     other formats, `io.TextIOBase` is expected.
 
+    If `interner` is not ``None``, decoded data is interned.
+
     Args:
         stream: input stream
         format: encoding format
+        interner: data interner
 
     """
     if format == Format.JSON:
-        return json.load(stream)
+        data = _json_backend.decode(stream.read())
 
-    if format == Format.YAML:
+    elif format == Format.YAML:
         loader = (yaml.CSafeLoader if hasattr(yaml, 'CSafeLoader')
                   else yaml.SafeLoader)
-        return yaml.load(stream, Loader=loader)
+        data = yaml.load(stream, Loader=loader)
 
-    if format == Format.TOML:
-        return toml.load(stream)
+    elif format == Format.TOML:
+        data = toml.load(stream)
 
-    raise ValueError('unsupported format')
+    elif format == Format.JSONL:
+        data = list(decode_iter(stream))
+
+    else:
+        raise ValueError('unsupported format')
+
+    if interner is not None:
+        data = interner.intern(data)
+
+    return data
+
+
+def encode_iter(data: Iterable[Data],
+                stream: io.TextIOBase,
+                sort_keys: bool = False):
+    """Encode JSON data items to stream as JSON Lines.
+
+    Each item is encoded and written to stream as single line, so items can
+    be produced lazily (only single item is kept in memory at once).
+
+    Args:
+        data: JSON data items
+        stream: output stream
+        sort_keys: sort object keys
+
+    Raises:
+        ValueError: data is JSON Object or string
+
+    """
+    if isinstance(data, (str, Mapping)) or not isinstance(data, Iterable):
+        raise ValueError('invalid JSON Lines data')
+
+    for i in data:
+        stream.write(_encode_jsonl_line(i, sort_keys))
+
+
+def decode_iter(stream: io.TextIOBase | io.RawIOBase,
+                interner: Interner | None = None
+                ) -> Iterator[Data]:
+    """Decode JSON data items from JSON Lines stream.
+
+    Stream is read line by line and each line is decoded as single item
+    (empty lines are skipped). Both text and binary streams are supported.
+
+    If `interner` is not ``None``, decoded items are interned.
+
+    Example::
+
+        stream = io.StringIO('{"a": 1}\\n\\n[2]\\n')
+        assert list(decode_iter(stream)) == [{'a': 1}, [2]]
+
+    Args:
+        stream: input stream
+        interner: data interner
+
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+
+        data = _json_backend.decode(line)
+
+        if interner is not None:
+            data = interner.intern(data)
+
+        yield data
+
+
+def decode_iter_parallel(path: pathlib.PurePath,
+                         max_workers: int | None = None,
+                         chunk_size: int = 16 * 1024 * 1024,
+                         ordered: bool = True
+                         ) -> Iterator[Data]:
+    """Decode JSON data items from JSON Lines file in parallel.
+
+    File is split into byte ranges of approximately `chunk_size` bytes,
+    aligned to line boundaries, which are decoded in process pool with up to
+    `max_workers` processes (number of processors by default). At most
+    two ranges per process are decoded (and kept in memory) at once.
+
+    If `ordered` is ``True``, items are yielded in the same order as in file.
+    Otherwise, items of each range are yielded as soon as range is decoded
+    (items of single range keep their order).
+
+    Example::
+
+        items = decode_iter_parallel(path, max_workers=4)
+        assert list(items) == list(decode_iter(open(path)))
+
+    """
+    if chunk_size < 1:
+        raise ValueError('invalid chunk size')
+
+    max_workers = max_workers or os.cpu_count() or 1
+    ranges = _get_line_ranges(path, chunk_size)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        futures = collections.deque()
+
+        try:
+            for start, end in ranges:
+                if len(futures) >= 2 * max_workers:
+                    yield from _pop_decoded_range(futures, ordered)
+
+                futures.append(executor.submit(_decode_jsonl_range, path,
+                                               start, end))
+
+            while futures:
+                yield from _pop_decoded_range(futures, ordered)
+
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_events(stream: io.TextIOBase | io.RawIOBase,
+                chunk_size: int = 64 * 1024
+                ) -> Iterator[Event]:
+    """Incrementally decode JSON data from stream as parse events.
+
+    Stream is read in chunks of up to `chunk_size` characters (or bytes).
+    Binary streams are decoded as UTF-8 (multibyte characters can be split
+    between chunks). Only events are kept in memory, so memory usage
+    doesn't depend on size of decoded data.
+
+    Only JSON format is supported.
+
+    Example::
+
+        stream = io.StringIO('{"a": [1, true]}')
+        assert list(iter_events(stream)) == [
+            (EventType.START_MAP, None),
+            (EventType.KEY, 'a'),
+            (EventType.START_ARRAY, None),
+            (EventType.VALUE, 1),
+            (EventType.VALUE, True),
+            (EventType.END_ARRAY, None),
+            (EventType.END_MAP, None)]
+
+    Raises:
+        ValueError: invalid JSON data
+
+    """
+    reader = _StreamReader(stream, chunk_size)
+    yield from _iter_value_events(reader)
+
+    if reader.peek():
+        raise ValueError('extra data')
+
+
+def iter_items(stream: io.TextIOBase | io.RawIOBase,
+               path: Path = [],
+               chunk_size: int = 64 * 1024
+               ) -> Iterator[Data]:
+    """Incrementally decode elements of JSON Array referenced by `path`.
+
+    Each array element is decoded and yielded separately, so only single
+    element is kept in memory at once. Data preceding referenced array is
+    skipped without decoding and data following referenced array is not
+    read. If `path` doesn't reference JSON Array, nothing is yielded.
+
+    Negative array indexes are not supported in `path`. Stream is read as
+    described in `iter_events`.
+
+    Example::
+
+        stream = io.StringIO('{"a": 1, "b": [{"c": 1}, {"c": 2}]}')
+        assert list(iter_items(stream, 'b')) == [{'c': 1}, {'c': 2}]
+
+    Raises:
+        ValueError: invalid path or JSON data
+
+    """
+    segments = compile_path(path).segments
+    if any(i.__class__ is int and i < 0 for i in segments):
+        raise ValueError('negative array index not supported')
+
+    return _iter_items(_StreamReader(stream, chunk_size), segments)
 
 
 def read_conf(path: pathlib.Path | None,
@@ -252,3 +692,647 @@ def read_conf(path: pathlib.Path | None,
             break
 
     return decode_file(path)
+
+
+class _YamlDumper(yaml.CSafeDumper if hasattr(yaml, 'CSafeDumper')
+                  else yaml.SafeDumper):
+    pass
+
+
+_YamlDumper.add_multi_representer(Mapping, _YamlDumper.represent_dict)
+_YamlDumper.add_multi_representer(Sequence, _YamlDumper.represent_list)
+
+
+def _default(data):
+    if isinstance(data, Mapping):
+        return dict(data)
+
+    if (isinstance(data, Sequence) and
+            not isinstance(data, (bytes, bytearray))):
+        return list(data)
+
+    raise TypeError(f'object of type {type(data).__name__} '
+                    f'is not JSON serializable')
+
+
+def _encode_json(data, indent, sort_keys):
+    # tables are encoded column-wise only if data contains table
+    try:
+        return _get_json_encoder(indent, sort_keys).encode(data)
+
+    except _TableFound:
+        pass
+
+    tables = []
+
+    def default(data):
+        if not isinstance(data, Table):
+            return _default(data)
+
+        tables.append(data)
+        return f'{_table_marker}{len(tables) - 1}'
+
+    result = json.dumps(data,
+                        indent=indent,
+                        sort_keys=sort_keys,
+                        allow_nan=False,
+                        default=default)
+    if not tables:
+        return result
+
+    return _replace_tables(
+        result, tables,
+        lambda table, level: _encode_table(table, indent, sort_keys, level,
+                                           _encode_key, _encode_column,
+                                           (', ', ': ')))
+
+
+def _encode_rs_json(data, indent, sort_keys):
+    # tables are encoded column-wise (same as in PyJsonBackend)
+    tables = []
+
+    def default(data):
+        if data.__class__ is not Table:
+            return _rs_default(data)
+
+        tables.append(data)
+        return f'{_table_marker}{len(tables) - 1}'
+
+    result = str(orjson.dumps(data,
+                              default=default,
+                              option=_get_rs_option(indent, sort_keys)),
+                 'utf-8')
+    if not tables:
+        return result
+
+    return _replace_tables(
+        result, tables,
+        lambda table, level: _encode_table(table, indent, sort_keys, level,
+                                           _encode_rs_key, _encode_rs_column,
+                                           (',', ':')))
+
+
+def _replace_tables(result, tables, encode_table):
+    def replace(match):
+        line_start = result.rfind('\n', 0, match.start()) + 1
+        line = result[line_start:match.start()]
+        level = len(line) - len(line.lstrip(' '))
+        table = tables[int(match.group(1))]
+        return encode_table(table, level)
+
+    return re.sub(f'"{_table_marker}(\\d+)"', replace, result)
+
+
+def _get_line_ranges(path, chunk_size):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = 0
+
+        while start < size:
+            f.seek(start + chunk_size)
+            f.readline()
+            end = min(f.tell(), size)
+
+            yield start, end
+            start = end
+
+
+def _decode_jsonl_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    return [_json_backend.decode(line)
+            for line in data.splitlines() if line.strip()]
+
+
+def _pop_decoded_range(futures, ordered):
+    if not ordered:
+        concurrent.futures.wait(futures,
+                                return_when=concurrent.futures.FIRST_COMPLETED)
+        future = next(i for i in futures if i.done())
+        futures.remove(future)
+
+    else:
+        future = futures.popleft()
+
+    return future.result()
+
+
+def _encode_jsonl_line(data, sort_keys):
+    return _json_backend.encode(data, None, sort_keys) + '\n'
+
+
+def _is_rs_encodable(data):
+    # orjson natively encodes types which are not JSON data (enums, UUIDs,
+    # ...) - classes of all values are checked level by level (values
+    # referenced by builtin containers are obtained with gc.get_referents
+    # which is significantly faster than iteration)
+    values = [data]
+
+    while values:
+        classes = set(map(type, values))
+        if classes <= _rs_builtin_classes:
+            values = gc.get_referents(*values)
+            continue
+
+        if not classes <= _rs_classes:
+            return False
+
+        children = gc.get_referents(*(i for i in values
+                                      if i.__class__ in _rs_builtin_classes))
+
+        for i in values:
+            cls = i.__class__
+
+            if cls in _rs_object_classes:
+                children.extend(i.values())
+
+            elif cls in _rs_array_classes:
+                children.extend(i)
+
+            elif cls is Table:
+                children.extend(column for column in map(i.column, i.keys)
+                                if column.__class__ is list)
+
+        values = children
+
+    return True
+
+
+def _contains_non_finite(data):
+    stack = [(data, )]
+
+    while stack:
+        for i in stack.pop():
+            cls = i.__class__
+
+            if cls is float:
+                if not math.isfinite(i):
+                    return True
+
+            elif cls is dict:
+                stack.append(i.values())
+
+            elif cls is list:
+                stack.append(i)
+
+            elif cls in _scalar_classes:
+                continue
+
+            elif cls is Table:
+                stack.extend(i.column(key) for key in i.keys)
+
+            elif isinstance(i, Mapping):
+                stack.append(i.values())
+
+            elif (isinstance(i, Sequence) and
+                    not isinstance(i, (str, bytes, bytearray))):
+                stack.append(i)
+
+    return False
+
+
+def _contains_long_number(data_bytes):
+    # digit sequences are found by translating chunks (regular expression
+    # search is significantly slower)
+    marker = b'0' * _long_number_digits
+
+    with memoryview(data_bytes) as view:
+        for start in range(0, len(view), _long_number_chunk_size):
+            stop = start + _long_number_chunk_size + _long_number_digits - 1
+            chunk = bytes(view[start:stop])
+            if marker in chunk.translate(_long_number_table):
+                return True
+
+    return False
+
+
+def _encode_table(table, indent, sort_keys, level, encode_key, encode_column,
+                  separators):
+    if not len(table):
+        return '[]'
+
+    keys = sorted(table.keys) if sort_keys else table.keys
+
+    if indent is None:
+        item_separator, key_separator = separators
+        value_indent = None
+        row_indent = ''
+        row_template = ('{' +
+                        item_separator.join(
+                            f'{encode_key(key)}{key_separator}%s'
+                            for key in keys) +
+                        '}')
+        separator = item_separator
+        start, end = '[', ']'
+
+    else:
+        value_indent = ' ' * (level + 2 * indent)
+        row_indent = ' ' * (level + indent)
+        row_template = ('{\n' +
+                        ',\n'.join(f'{value_indent}{encode_key(key)}: %s'
+                                   for key in keys) +
+                        f'\n{row_indent}}}'
+                        if keys else '{}')
+        separator = ',\n' + row_indent
+        start, end = '[\n' + row_indent, '\n' + ' ' * level + ']'
+
+    if not keys:
+        rows = itertools.repeat(row_template, len(table))
+
+    else:
+        columns = (encode_column(table.column(key), indent, sort_keys,
+                                 value_indent)
+                   for key in keys)
+        rows = (row_template % row for row in zip(*columns))
+
+    return start + separator.join(rows) + end
+
+
+def _encode_key(key):
+    return json.encoder.encode_basestring_ascii(key).replace('%', '%%')
+
+
+def _encode_column(column, indent, sort_keys, value_indent):
+    if isinstance(column, array.array):
+        if column.typecode == 'q':
+            return map(int.__repr__, column)
+
+        return map(_encode_float, column)
+
+    return (_encode_value(i, indent, sort_keys, value_indent)
+            for i in column)
+
+
+def _encode_value(value, indent, sort_keys, value_indent):
+    if value.__class__ is str:
+        return json.encoder.encode_basestring_ascii(value)
+
+    if value is None:
+        return 'null'
+
+    if value is True:
+        return 'true'
+
+    if value is False:
+        return 'false'
+
+    if value.__class__ is int:
+        return int.__repr__(value)
+
+    if value.__class__ is float:
+        return _encode_float(value)
+
+    result = _encode_json(value, indent, sort_keys)
+    if indent is None:
+        return result
+
+    return result.replace('\n', '\n' + value_indent)
+
+
+def _encode_rs_key(key):
+    return str(orjson.dumps(key), 'utf-8').replace('%', '%%')
+
+
+def _encode_rs_column(column, indent, sort_keys, value_indent):
+    if isinstance(column, array.array):
+        if column.typecode == 'q':
+            return map(int.__repr__, column)
+
+        column = column.tolist()
+
+    # indented array of scalars contains each value in separate line
+    if set(map(type, column)) <= _rs_scalar_classes:
+        result = str(orjson.dumps(column, option=orjson.OPT_INDENT_2),
+                     'utf-8')
+        return result[4:-2].split(',\n  ')
+
+    option = _get_rs_option(indent, sort_keys)
+    values = (str(orjson.dumps(i, default=_rs_default, option=option),
+                  'utf-8')
+              for i in column)
+    if indent is None:
+        return values
+
+    return (i.replace('\n', '\n' + value_indent) for i in values)
+
+
+def _get_rs_option(indent, sort_keys):
+    return (orjson.OPT_PASSTHROUGH_DATETIME |
+            orjson.OPT_PASSTHROUGH_DATACLASS |
+            (orjson.OPT_SORT_KEYS if sort_keys else 0) |
+            (orjson.OPT_INDENT_2 if indent == 2 else 0))
+
+
+def _encode_float(value):
+    if not math.isfinite(value):
+        raise ValueError('Out of range float values are not JSON compliant')
+
+    return float.__repr__(value)
+
+
+@functools.lru_cache(maxsize=16)
+def _get_json_encoder(indent, sort_keys):
+    return json.JSONEncoder(indent=indent,
+                            sort_keys=sort_keys,
+                            allow_nan=False,
+                            default=_default_without_table)
+
+
+def _rs_default(data):
+    if data.__class__ in _rs_object_classes:
+        return dict(data)
+
+    if data.__class__ in _rs_array_classes:
+        return list(data)
+
+    raise TypeError(f'object of type {type(data).__name__} '
+                    f'is not JSON serializable')
+
+
+def _default_without_table(data):
+    if isinstance(data, Table):
+        raise _TableFound()
+
+    return _default(data)
+
+
+class _TableFound(Exception):
+    pass
+
+
+_table_marker = f'hat-json-table-{secrets.token_hex(16)}-'
+
+_scalar_classes = frozenset([type(None), bool, int, str])
+
+_rs_scalar_classes = frozenset([type(None), bool, int, float, str])
+_rs_builtin_classes = _rs_scalar_classes | {dict, list}
+_rs_object_classes = frozenset([TableRow, CowObject, PersistentObject])
+_rs_array_classes = frozenset([CowArray, PersistentArray])
+_rs_classes = (_rs_builtin_classes | _rs_object_classes | _rs_array_classes |
+               {Table})
+
+_long_number_digits = 19
+_long_number_chunk_size = 1024 * 1024
+_long_number_table = bytes(ord('0') if i in b'0123456789' else ord(' ')
+                           for i in range(256))
+
+_json_backend = DefaultJsonBackend()
+
+
+class _StreamReader:
+
+    def __init__(self, stream, chunk_size):
+        if chunk_size < 1:
+            raise ValueError('invalid chunk size')
+
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = None
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def peek(self):
+        # returns next non-whitespace character ('' at the end of stream)
+        while True:
+            self._pos = _whitespace_re.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._fill():
+                return ''
+
+    def advance(self):
+        self._pos += 1
+
+    def read_string(self):
+        search_pos = self._pos + 1
+
+        while True:
+            end = self._buffer.find('"', search_pos)
+            if end < 0:
+                search_offset = len(self._buffer) - self._pos
+                if not self._fill():
+                    raise ValueError('unterminated string')
+
+                search_pos = self._pos + search_offset
+                continue
+
+            escape_start = end
+            while self._buffer[escape_start - 1] == '\\':
+                escape_start -= 1
+
+            if (end - escape_start) % 2 == 0:
+                break
+
+            search_pos = end + 1
+
+        value, self._pos = _scanstring(self._buffer, self._pos + 1, True)
+        return value
+
+    def read_scalar(self):
+        while True:
+            end = _scalar_re.match(self._buffer, self._pos).end()
+            if end < len(self._buffer) or not self._fill():
+                break
+
+        try:
+            value, scan_end = _scan_once(self._buffer, self._pos)
+
+        except StopIteration:
+            raise ValueError('invalid value')
+
+        if scan_end != end:
+            raise ValueError('invalid value')
+
+        self._pos = end
+        return value
+
+    def read_value(self):
+        char = self.peek()
+        if char == '"':
+            return self.read_string()
+
+        if char not in ('{', '['):
+            return self.read_scalar()
+
+        while True:
+            try:
+                value, self._pos = _scan_once(self._buffer, self._pos)
+                return value
+
+            except (ValueError, StopIteration):
+                # buffer size is doubled to avoid quadratic rescanning
+                size = max(self._chunk_size, len(self._buffer) - self._pos)
+                if not self._fill(size):
+                    raise ValueError('invalid value')
+
+    def _fill(self, size=None):
+        if self._eof:
+            return False
+
+        chunk = self._stream.read(size or self._chunk_size)
+        self._eof = not chunk
+
+        if not isinstance(chunk, str):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+            chunk = self._decoder.decode(chunk, self._eof)
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+def _iter_value_events(reader):
+    # containers stack (True for objects, False for arrays)
+    stack = []
+
+    while True:
+        char = reader.peek()
+
+        if char == '{':
+            reader.advance()
+            yield EventType.START_MAP, None
+
+            if reader.peek() != '}':
+                stack.append(True)
+                yield EventType.KEY, _read_key(reader)
+                continue
+
+            reader.advance()
+            yield EventType.END_MAP, None
+
+        elif char == '[':
+            reader.advance()
+            yield EventType.START_ARRAY, None
+
+            if reader.peek() != ']':
+                stack.append(False)
+                continue
+
+            reader.advance()
+            yield EventType.END_ARRAY, None
+
+        elif char == '"':
+            yield EventType.VALUE, reader.read_string()
+
+        elif char and char not in ']},:':
+            yield EventType.VALUE, reader.read_scalar()
+
+        else:
+            raise ValueError('expecting value')
+
+        while stack:
+            char = reader.peek()
+
+            if char == ',':
+                reader.advance()
+                if stack[-1]:
+                    yield EventType.KEY, _read_key(reader)
+                break
+
+            if char == '}' and stack[-1]:
+                reader.advance()
+                stack.pop()
+                yield EventType.END_MAP, None
+
+            elif char == ']' and not stack[-1]:
+                reader.advance()
+                stack.pop()
+                yield EventType.END_ARRAY, None
+
+            else:
+                raise ValueError("expecting ',' or end of container")
+
+        else:
+            return
+
+
+def _iter_items(reader, segments):
+    for segment in segments:
+        if not _find_child(reader, segment):
+            return
+
+    if reader.peek() != '[':
+        return
+
+    reader.advance()
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.read_value()
+
+        char = reader.peek()
+        if char == ']':
+            return
+
+        if char != ',':
+            raise ValueError("expecting ',' or ']'")
+
+        reader.advance()
+
+
+def _find_child(reader, segment):
+    if segment.__class__ is str:
+        if reader.peek() != '{':
+            return False
+
+        reader.advance()
+        end = '}'
+        if reader.peek() == end:
+            return False
+
+    else:
+        if reader.peek() != '[':
+            return False
+
+        reader.advance()
+        end = ']'
+        if reader.peek() == end:
+            return False
+
+    index = 0
+    while True:
+        if end == '}':
+            if _read_key(reader) == segment:
+                return True
+
+        elif index == segment:
+            return True
+
+        for _ in _iter_value_events(reader):
+            pass
+
+        char = reader.peek()
+        if char == end:
+            return False
+
+        if char != ',':
+            raise ValueError(f"expecting ',' or '{end}'")
+
+        reader.advance()
+        index += 1
+
+
+def _read_key(reader):
+    if reader.peek() != '"':
+        raise ValueError('expecting object key')
+
+    key = reader.read_string()
+
+    if reader.peek() != ':':
+        raise ValueError("expecting ':'")
+
+    reader.advance()
+    return key
+
+
+_whitespace_re = re.compile(r'[ \t\n\r]*')
+_scalar_re = re.compile(r'[^ \t\n\r,:\[\]{}"]*')
+_scanstring = json.decoder.scanstring
+_scan_once = json.decoder.JSONDecoder().scan_once
@@ -1,12 +1,21 @@
 """JSON Path"""
 
-from collections.abc import Callable
+from collections.abc import (Callable,
+                             Iterable,
+                             Iterator)
+import bisect
 import collections
+import contextlib
+import functools
 import itertools
+import sys
+import threading
 import typing
 
 from hat import util
-from hat.json.data import Data, flatten
+from hat.json.data import Data, flatten, stats, _is_array, _is_object
+from hat.json.patch import diff
+from hat.json.persistent import PersistentArray, PersistentObject
 
 
 Path: typing.TypeAlias = int | str | typing.List['Path']
@@ -31,24 +40,7 @@ def get(data: Data,
         assert get(data, 5, default=123) == 123
 
     """
-    for i in flatten(path):
-        if isinstance(i, str):
-            if not isinstance(data, dict) or i not in data:
-                return default
-            data = data[i]
-
-        elif isinstance(i, int) and not isinstance(i, bool):
-            if not isinstance(data, list):
-                return default
-            try:
-                data = data[i]
-            except IndexError:
-                return default
-
-        else:
-            raise ValueError('invalid path')
-
-    return data
+    return _compile_path(path).get(data, default)
 
 
 def set_(data: Data,
@@ -70,122 +62,337 @@ def set_(data: Data,
         assert result == [1, 2, 3, None, 4]
 
     """
-    parents = collections.deque()
+    return _compile_path(path).set(data, value)
 
-    for i in flatten(path):
-        parent = data
 
-        if isinstance(i, str):
-            data = data.get(i) if isinstance(data, dict) else None
+def remove(data: Data,
+           path: Path
+           ) -> Data:
+    """Create new data by removing part of data referenced by path
 
-        elif isinstance(i, int) and not isinstance(i, bool):
-            try:
-                data = data[i] if isinstance(data, list) else None
-            except IndexError:
-                data = None
+    Example::
 
-        else:
-            raise ValueError('invalid path')
+        data = [1, {'a': 2, 'b': 3}, 4]
+        path = [1, 'b']
+        result = remove(data, path)
+        assert result == [1, {'a': 2}, 4]
+        assert result is not data
 
-        parents.append((parent, i))
+        data = [1, 2, 3]
+        result = remove(data, 4)
+        assert result == [1, 2, 3]
 
-    while parents:
-        parent, i = parents.pop()
+    """
+    return _compile_path(path).remove(data)
 
-        if isinstance(i, str):
-            parent = dict(parent) if isinstance(parent, dict) else {}
-            parent[i] = value
 
-        elif isinstance(i, int) and not isinstance(i, bool):
-            if not isinstance(parent, list):
-                parent = []
+def set_many(data: Data,
+             items: Iterable[tuple[Path, Data]]
+             ) -> Data:
+    """Create new data by setting multiple data path element values
 
-            if i >= len(parent):
-                parent = [*parent,
-                          *itertools.repeat(None, i - len(parent) + 1)]
+    Result is the same as result of sequential `set_` calls, but each
+    affected container is copied at most once.
 
-            elif i < 0 and (-i) > len(parent):
-                parent = [*itertools.repeat(None, (-i) - len(parent)),
-                          *parent]
+    Example::
 
-            else:
-                parent = list(parent)
+        data = {'a': [1, 2], 'b': 3}
+        result = set_many(data, [(['a', 0], 4), (['a', 1], 5), ('c', 6)])
+        assert result == {'a': [4, 5], 'b': 3, 'c': 6}
 
-            parent[i] = value
+    """
+    batch = _Batch(data)
+    for path, value in items:
+        batch.set(_compile_path(path), value)
+    return batch.data
 
-        else:
-            raise ValueError('invalid path')
 
-        value = parent
+def remove_many(data: Data,
+                paths: Iterable[Path]
+                ) -> Data:
+    """Create new data by removing multiple parts of data referenced by paths
 
-    return value
+    Result is the same as result of sequential `remove` calls, but each
+    affected container is copied at most once.
 
+    Example::
+
+        data = {'a': [1, 2, 3], 'b': 4}
+        result = remove_many(data, [['a', 0], ['a', 0], 'b'])
+        assert result == {'a': [3]}
+
+    """
+    batch = _Batch(data)
+    for path in paths:
+        batch.remove(_compile_path(path))
+    return batch.data
 
-def remove(data: Data,
-           path: Path
-           ) -> Data:
-    """Create new data by removing part of data referenced by path
+
+def compile_path(path: Path) -> 'CompiledPath':
+    """Compile path
+
+    Path is validated and flattened only once. Compiled paths are cached
+    (module level functions `get`, `set_` and `remove` use same cache).
 
     Example::
 
-        data = [1, {'a': 2, 'b': 3}, 4]
-        path = [1, 'b']
-        result = remove(data, path)
-        assert result == [1, {'a': 2}, 4]
-        assert result is not data
+        path = compile_path(['a', [0, 'b']])
+        assert path.segments == ['a', 0, 'b']
+        assert path.get({'a': [{'b': 1}]}) == 1
 
-        data = [1, 2, 3]
-        result = remove(data, 4)
-        assert result == [1, 2, 3]
+    """
+    return _compile_path(path)
+
+
+class CompiledPath:
+    """Compiled path
+
+    Instances should be created with `compile_path`.
+
+    Raises:
+        ValueError: invalid path
 
     """
-    result = data
-    parents = collections.deque()
 
-    for i in flatten(path):
-        parent = data
+    def __init__(self, path: Path):
+        segments = []
 
-        if isinstance(i, str):
-            if not isinstance(data, dict) or i not in data:
-                return result
-            data = data[i]
+        for i in flatten(path):
+            if isinstance(i, str):
+                segments.append(str.__str__(i))
 
-        elif isinstance(i, int) and not isinstance(i, bool):
-            if not isinstance(data, list):
-                return result
-            try:
+            elif isinstance(i, int) and not isinstance(i, bool):
+                segments.append(int(i))
+
+            else:
+                raise ValueError('invalid path')
+
+        self._segments = tuple(segments)
+
+    @property
+    def segments(self) -> list[str | int]:
+        """Flattened path segments"""
+        return list(self._segments)
+
+    def get(self,
+            data: Data,
+            default: Data | None = None
+            ) -> Data:
+        """Get data element referenced by path"""
+        for i in self._segments:
+            if i.__class__ is str:
+                if data.__class__ is dict:
+                    data = data.get(i, _missing)
+                    if data is _missing:
+                        return default
+
+                elif _is_object(data) and i in data:
+                    data = data[i]
+
+                else:
+                    return default
+
+            else:
+                if data.__class__ is not list and not _is_array(data):
+                    return default
+
+                try:
+                    data = data[i]
+
+                except IndexError:
+                    return default
+
+        return data
+
+    def set(self,
+            data: Data,
+            value: Data
+            ) -> Data:
+        """Create new data by setting data path element value"""
+        parents = collections.deque()
+
+        for i in self._segments:
+            parent = data
+
+            if i.__class__ is str:
+                data = data.get(i) if _is_object(data) else None
+
+            else:
+                try:
+                    data = data[i] if _is_array(data) else None
+                except IndexError:
+                    data = None
+
+            parents.append((parent, i))
+
+        while parents:
+            parent, i = parents.pop()
+
+            if i.__class__ is str:
+                if isinstance(parent, PersistentObject):
+                    parent = parent.set(i, value)
+
+                else:
+                    parent = dict(parent) if _is_object(parent) else {}
+                    parent[i] = value
+
+            elif isinstance(parent, PersistentArray):
+                if i >= len(parent):
+                    parent = parent.extend(
+                        itertools.repeat(None, i - len(parent)))
+
+                elif i < 0 and (-i) > len(parent):
+                    parent = PersistentArray([
+                        *itertools.repeat(None, (-i) - len(parent)),
+                        *parent])
+
+                parent = parent.set(i, value)
+
+            else:
+                if not _is_array(parent):
+                    parent = []
+
+                if i >= len(parent):
+                    parent = [*parent,
+                              *itertools.repeat(None, i - len(parent) + 1)]
+
+                elif i < 0 and (-i) > len(parent):
+                    parent = [*itertools.repeat(None, (-i) - len(parent)),
+                              *parent]
+
+                else:
+                    parent = list(parent)
+
+                parent[i] = value
+
+            value = parent
+
+        return value
+
+    def remove(self, data: Data) -> Data:
+        """Create new data by removing part of data referenced by path"""
+        result = data
+        parents = collections.deque()
+
+        for i in self._segments:
+            parent = data
+
+            if i.__class__ is str:
+                if not _is_object(data) or i not in data:
+                    return result
                 data = data[i]
-            except IndexError:
-                return result
 
-        else:
-            raise ValueError('invalid path')
+            else:
+                if not _is_array(data):
+                    return result
+                try:
+                    data = data[i]
+                except IndexError:
+                    return result
 
-        parents.append((parent, i))
+            parents.append((parent, i))
 
-    result = None
+        result = None
 
-    while parents:
-        parent, i = parents.pop()
+        while parents:
+            parent, i = parents.pop()
 
-        if isinstance(i, str):
-            parent = dict(parent)
+            if isinstance(parent, (PersistentObject, PersistentArray)):
+                result = (parent.remove(i) if result is None
+                          else parent.set(i, result))
+                continue
 
-        elif isinstance(i, int) and not isinstance(i, bool):
-            parent = list(parent)
+            parent = dict(parent) if i.__class__ is str else list(parent)
 
-        else:
-            raise ValueError('invalid path')
+            if result is None:
+                del parent[i]
 
-        if result is None:
-            del parent[i]
+            else:
+                parent[i] = result
 
-        else:
-            parent[i] = result
+            result = parent
+
+        return result
+
+
+def create_selector(inputs: Iterable['Path | MemoizedSelector'],
+                    fn: Callable[..., Data]
+                    ) -> 'MemoizedSelector':
+    """Create memoized selector
+
+    Selector calculates data derived from input data referenced by `inputs`
+    paths (or results of other selectors), by calling `fn` with input data
+    as positional arguments. Result is cached and `fn` is called again only
+    if any of input data is not identical to input data of cached result.
+    Because `set_` and `remove` reuse unchanged parts of data, unrelated
+    changes don't cause recalculation.
+
+    Example::
+
+        total = create_selector(['items'], lambda items: sum(items))
+        count = create_selector([total, 'items'],
+                                lambda total, items: (total, len(items)))
+
+        data = {'items': [1, 2, 3], 'x': 1}
+        assert count.get(data) == (6, 3)
+
+        data = set_(data, 'x', 2)
+        assert count.get(data) == (6, 3)
+        assert (total.hits, total.misses) == (1, 1)
+
+    Raises:
+        ValueError: invalid path
 
-        result = parent
+    """
+    return MemoizedSelector(inputs, fn)
+
+
+class MemoizedSelector:
+    """Memoized selector
+
+    Instances should be created with `create_selector`. Only the latest
+    result is cached.
+
+    """
+
+    def __init__(self,
+                 inputs: Iterable['Path | MemoizedSelector'],
+                 fn: Callable[..., Data]):
+        self._inputs = [(i if isinstance(i, MemoizedSelector)
+                         else _compile_path(i))
+                        for i in inputs]
+        self._fn = fn
+        self._cache = None
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """Number of results obtained from cache"""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """Number of results calculated with selector function"""
+        return self._misses
 
-    return result
+    def get(self, data: Data) -> Data:
+        """Get selector result for data"""
+        args = tuple(i.get(data) for i in self._inputs)
+
+        # cache is replaced as single tuple (safe with concurrent readers)
+        cache = self._cache
+        if cache is not None:
+            cached_args, result = cache
+
+            if all(i is j for i, j in zip(args, cached_args)):
+                self._hits += 1
+                return result
+
+        self._misses += 1
+        result = self._fn(*args)
+        self._cache = args, result
+        return result
 
 
 class Storage:
@@ -194,33 +401,937 @@ class Storage:
     Helper class representing observable JSON data state manipulated with
     path based get/set/remove functions.
 
+    Each committed change (or transaction) creates new data version. If
+    `history_size` is greater than 0, up to `history_size` previous versions
+    are kept in history. Because `set_` and `remove` reuse unchanged parts of
+    data, history retains only changed parts of previous versions. If
+    `history_memory` is set, oldest versions are evicted from history when
+    estimated memory retained by history (`history_memory_usage`) exceeds
+    `history_memory` bytes.
+
+    Storage is thread-safe. Changes (including transactions) are serialized
+    with reentrant lock and callbacks are notified, in order of changes, by
+    thread which made the change (while holding the lock). Changes made by
+    callbacks are notified after notification of current change is
+    finished. Reading of `data` and `get` doesn't acquire the lock - readers
+    always obtain data of last committed change (except thread executing
+    transaction, which obtains data including uncommitted changes).
+
+    Example::
+
+        storage = Storage({'a': 1}, history_size=10)
+        storage.set('a', 2)
+        storage.set('b', 3)
+
+        assert storage.versions == [0, 1, 2]
+        assert storage.at(1) == {'a': 2}
+
+        storage.undo()
+        assert storage.data == {'a': 2}
+        assert storage.versions == [0, 1]
+
     """
 
-    def __init__(self, data: Data = None):
+    def __init__(self,
+                 data: Data = None,
+                 *,
+                 history_size: int = 0,
+                 history_memory: int | None = None):
         self._data = data
-        self._change_cbs = util.CallbackRegistry()
+        self._lock = threading.RLock()
+        self._version = 0
+        self._next_version = 1
+        self._history = collections.deque()
+        self._history_size = history_size
+        self._history_memory = history_memory
+        self._history_memory_usage = 0
+        self._subscriptions = _SubscriptionNode()
+        self._transaction_depth = 0
+        self._transaction_changes = []
+        self._transaction_removals = []
+        self._transaction_patch = []
+        self._transaction_data = None
+        self._transaction_thread = None
+        self._patch_cbs = []
+        self._indexes = {}
+        self._notifications = collections.deque()
+        self._notifying = False
 
     @property
     def data(self) -> Data:
         """Data"""
+        if self._transaction_thread == threading.get_ident():
+            return self._transaction_data
+
         return self._data
 
+    @property
+    def version(self) -> int:
+        """Current data version"""
+        return self._version
+
+    @property
+    def versions(self) -> list[int]:
+        """Available data versions (including current version)"""
+        with self._lock:
+            return [*(version for version, _, _ in self._history),
+                    self._version]
+
+    @property
+    def history_memory_usage(self) -> int:
+        """Estimated memory size (in bytes) retained only by history
+
+        Estimation is calculated incrementally, based on parts of data
+        replaced by each change, and doesn't take into account data shared
+        between multiple history versions.
+
+        """
+        return self._history_memory_usage
+
+    def at(self, version: int) -> Data:
+        """Get data at version
+
+        Raises:
+            ValueError: version not available
+
+        """
+        with self._lock:
+            if version == self._version:
+                return self._data
+
+            i = bisect.bisect_left(self._history, version,
+                                   key=lambda i: i[0])
+            if i >= len(self._history) or self._history[i][0] != version:
+                raise ValueError('version not available')
+
+            return self._history[i][1]
+
+    def undo(self):
+        """Revert data to previous version
+
+        Current version is discarded and previous version becomes current
+        version.
+
+        Raises:
+            ValueError: history is empty or transaction in progress
+
+        """
+        with self._lock:
+            if self._transaction_depth:
+                raise ValueError('transaction in progress')
+
+            if not self._history:
+                raise ValueError('history is empty')
+
+            old_data = self._data
+            self._prepare_commit(old_data, self._history[-1][1], [()], None)
+
+            self._version, self._data, memory = self._history.pop()
+            self._history_memory_usage -= memory
+
+            self._update_indexes(self._data, [()], [])
+            self._on_commit(old_data, self._data, [()], None)
+            self._notify(old_data, self._data, [()], None)
+
     def register_change_cb(self,
-                           cb: Callable[[Data], None]
+                           cb: Callable[[Data], None],
+                           path: Path = []
                            ) -> util.RegisterCallbackHandle:
-        """Register data change callback"""
-        return self._change_cbs.register(cb)
+        """Register data change callback
+
+        Callback registered with empty path is notified with new data on
+        each change. Callback registered with non empty path is notified
+        with data referenced by path (``None`` if data doesn't exist) only
+        if referenced data is not identical to previously referenced data.
+        Because `set_` and `remove` reuse unchanged parts of data, only
+        callbacks with paths referencing changed data are notified.
+
+        Example::
+
+            storage = Storage({'a': {'b': 1}, 'c': 2})
+            a_data = []
+            c_data = []
+
+            storage.register_change_cb(a_data.append, 'a')
+            storage.register_change_cb(c_data.append, 'c')
+            storage.set(['a', 'b'], 3)
+
+            assert a_data == [{'b': 3}]
+            assert c_data == []
+
+        """
+        segments = _compile_path(path)._segments
+
+        with self._lock:
+            nodes = [self._subscriptions]
+            for segment in segments:
+                children = nodes[-1].get_children(segment)
+                node = children.get(segment)
+                if node is None:
+                    node = children[segment] = _SubscriptionNode()
+                nodes.append(node)
+
+            nodes[-1].cbs.append(cb)
+
+        def cancel():
+            with self._lock:
+                nodes[-1].cbs.remove(cb)
+
+                for i in reversed(range(len(segments))):
+                    node = nodes[i + 1]
+                    if node.cbs or node.keys or node.indexes:
+                        break
+
+                    children = nodes[i].get_children(segments[i])
+                    if children.get(segments[i]) is node:
+                        del children[segments[i]]
+
+        return util.RegisterCallbackHandle(cancel)
+
+    def register_patch_cb(self,
+                          cb: Callable[[Data, Data], None]
+                          ) -> util.RegisterCallbackHandle:
+        """Register data patch callback
+
+        Callback is notified with new data and JSON Patch (RFC 6902)
+        operations which transform previous data into new data. Operations
+        are generated based on changed paths (without comparison of whole
+        data). Operations of all changes made during transaction are
+        concatenated.
+
+        Example::
+
+            storage = Storage({'a': [1]})
+            patches = []
+
+            storage.register_patch_cb(lambda _, ops: patches.append(ops))
+            storage.set(['a', 1], 2)
+
+            assert patches == [[{'op': 'add', 'path': '/a/1', 'value': 2}]]
+
+        """
+        with self._lock:
+            self._patch_cbs.append(cb)
+
+        def cancel():
+            with self._lock:
+                self._patch_cbs.remove(cb)
+
+        return util.RegisterCallbackHandle(cancel)
+
+    def add_index(self, path: Path, key: Path):
+        """Add secondary index
+
+        Index maps values referenced by `key` (relative to each element of
+        array or object referenced by `path`) to elements containing these
+        values. Only string, number, boolean and null values are indexed.
+
+        Index is updated incrementally with each committed change, based on
+        changed paths. Changes which can shift array elements (removal of
+        array elements or changes of parents referenced by `path`) cause
+        rebuild of index.
+
+        Example::
+
+            storage = Storage({'devices': [{'id': 'a', 'x': 1},
+                                           {'id': 'b', 'x': 2}]})
+            storage.add_index('devices', 'id')
+
+            assert storage.index_get('devices', 'id', 'b') == (
+                {'id': 'b', 'x': 2}, ['devices', 1])
+
+            storage.set(['devices', 2], {'id': 'c', 'x': 3})
+            assert storage.index_get('devices', 'id', 'c') == (
+                {'id': 'c', 'x': 3}, ['devices', 2])
+
+        """
+        index_key = _get_index_key(path, key)
+
+        with self._lock:
+            if index_key in self._indexes:
+                return
+
+            index = _Index(*index_key)
+            index.rebuild(self._data)
+            self._indexes[index_key] = index
+
+    def remove_index(self, path: Path, key: Path):
+        """Remove secondary index"""
+        with self._lock:
+            self._indexes.pop(_get_index_key(path, key), None)
+
+    def index_get(self,
+                  path: Path,
+                  key: Path,
+                  value: Data
+                  ) -> tuple[Data, Path] | None:
+        """Get element and its path based on secondary index
+
+        If multiple elements contain the same `value`, element with lowest
+        array index (or lowest object key) is returned. If element
+        doesn't exist, ``None`` is returned. Index is based on committed data
+        (changes made during transaction are not visible until transaction
+        is committed).
+
+        Raises:
+            ValueError: index doesn't exist
+
+        """
+        index_key = _get_index_key(path, key)
+
+        with self._lock:
+            index = self._indexes.get(index_key)
+            if not index:
+                raise ValueError("index doesn't exist")
+
+            return index.get(value)
 
     def get(self, path: Path, default: Data | None = None):
         """Get data"""
-        return get(self._data, path, default)
+        return get(self.data, path, default)
+
+    def select(self, selector: MemoizedSelector) -> Data:
+        """Get selector result for current data"""
+        return selector.get(self.data)
 
     def set(self, path: Path, value: Data):
         """Set data"""
-        self._data = set_(self._data, path, value)
-        self._change_cbs.notify(self._data)
+        path = _compile_path(path)
+
+        with self._lock:
+            data = self.data
+            ops = (_get_set_ops(data, path._segments, value)
+                   if self._is_patch_required() else None)
+            self._update(path.set(data, value), path._segments, ops)
 
     def remove(self, path: Path):
         """Remove data"""
-        self._data = remove(self._data, path)
-        self._change_cbs.notify(self._data)
+        path = _compile_path(path)
+
+        with self._lock:
+            data = self.data
+            ops = (_get_remove_ops(data, path._segments)
+                   if self._is_patch_required() else None)
+            self._update(path.remove(data), path._segments, ops, True)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Transaction context
+
+        Change callbacks are not notified during transaction. If data was
+        changed, change callbacks are notified only once when outermost
+        transaction is committed. If exception is raised, all changes made
+        during transaction are discarded.
+
+        Other threads can't change data during transaction and don't obtain
+        uncommitted changes.
+
+        Example::
+
+            storage = Storage({'a': 1})
+
+            with storage.transaction():
+                storage.set('a', 2)
+                storage.set('b', 3)
+
+            assert storage.data == {'a': 2, 'b': 3}
+
+        """
+        with self._lock:
+            if not self._transaction_depth:
+                self._transaction_data = self._data
+                self._transaction_thread = threading.get_ident()
+
+            data = self._transaction_data
+            changes_count = len(self._transaction_changes)
+            removals_count = len(self._transaction_removals)
+            patch = self._transaction_patch
+            patch_count = len(patch) if patch is not None else 0
+            self._transaction_depth += 1
+
+            try:
+                yield
+
+            except BaseException:
+                self._transaction_data = data
+                del self._transaction_changes[changes_count:]
+                del self._transaction_removals[removals_count:]
+                if patch is not None:
+                    del patch[patch_count:]
+                self._transaction_patch = patch
+                raise
+
+            finally:
+                self._transaction_depth -= 1
+                if not self._transaction_depth:
+                    data, self._transaction_data = (self._transaction_data,
+                                                    None)
+                    self._transaction_thread = None
+
+            if self._transaction_depth or not self._transaction_changes:
+                return
+
+            changes, self._transaction_changes = self._transaction_changes, []
+            removals, self._transaction_removals = (
+                self._transaction_removals, [])
+            ops, self._transaction_patch = self._transaction_patch, []
+            self._prepare_commit(self._data, data, changes, ops)
+
+            old_data, self._data = self._data, data
+            self._add_version(old_data, changes)
+            self._update_indexes(data, changes, removals)
+            self._on_commit(old_data, data, changes, ops)
+            self._notify(old_data, data, changes, ops)
+
+    def _update(self, data, segments, ops, removal=False):
+        removals = [segments] if removal else []
+
+        if not self._transaction_depth:
+            self._prepare_commit(self._data, data, [segments], ops)
+
+            old_data, self._data = self._data, data
+            self._add_version(old_data, [segments])
+            self._update_indexes(data, [segments], removals)
+            self._on_commit(old_data, data, [segments], ops)
+            self._notify(old_data, data, [segments], ops)
+            return
+
+        self._transaction_data = data
+        self._transaction_changes.append(segments)
+        self._transaction_removals.extend(removals)
+
+        # None represents unknown operations (patch callback was registered
+        # during transaction)
+        if self._transaction_patch is None:
+            pass
+
+        elif ops is None:
+            self._transaction_patch = None
+
+        else:
+            self._transaction_patch.extend(ops)
+
+    def _is_patch_required(self):
+        return bool(self._patch_cbs)
+
+    def _prepare_commit(self, old_data, new_data, changes, ops):
+        # called with each change before it is committed (if exception is
+        # raised, change is discarded)
+        pass
+
+    def _on_commit(self, old_data, new_data, changes, ops):
+        # called with each committed change, before callbacks are notified
+        pass
+
+    def _update_indexes(self, data, changes, removals):
+        for index in self._indexes.values():
+            index.update(data, changes, removals)
+
+    def _add_version(self, old_data, changes):
+        if self._history_size > 0:
+            memory = _get_history_memory(old_data, changes)
+            self._history.append((self._version, old_data, memory))
+            self._history_memory_usage += memory
+
+            while (len(self._history) > self._history_size or
+                    (self._history_memory is not None and
+                     self._history_memory_usage > self._history_memory)):
+                _, _, memory = self._history.popleft()
+                self._history_memory_usage -= memory
+
+        self._version = self._next_version
+        self._next_version += 1
+
+    def _notify(self, old_data, new_data, changes, ops):
+        # changes made by callbacks are queued and notified by outermost
+        # notifying call - callbacks are notified in order of changes (if
+        # callback raises exception, remaining queued changes are notified
+        # with next change)
+        self._notifications.append((old_data, new_data, changes, ops))
+        if self._notifying:
+            return
+
+        self._notifying = True
+
+        try:
+            while self._notifications:
+                self._notify_cbs(*self._notifications.popleft())
+
+        finally:
+            self._notifying = False
+
+    def _notify_cbs(self, old_data, new_data, changes, ops):
+        for cb in list(self._subscriptions.cbs):
+            cb(new_data)
+
+        if old_data is not new_data:
+            self._notify_subscriptions(old_data, new_data, changes)
+
+        if self._patch_cbs:
+            if ops is None:
+                ops = diff(old_data, new_data)
+
+            for cb in list(self._patch_cbs):
+                cb(new_data, ops)
+
+    def _notify_subscriptions(self, old_data, new_data, changes):
+
+        stack = [(self._subscriptions, old_data, new_data,
+                  _create_change_tree(changes))]
+
+        while stack:
+            node, old_data, new_data, change_tree = stack.pop()
+
+            if node is not self._subscriptions:
+                for cb in list(node.cbs):
+                    cb(None if new_data is _missing else new_data)
+
+            # object keys not referenced by changed paths are not affected
+            if change_tree is None:
+                children = [*node.keys.items(), *node.indexes.items()]
+
+            else:
+                children = [*((key, node.keys[key]) for key in change_tree
+                              if key in node.keys),
+                            *node.indexes.items()]
+
+            for segment, child in reversed(children):
+                old_child = _get_child(old_data, segment)
+                new_child = _get_child(new_data, segment)
+                if old_child is new_child:
+                    continue
+
+                child_change_tree = (change_tree[segment]
+                                     if change_tree is not None and
+                                     segment.__class__ is str
+                                     else None)
+                stack.append((child, old_child, new_child, child_change_tree))
+
+
+class _SubscriptionNode:
+
+    def __init__(self):
+        self.cbs = []
+        self.keys = {}
+        self.indexes = {}
+
+    def get_children(self, segment):
+        return self.keys if segment.__class__ is str else self.indexes
+
+
+class _Index:
+
+    def __init__(self, segments, key):
+        self._segments = segments
+        self._key = key
+        self._container = None
+        self._is_array = False
+        self._entries = {}
+        self._values = {}
+
+    def get(self, value):
+        entry = self._entries.get(_get_index_value(value))
+        if not entry:
+            return
+
+        child_segment = min(entry)
+        return (self._container[child_segment],
+                [*self._segments, child_segment])
+
+    def rebuild(self, data):
+        self._container = _get_segments(data, self._segments)
+        self._is_array = False
+        self._entries = {}
+        self._values = {}
+
+        if _is_object(self._container):
+            child_segments = self._container.keys()
+
+        elif _is_array(self._container):
+            self._is_array = True
+            child_segments = range(len(self._container))
+
+        else:
+            return
+
+        for child_segment in child_segments:
+            self._add(child_segment)
+
+    def update(self, data, changes, removals):
+        container = _get_segments(data, self._segments)
+        if container is self._container:
+            return
+
+        child_segments = self._get_changed_child_segments(container, changes,
+                                                          removals)
+        if child_segments is None:
+            self.rebuild(data)
+            return
+
+        self._container = container
+        for child_segment in child_segments:
+            self._remove(child_segment)
+            self._add(child_segment)
+
+    def _get_changed_child_segments(self, container, changes, removals):
+        # None represents changes which require rebuild
+        if self._is_array:
+            if not _is_array(container):
+                return
+
+            if len(container) < len(self._container):
+                return
+
+            # removal of array element shifts all following elements (even
+            # if array length is restored by other changes)
+            for removal in removals:
+                if self._is_child(removal):
+                    return
+
+        elif not _is_object(container) or not _is_object(self._container):
+            return
+
+        segments_len = len(self._segments)
+        child_segments = set()
+
+        for change in changes:
+            for segment, change_segment in zip(self._segments, change):
+                if segment != change_segment:
+                    break
+
+            else:
+                if len(change) <= segments_len:
+                    return
+
+                child_segment = change[segments_len]
+                if self._is_array:
+                    if child_segment.__class__ is str or child_segment < 0:
+                        return
+
+                elif child_segment.__class__ is not str:
+                    return
+
+                child_segments.add(child_segment)
+                continue
+
+            if change_segment.__class__ is not str:
+                return
+
+        if self._is_array:
+            child_segments.update(range(len(self._container),
+                                        len(container)))
+
+        return child_segments
+
+    def _is_child(self, segments):
+        if len(segments) != len(self._segments) + 1:
+            return False
+
+        return all(segment == i for segment, i in zip(self._segments,
+                                                      segments))
+
+    def _add(self, child_segment):
+        child = _get_child(self._container, child_segment)
+        if child is _missing:
+            return
+
+        value = _get_segments(child, self._key)
+        value = _get_index_value(value)
+        if value is None:
+            return
+
+        self._entries.setdefault(value, {})[child_segment] = None
+        self._values[child_segment] = value
+
+    def _remove(self, child_segment):
+        value = self._values.pop(child_segment, None)
+        if value is None:
+            return
+
+        entry = self._entries[value]
+        del entry[child_segment]
+        if not entry:
+            del self._entries[value]
+
+
+_missing = object()
+
+
+def _compile_path(path):
+    try:
+        if path.__class__ is list:
+            return _compile_cached_path(tuple(path), tuple(map(type, path)))
+
+        return _compile_cached_path((path, ), (type(path), ))
+
+    except TypeError:
+        return CompiledPath(path)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_cached_path(key, types):
+    return CompiledPath(list(key))
+
+
+class _Batch:
+
+    def __init__(self, data):
+        self._data = data
+        self._owned = {}
+
+    @property
+    def data(self):
+        return self._data
+
+    def set(self, path, value):
+        segments = path._segments
+        if not segments:
+            self._data = value
+            return
+
+        if isinstance(self._data, (PersistentObject, PersistentArray)):
+            self._data = path.set(self._data, value)
+            return
+
+        self._data = parent = self._own(self._data, segments[0])
+
+        for depth, i in enumerate(segments):
+            if i.__class__ is not str:
+                _pad_array(parent, i)
+
+            if depth == len(segments) - 1:
+                parent[i] = value
+                break
+
+            child = (parent.get(i) if i.__class__ is str else parent[i])
+
+            if isinstance(child, (PersistentObject, PersistentArray)):
+                rest = CompiledPath(list(segments[depth + 1:]))
+                parent[i] = rest.set(child, value)
+                break
+
+            parent[i] = parent = self._own(child, segments[depth + 1])
+
+    def remove(self, path):
+        segments = path._segments
+        if not segments:
+            self._data = None
+            return
+
+        if get(self._data, list(segments), _missing) is _missing:
+            return
+
+        if isinstance(self._data, (PersistentObject, PersistentArray)):
+            self._data = path.remove(self._data)
+            return
+
+        self._data = parent = self._own(self._data, segments[0])
+
+        for depth, i in enumerate(segments):
+            if depth == len(segments) - 1:
+                del parent[i]
+                break
+
+            child = parent[i]
+
+            if isinstance(child, (PersistentObject, PersistentArray)):
+                rest = CompiledPath(list(segments[depth + 1:]))
+                parent[i] = rest.remove(child)
+                break
+
+            parent[i] = parent = self._own(child, segments[depth + 1])
+
+    def _own(self, data, segment):
+        owned = self._owned.get(id(data))
+        if owned is not None and owned is data:
+            if segment.__class__ is str:
+                if owned.__class__ is dict:
+                    return owned
+
+            elif owned.__class__ is list:
+                return owned
+
+        if segment.__class__ is str:
+            data = dict(data) if _is_object(data) else {}
+
+        else:
+            data = list(data) if _is_array(data) else []
+
+        self._owned[id(data)] = data
+        return data
+
+
+def _pad_array(data, i):
+    if i >= len(data):
+        data.extend(itertools.repeat(None, i - len(data) + 1))
+
+    elif i < 0 and (-i) > len(data):
+        data[:0] = itertools.repeat(None, (-i) - len(data))
+
+
+def _create_change_tree(changes):
+    # nested dicts referencing changed object keys where None represents
+    # changed subtree
+    tree = {}
+
+    for segments in changes:
+        parent, key, node = None, None, tree
+
+        for segment in segments:
+            if node is None or segment.__class__ is not str:
+                break
+
+            parent, key = node, segment
+            node = parent[key] = node.get(segment, {})
+
+        if node is None:
+            continue
+
+        if parent is None:
+            return
+
+        parent[key] = None
+
+    return tree
+
+
+def _get_history_memory(data, changes):
+    # containers on changed paths are copied and replaced data is retained
+    # only by previous version
+    memory = 0
+
+    for segments in changes:
+        node = data
+
+        for segment in segments:
+            memory += sys.getsizeof(node)
+            node = _get_child(node, segment)
+            if node is _missing:
+                break
+
+        else:
+            memory += stats(node).size
+
+    return memory
+
+
+def _get_set_ops(data, segments, value):
+    root = data
+
+    for depth, segment in enumerate(segments):
+        if segment.__class__ is str:
+            if not _is_object(data):
+                break
+
+            if segment not in data:
+                rest = CompiledPath(list(segments[depth + 1:]))
+                return [{'op': 'add',
+                         'path': _encode_pointer(root, segments[:depth + 1]),
+                         'value': rest.set(None, value)}]
+
+            data = data[segment]
+            continue
+
+        if not _is_array(data):
+            break
+
+        if -len(data) <= segment < len(data):
+            data = data[segment]
+            continue
+
+        rest = CompiledPath(list(segments[depth + 1:]))
+        pointer = _encode_pointer(root, segments[:depth])
+
+        if segment >= 0:
+            return [*({'op': 'add',
+                       'path': f'{pointer}/{i}',
+                       'value': None} for i in range(len(data), segment)),
+                    {'op': 'add',
+                     'path': f'{pointer}/{segment}',
+                     'value': rest.set(None, value)}]
+
+        return [*({'op': 'add',
+                   'path': f'{pointer}/0',
+                   'value': None} for _ in range(-segment - len(data) - 1)),
+                {'op': 'add',
+                 'path': f'{pointer}/0',
+                 'value': rest.set(None, value)}]
+
+    else:
+        return [{'op': 'replace',
+                 'path': _encode_pointer(root, segments),
+                 'value': value}]
+
+    # data referenced by segments[:depth] is replaced with new container
+    rest = CompiledPath(list(segments[depth:]))
+    return [{'op': 'replace',
+             'path': _encode_pointer(root, segments[:depth]),
+             'value': rest.set(data, value)}]
+
+
+def _get_remove_ops(data, segments):
+    if not segments:
+        return [{'op': 'replace', 'path': '', 'value': None}]
+
+    if get(data, list(segments), _missing) is _missing:
+        return []
+
+    return [{'op': 'remove', 'path': _encode_pointer(data, segments)}]
+
+
+def _encode_pointer(data, segments):
+    # data is used for normalization of negative array indexes
+    pointer = collections.deque()
+
+    for depth, segment in enumerate(segments):
+        if segment.__class__ is str:
+            pointer.append(segment.replace('~', '~0').replace('/', '~1'))
+
+        else:
+            if segment < 0:
+                segment += len(data)
+            pointer.append(str(segment))
+
+        if depth < len(segments) - 1:
+            data = data[segment]
+
+    return ''.join(f'/{i}' for i in pointer)
+
+
+def _get_index_key(path, key):
+    return _compile_path(path)._segments, _compile_path(key)._segments
+
+
+def _get_index_value(value):
+    # bool and numbers are not equal in JSON
+    if value is None or isinstance(value, (str, int, float)):
+        return isinstance(value, bool), value
+
+
+def _get_segments(data, segments):
+    for segment in segments:
+        data = _get_child(data, segment)
+        if data is _missing:
+            break
+
+    return data
+
+
+def _get_child(data, segment):
+    if segment.__class__ is str:
+        if data.__class__ is dict:
+            return data.get(segment, _missing)
+
+        if _is_object(data):
+            return data[segment] if segment in data else _missing
+
+        return _missing
+
+    if not _is_array(data):
+        return _missing
+
+    try:
+        return data[segment]
+
+    except IndexError:
+        return _missing
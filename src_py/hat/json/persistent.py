@@ -0,0 +1,589 @@
+"""Persistent JSON data structures
+
+Persistent object and array are immutable implementations of JSON Object and
+JSON Array. Operations which "modify" persistent data create new instances
+which share unchanged parts of internal structure with original instances.
+
+`PersistentObject` is based on hash array mapped trie (with insertion
+ordered `PersistentArray` of entries) and `PersistentArray` is based on
+32-way vector trie with tail buffer. Getting, setting and removing
+(amortized) of object keys and getting, setting, appending and removing of
+last array elements have O(log32(n)) complexity.
+
+"""
+
+from collections.abc import (ItemsView,
+                             Iterable,
+                             Iterator,
+                             Mapping,
+                             Sequence)
+import itertools
+import typing
+
+from hat.json.data import Data, clone
+
+
+class PersistentObject(Mapping):
+    """Persistent JSON Object
+
+    Iteration order of object keys is insertion order (same as `dict`).
+    Setting value of existing key doesn't change its position.
+
+    Example::
+
+        x = PersistentObject({'a': 1})
+        y = x.set('b', 2)
+        assert dict(x) == {'a': 1}
+        assert dict(y) == {'a': 1, 'b': 2}
+
+    """
+
+    def __init__(self,
+                 items: Mapping[str, Data] | Iterable[tuple[str, Data]] = ()):
+        root = None
+        leaves = []
+
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        for key, value in items:
+            h = _hash(key)
+            leaf = _hamt_get(root, h, key)
+
+            if leaf is None:
+                leaf = _Leaf(h, key, value, len(leaves))
+                leaves.append(leaf)
+
+            else:
+                leaf = _Leaf(h, key, value, leaf.index)
+                leaves[leaf.index] = leaf
+
+            root = _hamt_set(root, leaf, 0)
+
+        self._root = root
+        self._count = len(leaves)
+        self._leaves = PersistentArray(leaves)
+
+    def __getitem__(self, key: str) -> Data:
+        leaf = _hamt_get(self._root, _hash(key), key)
+        if leaf is None:
+            raise KeyError(key)
+
+        return leaf.value
+
+    def __contains__(self, key: typing.Any) -> bool:
+        return _hamt_get(self._root, _hash(key), key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for leaf in self._leaves:
+            if leaf is not _missing:
+                yield leaf.key
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        return f'PersistentObject({dict(self.items())!r})'
+
+    def get(self, key: str, default: Data | None = None) -> Data:
+        leaf = _hamt_get(self._root, _hash(key), key)
+        return default if leaf is None else leaf.value
+
+    def items(self) -> Iterable[tuple[str, Data]]:
+        return _PersistentObjectItems(self)
+
+    def set(self, key: str, value: Data) -> 'PersistentObject':
+        """Create new object with key set to value"""
+        h = _hash(key)
+        leaf = _hamt_get(self._root, h, key)
+
+        if leaf is None:
+            leaf = _Leaf(h, key, value, len(self._leaves))
+            return self._create(_hamt_set(self._root, leaf, 0),
+                                self._count + 1,
+                                self._leaves.append(leaf))
+
+        if leaf.value is value:
+            return self
+
+        leaf = _Leaf(h, key, value, leaf.index)
+        return self._create(_hamt_set(self._root, leaf, 0),
+                            self._count,
+                            self._leaves.set(leaf.index, leaf))
+
+    def remove(self, key: str) -> 'PersistentObject':
+        """Create new object without key
+
+        If key doesn't exist, same instance is returned.
+
+        """
+        h = _hash(key)
+        leaf = _hamt_get(self._root, h, key)
+        if leaf is None:
+            return self
+
+        root = _hamt_remove(self._root, h, key, 0)
+        count = self._count - 1
+
+        # removed leaves are replaced with placeholders which are discarded
+        # when they outnumber remaining leaves
+        if leaf.index == len(self._leaves) - 1:
+            leaves = self._leaves.remove()
+
+        else:
+            leaves = self._leaves.set(leaf.index, _missing)
+
+        if len(leaves) - count > max(count, _width):
+            return PersistentObject((i.key, i.value) for i in leaves
+                                    if i is not _missing)
+
+        return self._create(root, count, leaves)
+
+    @classmethod
+    def _create(cls, root, count, leaves):
+        obj = cls.__new__(cls)
+        obj._root = root
+        obj._count = count
+        obj._leaves = leaves
+        return obj
+
+
+class PersistentArray(Sequence):
+    """Persistent JSON Array
+
+    Removing of elements which are not last elements requires creation of
+    new internal structure (O(n) complexity).
+
+    Example::
+
+        x = PersistentArray([1, 2])
+        y = x.append(3)
+        assert list(x) == [1, 2]
+        assert list(y) == [1, 2, 3]
+
+    """
+
+    def __init__(self, items: Iterable[Data] = ()):
+        items = list(items)
+        count = len(items)
+        tail_len = (count - 1) % _width + 1 if count else 0
+        tail_offset = count - tail_len
+
+        nodes = [tuple(items[i:i+_width])
+                 for i in range(0, tail_offset, _width)]
+        shift = 0
+
+        while len(nodes) > 1:
+            nodes = [tuple(nodes[i:i+_width])
+                     for i in range(0, len(nodes), _width)]
+            shift += _bits
+
+        self._count = count
+        self._shift = shift
+        self._root = nodes[0] if nodes else None
+        self._tail = tuple(items[tail_offset:])
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Data: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> 'PersistentArray': ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PersistentArray(self[i] for i in
+                                   range(*index.indices(self._count)))
+
+        index = self._get_index(index)
+        return self._get_leaf(index)[index & _mask]
+
+    def __iter__(self) -> Iterator[Data]:
+        if self._root is not None:
+            stack = [(self._root, self._shift)]
+            while stack:
+                node, shift = stack.pop()
+                if shift:
+                    stack.extend((i, shift - _bits) for i in reversed(node))
+
+                else:
+                    yield from node
+
+        yield from self._tail
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if self is other:
+            return True
+
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+
+        return (len(self) == len(other) and
+                all(i == j for i, j in zip(self, other)))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'PersistentArray({list(self)!r})'
+
+    def set(self, index: int, value: Data) -> 'PersistentArray':
+        """Create new array with element at index set to value
+
+        If index is equal to array length, value is appended.
+
+        """
+        if index == self._count:
+            return self.append(value)
+
+        index = self._get_index(index)
+        tail_offset = self._count - len(self._tail)
+
+        if index >= tail_offset:
+            tail = list(self._tail)
+            tail[index - tail_offset] = value
+            return self._create(self._count, self._shift, self._root,
+                                tuple(tail))
+
+        root = _vector_set(self._root, self._shift, index, value)
+        return self._create(self._count, self._shift, root, self._tail)
+
+    def append(self, value: Data) -> 'PersistentArray':
+        """Create new array with appended value"""
+        if len(self._tail) < _width:
+            return self._create(self._count + 1, self._shift, self._root,
+                                (*self._tail, value))
+
+        tail_offset = self._count - _width
+        root = self._root
+        shift = self._shift
+
+        if root is None:
+            root = self._tail
+
+        elif tail_offset == 1 << (shift + _bits):
+            root = root, _vector_new_path(shift, self._tail)
+            shift += _bits
+
+        else:
+            root = _vector_push(root, shift, tail_offset, self._tail)
+
+        return self._create(self._count + 1, shift, root, (value, ))
+
+    def extend(self, values: Iterable[Data]) -> 'PersistentArray':
+        """Create new array extended with values"""
+        result = self
+        for value in values:
+            result = result.append(value)
+
+        return result
+
+    def remove(self, index: int = -1) -> 'PersistentArray':
+        """Create new array without element at index"""
+        index = self._get_index(index)
+
+        if index != self._count - 1:
+            return PersistentArray(
+                itertools.chain(itertools.islice(self, index),
+                                itertools.islice(self, index + 1, None)))
+
+        if len(self._tail) > 1:
+            return self._create(self._count - 1, self._shift, self._root,
+                                self._tail[:-1])
+
+        if self._root is None:
+            return PersistentArray()
+
+        tail_offset = self._count - 1
+        tail = self._get_leaf(tail_offset - 1)
+        root = _vector_pop(self._root, self._shift, tail_offset - 1)
+        shift = self._shift
+
+        while shift and len(root) == 1:
+            root = root[0]
+            shift -= _bits
+
+        return self._create(self._count - 1, shift, root, tail)
+
+    def _get_index(self, index):
+        if index < 0:
+            index += self._count
+
+        if not 0 <= index < self._count:
+            raise IndexError('array index out of range')
+
+        return index
+
+    def _get_leaf(self, index):
+        if index >= self._count - len(self._tail):
+            return self._tail
+
+        node = self._root
+        shift = self._shift
+        while shift:
+            node = node[(index >> shift) & _mask]
+            shift -= _bits
+
+        return node
+
+    @classmethod
+    def _create(cls, count, shift, root, tail):
+        obj = cls.__new__(cls)
+        obj._count = count
+        obj._shift = shift
+        obj._root = root
+        obj._tail = tail
+        return obj
+
+
+def to_persistent(data: Data) -> Data:
+    """Convert data to persistent data
+
+    All arrays and objects are converted to `PersistentArray` and
+    `PersistentObject` instances.
+
+    """
+    if isinstance(data, (PersistentArray, PersistentObject)):
+        return data
+
+    if not isinstance(data, (list, dict)):
+        return data
+
+    results = {}
+    stack = [(data, False)]
+    while stack:
+        node, expanded = stack.pop()
+
+        if not expanded:
+            stack.append((node, True))
+            children = node.values() if isinstance(node, dict) else node
+            stack.extend((i, False) for i in children
+                         if isinstance(i, (list, dict)))
+            continue
+
+        if isinstance(node, dict):
+            results[id(node)] = PersistentObject(
+                (k, results.get(id(v), v)) for k, v in node.items())
+
+        else:
+            results[id(node)] = PersistentArray(
+                results.get(id(i), i) for i in node)
+
+    return results[id(data)]
+
+
+def from_persistent(data: Data) -> Data:
+    """Convert persistent data to built in data
+
+    All arrays and objects (including `PersistentArray` and
+    `PersistentObject` instances) are converted to `list` and `dict`
+    instances.
+
+    """
+    return clone(data)
+
+
+class _PersistentObjectItems(ItemsView):
+
+    def __iter__(self):
+        for leaf in self._mapping._leaves:
+            if leaf is not _missing:
+                yield leaf.key, leaf.value
+
+
+class _Leaf(typing.NamedTuple):
+    hash: int
+    key: str
+    value: Data
+    index: int
+
+
+class _Node(typing.NamedTuple):
+    bitmap: int
+    entries: tuple
+
+
+class _Collision(typing.NamedTuple):
+    hash: int
+    entries: tuple[_Leaf, ...]
+
+
+_missing = object()
+
+_bits = 5
+_width = 1 << _bits
+_mask = _width - 1
+_hash_mask = (1 << 64) - 1
+
+
+def _hash(key):
+    return hash(key) & _hash_mask
+
+
+def _hamt_get(node, h, key):
+    shift = 0
+    while node is not None:
+        if isinstance(node, _Collision):
+            for leaf in node.entries:
+                if leaf.key == key:
+                    return leaf
+
+            return
+
+        bit = 1 << ((h >> shift) & _mask)
+        if not node.bitmap & bit:
+            return
+
+        entry = node.entries[(node.bitmap & (bit - 1)).bit_count()]
+        if isinstance(entry, _Leaf):
+            if entry.hash == h and entry.key == key:
+                return entry
+
+            return
+
+        node = entry
+        shift += _bits
+
+
+def _hamt_set(node, leaf, shift):
+    h = leaf.hash
+
+    if node is None:
+        bit = 1 << ((h >> shift) & _mask)
+        return _Node(bit, (leaf, ))
+
+    if isinstance(node, _Collision):
+        if node.hash != h:
+            node = _Node(1 << ((node.hash >> shift) & _mask), (node, ))
+            return _hamt_set(node, leaf, shift)
+
+        for i, entry in enumerate(node.entries):
+            if entry.key == leaf.key:
+                entries = (*node.entries[:i], leaf, *node.entries[i+1:])
+                return _Collision(h, entries)
+
+        return _Collision(h, (*node.entries, leaf))
+
+    bit = 1 << ((h >> shift) & _mask)
+    i = (node.bitmap & (bit - 1)).bit_count()
+
+    if not node.bitmap & bit:
+        entries = (*node.entries[:i], leaf, *node.entries[i:])
+        return _Node(node.bitmap | bit, entries)
+
+    entry = node.entries[i]
+
+    if isinstance(entry, _Leaf):
+        if entry.hash == h and entry.key == leaf.key:
+            child = leaf
+
+        elif entry.hash == h:
+            child = _Collision(h, (entry, leaf))
+
+        else:
+            child = _hamt_set(None, entry, shift + _bits)
+            child = _hamt_set(child, leaf, shift + _bits)
+
+    else:
+        child = _hamt_set(entry, leaf, shift + _bits)
+
+    entries = (*node.entries[:i], child, *node.entries[i+1:])
+    return _Node(node.bitmap, entries)
+
+
+def _hamt_remove(node, h, key, shift):
+    if node is None:
+        return node
+
+    if isinstance(node, _Collision):
+        entries = tuple(i for i in node.entries if i.key != key)
+        if len(entries) == len(node.entries):
+            return node
+
+        if len(entries) == 1:
+            return entries[0]
+
+        return _Collision(h, entries)
+
+    bit = 1 << ((h >> shift) & _mask)
+    if not node.bitmap & bit:
+        return node
+
+    i = (node.bitmap & (bit - 1)).bit_count()
+    entry = node.entries[i]
+
+    if isinstance(entry, _Leaf):
+        if entry.hash != h or entry.key != key:
+            return node
+
+        child = None
+
+    else:
+        child = _hamt_remove(entry, h, key, shift + _bits)
+        if child is entry:
+            return node
+
+    if child is None:
+        if node.bitmap == bit:
+            return None
+
+        entries = (*node.entries[:i], *node.entries[i+1:])
+        bitmap = node.bitmap ^ bit
+
+        if shift and len(entries) == 1 and not isinstance(entries[0], _Node):
+            return entries[0]
+
+        return _Node(bitmap, entries)
+
+    if (shift and node.bitmap == bit and not isinstance(child, _Node)):
+        return child
+
+    entries = (*node.entries[:i], child, *node.entries[i+1:])
+    return _Node(node.bitmap, entries)
+
+
+def _vector_set(node, shift, index, value):
+    node = list(node)
+
+    if shift:
+        i = (index >> shift) & _mask
+        node[i] = _vector_set(node[i], shift - _bits, index, value)
+
+    else:
+        node[index & _mask] = value
+
+    return tuple(node)
+
+
+def _vector_new_path(shift, leaf):
+    node = leaf
+    for _ in range(shift // _bits):
+        node = node,
+
+    return node
+
+
+def _vector_push(node, shift, index, leaf):
+    if shift == _bits:
+        return *node, leaf
+
+    i = (index >> shift) & _mask
+    if i < len(node):
+        child = _vector_push(node[i], shift - _bits, index, leaf)
+        return *node[:i], child
+
+    return *node, _vector_new_path(shift - _bits, leaf)
+
+
+def _vector_pop(node, shift, index):
+    if not shift:
+        return None
+
+    i = (index >> shift) & _mask
+    child = _vector_pop(node[i], shift - _bits, index)
+
+    if child is None:
+        return node[:i] or None
+
+    return *node[:i], child
@@ -0,0 +1,226 @@
+"""JSON Query
+
+Query extends `Path` with segments which can match multiple data elements.
+
+"""
+
+from collections.abc import Callable, Iterator
+import enum
+import typing
+
+from hat.json.data import Data, flatten, _is_array, _is_object
+from hat.json.path import Path
+
+
+class QuerySelector(enum.Enum):
+    WILDCARD = 'wildcard'
+    """Match all array elements or object values"""
+    RECURSIVE = 'recursive'
+    """Match current data and all its descendants"""
+
+
+Predicate: typing.TypeAlias = Callable[[Data], bool]
+"""Predicate matching array elements or object values"""
+
+QuerySegment: typing.TypeAlias = str | int | slice | QuerySelector | Predicate
+"""Query segment"""
+
+Query: typing.TypeAlias = QuerySegment | typing.List['Query']
+"""JSON Query"""
+
+
+def compile_query(query: Query) -> 'CompiledQuery':
+    """Compile query
+
+    Query is evaluated segment by segment, starting with input data. Each
+    segment is applied to all data elements matched by previous segments:
+
+        * `str` - matches object value with the same key
+        * `int` - matches array element with the same index (negative
+          indexes are supported)
+        * `slice` - matches array elements with indexes selected by slice
+        * `QuerySelector.WILDCARD` - matches all array elements or object
+          values
+        * `QuerySelector.RECURSIVE` - matches current data element and all its
+          descendants (in depth first pre-order)
+        * predicate - matches array elements or object values for which
+          predicate returns ``True``
+
+    Same as `Path`, query can be nested list of segments.
+
+    Example::
+
+        data = {'a': [{'b': 1}, {'b': 2}, {'c': 3}]}
+        query = compile_query(['a', QuerySelector.WILDCARD, 'b'])
+        assert list(query.values(data)) == [1, 2]
+        assert list(query.paths(data)) == [['a', 0, 'b'], ['a', 1, 'b']]
+
+        query = compile_query([QuerySelector.RECURSIVE,
+                               lambda x: isinstance(x, int) and x > 1])
+        assert query.first(data) == 2
+
+    Raises:
+        ValueError: invalid query
+
+    """
+    return CompiledQuery(query)
+
+
+class CompiledQuery:
+    """Compiled query
+
+    Instances should be created with `compile_query`. All methods are lazy
+    and data is traversed only until requested matches are found.
+
+    """
+
+    def __init__(self, query: Query):
+        self._steps = [_compile_segment(i) for i in flatten(query)]
+
+    def items(self, data: Data) -> Iterator[tuple[Path, Data]]:
+        """Iterate over matching paths and data elements"""
+        for path, value in self._select(data):
+            yield _path_to_list(path), value
+
+    def values(self, data: Data) -> Iterator[Data]:
+        """Iterate over matching data elements"""
+        for _, value in self._select(data):
+            yield value
+
+    def paths(self, data: Data) -> Iterator[Path]:
+        """Iterate over paths of matching data elements"""
+        for path, _ in self._select(data):
+            yield _path_to_list(path)
+
+    def first(self,
+              data: Data,
+              default: Data | None = None
+              ) -> Data:
+        """Get first matching data element"""
+        for _, value in self._select(data):
+            return value
+
+        return default
+
+    def _select(self, data):
+        items = iter([(None, data)])
+        for step in self._steps:
+            items = step(items)
+        return items
+
+
+def _compile_segment(segment):
+    if isinstance(segment, str):
+        return _create_key_step(str.__str__(segment))
+
+    if isinstance(segment, int) and not isinstance(segment, bool):
+        return _create_index_step(int(segment))
+
+    if isinstance(segment, slice):
+        return _create_slice_step(segment)
+
+    if segment == QuerySelector.WILDCARD:
+        return _wildcard_step
+
+    if segment == QuerySelector.RECURSIVE:
+        return _recursive_step
+
+    if callable(segment):
+        return _create_predicate_step(segment)
+
+    raise ValueError('invalid query')
+
+
+def _create_key_step(key):
+
+    def step(items):
+        for path, data in items:
+            if data.__class__ is dict:
+                value = data.get(key, _missing)
+                if value is not _missing:
+                    yield (path, key), value
+
+            elif _is_object(data) and key in data:
+                yield (path, key), data[key]
+
+    return step
+
+
+def _create_index_step(index):
+
+    def step(items):
+        for path, data in items:
+            if not _is_array(data):
+                continue
+
+            i = index if index >= 0 else len(data) + index
+            if 0 <= i < len(data):
+                yield (path, i), data[i]
+
+    return step
+
+
+def _create_slice_step(s):
+
+    def step(items):
+        for path, data in items:
+            if not _is_array(data):
+                continue
+
+            for i in range(*s.indices(len(data))):
+                yield (path, i), data[i]
+
+    return step
+
+
+def _create_predicate_step(predicate):
+
+    def step(items):
+        for path, value in _wildcard_step(items):
+            if predicate(value):
+                yield path, value
+
+    return step
+
+
+def _wildcard_step(items):
+    for path, data in items:
+        yield from _iter_children(path, data)
+
+
+def _recursive_step(items):
+    for item in items:
+        stack = [iter([item])]
+
+        while stack:
+            for path, data in stack[-1]:
+                yield path, data
+
+                if _is_object(data) or _is_array(data):
+                    stack.append(_iter_children(path, data))
+                    break
+
+            else:
+                stack.pop()
+
+
+def _iter_children(path, data):
+    if _is_object(data):
+        for k, v in data.items():
+            yield (path, k), v
+
+    elif _is_array(data):
+        for i, v in enumerate(data):
+            yield (path, i), v
+
+
+def _path_to_list(path):
+    result = []
+    while path is not None:
+        path, segment = path
+        result.append(segment)
+    result.reverse()
+    return result
+
+
+_missing = object()
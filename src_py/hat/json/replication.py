@@ -0,0 +1,423 @@
+"""JSON data storage replication
+
+Replication server provides read replicas of `Storage` to clients connected
+over TCP or Unix socket. Each message is JSON encoded and prefixed with its
+size (4 bytes, big endian). Server sends messages:
+
+    * ``{'type': 'snapshot', 'sequence': ..., 'data': ...}`` - complete data
+      at sequence number
+    * ``{'type': 'patch', 'sequence': ..., 'ops': ...}`` - JSON Patch
+      operations which transform data at previous sequence number into data
+      at this sequence number
+
+Client sends message ``{'type': 'resync'}`` when it detects gap in sequence
+numbers (or can not apply received operations). Server responds with new
+snapshot. If client doesn't read messages fast enough, server discards
+queued patches and sends new snapshot instead.
+
+"""
+
+from collections.abc import Callable
+import asyncio
+import collections
+import contextlib
+import pathlib
+import threading
+import typing
+
+from hat import util
+
+from hat.json.data import Data
+from hat.json.encoder import Format, decode, encode
+from hat.json.patch import patch
+from hat.json.path import MemoizedSelector, Path, Storage
+
+
+Address: typing.TypeAlias = tuple[str, int] | pathlib.Path
+"""TCP address (host and port) or Unix socket path"""
+
+
+async def listen(storage: Storage,
+                 address: Address,
+                 *,
+                 queue_size: int = 1024
+                 ) -> 'Server':
+    """Create replication server
+
+    Server replicates changes of `storage`. For each client, up to
+    `queue_size` unsent patches are queued before they are replaced with
+    snapshot.
+
+    Example::
+
+        storage = Storage({'a': 1})
+        server = await listen(storage, ('127.0.0.1', 0))
+
+        replica = await connect(server.address)
+        assert replica.data == {'a': 1}
+
+        storage.set('a', 2)
+        await replica.wait_sequence(1)
+        assert replica.data == {'a': 2}
+
+    """
+    if queue_size < 1:
+        raise ValueError('invalid queue size')
+
+    server = Server(storage, queue_size)
+
+    try:
+        if isinstance(address, pathlib.Path):
+            server._srv = await asyncio.start_unix_server(
+                server._on_connection, address)
+
+        else:
+            server._srv = await asyncio.start_server(
+                server._on_connection, *address)
+
+    except BaseException:
+        server._handle.cancel()
+        raise
+
+    return server
+
+
+async def connect(address: Address) -> 'Replica':
+    """Connect to replication server
+
+    Coroutine returns after initial snapshot is received.
+
+    Raises:
+        ConnectionError
+
+    """
+    if isinstance(address, pathlib.Path):
+        reader, writer = await asyncio.open_unix_connection(address)
+
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+
+    replica = Replica(reader, writer)
+
+    try:
+        await replica._synced
+
+    except BaseException:
+        replica.close()
+        raise
+
+    return replica
+
+
+class Server:
+    """Replication server
+
+    Instances should be created with `listen`.
+
+    """
+
+    def __init__(self, storage: Storage, queue_size: int):
+        self._queue_size = queue_size
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._connections = set()
+        self._srv = None
+
+        # consistent snapshot and registration - storage can be changed by
+        # other threads
+        with storage.transaction():
+            self._state = 0, storage.data
+            self._handle = storage.register_patch_cb(self._on_patch)
+
+    @property
+    def address(self) -> Address:
+        """Listening address"""
+        sockname = self._srv.sockets[0].getsockname()
+        if isinstance(sockname, str):
+            return pathlib.Path(sockname)
+
+        return sockname[0], sockname[1]
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of last change"""
+        return self._state[0]
+
+    @property
+    def client_count(self) -> int:
+        """Number of connected clients"""
+        return len(self._connections)
+
+    def close(self):
+        """Close server and all client connections"""
+        self._handle.cancel()
+        self._srv.close()
+
+        for connection in self._connections:
+            connection.close()
+
+    async def wait_closed(self):
+        """Wait until server and all client connections are closed"""
+        await self._srv.wait_closed()
+
+        while self._connections:
+            await next(iter(self._connections)).wait_closed()
+
+    def _on_patch(self, data, ops):
+        # called with storage lock held, in order of changes - data is
+        # result of this change (storage data can already include changes
+        # made by callbacks which are not notified yet)
+        if not ops:
+            return
+
+        sequence = self._state[0] + 1
+        self._state = sequence, data
+
+        if threading.get_ident() == self._thread_id:
+            self._send_patch(sequence, ops)
+
+        else:
+            with contextlib.suppress(RuntimeError):
+                self._loop.call_soon_threadsafe(self._send_patch, sequence,
+                                                ops)
+
+    def _send_patch(self, sequence, ops):
+        if not self._connections:
+            return
+
+        msg = _encode_msg({'type': 'patch',
+                           'sequence': sequence,
+                           'ops': ops})
+
+        for connection in self._connections:
+            connection.send_patch(sequence, msg)
+
+    async def _on_connection(self, reader, writer):
+        connection = _Connection(self, reader, writer)
+        self._connections.add(connection)
+
+        try:
+            await connection.wait_closed()
+
+        finally:
+            self._connections.discard(connection)
+
+
+class Replica:
+    """Read replica of replicated storage
+
+    Instances should be created with `connect`. Replica data is updated
+    until connection is closed.
+
+    """
+
+    def __init__(self,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._storage = Storage()
+        self._sequence = None
+        self._sequence_future = asyncio.Future()
+        self._synced = asyncio.Future()
+        self._task = asyncio.create_task(self._receive_loop())
+
+    @property
+    def data(self) -> Data:
+        """Data"""
+        return self._storage.data
+
+    @property
+    def sequence(self) -> int | None:
+        """Sequence number of current data (``None`` during resync)"""
+        return self._sequence
+
+    @property
+    def is_closed(self) -> bool:
+        """Is connection closed"""
+        return self._task.done()
+
+    def get(self, path: Path, default: Data | None = None) -> Data:
+        """Get data"""
+        return self._storage.get(path, default)
+
+    def select(self, selector: MemoizedSelector) -> Data:
+        """Get selector result for current data"""
+        return self._storage.select(selector)
+
+    def register_change_cb(self,
+                           cb: Callable[[Data], None],
+                           path: Path = []
+                           ) -> util.RegisterCallbackHandle:
+        """Register change callback
+
+        See `Storage.register_change_cb`.
+
+        """
+        return self._storage.register_change_cb(cb, path)
+
+    async def wait_sequence(self, sequence: int):
+        """Wait until data reaches sequence number
+
+        Raises:
+            ConnectionError
+
+        """
+        while self._sequence is None or self._sequence < sequence:
+            if self.is_closed:
+                raise ConnectionError()
+
+            await asyncio.wait([self._sequence_future, self._task],
+                               return_when=asyncio.FIRST_COMPLETED)
+
+    def close(self):
+        """Close connection"""
+        self._task.cancel()
+
+    async def wait_closed(self):
+        """Wait until connection is closed"""
+        await asyncio.wait([self._task])
+
+    async def _receive_loop(self):
+        try:
+            while True:
+                msg = await _receive_msg(self._reader)
+
+                if msg['type'] == 'snapshot':
+                    self._sequence = msg['sequence']
+                    self._storage.set([], msg['data'])
+
+                elif msg['type'] == 'patch':
+                    if self._sequence is None:
+                        continue
+
+                    if msg['sequence'] != self._sequence + 1:
+                        await self._resync()
+                        continue
+
+                    try:
+                        data = patch(self._storage.data, msg['ops'])
+
+                    except Exception:
+                        await self._resync()
+                        continue
+
+                    self._sequence = msg['sequence']
+                    self._storage.set([], data)
+
+                else:
+                    raise ValueError('unsupported message type')
+
+                if not self._synced.done():
+                    self._synced.set_result(None)
+
+                self._sequence_future.set_result(None)
+                self._sequence_future = asyncio.Future()
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+
+        finally:
+            if not self._synced.done():
+                self._synced.set_exception(ConnectionError())
+
+            self._writer.close()
+
+    async def _resync(self):
+        self._sequence = None
+        await _send_msg(self._writer, _encode_msg({'type': 'resync'}))
+
+
+class _Connection:
+
+    def __init__(self, server, reader, writer):
+        self._server = server
+        self._reader = reader
+        self._writer = writer
+        self._sequence = 0
+        self._resync = True
+        self._queue = collections.deque()
+        self._event = asyncio.Event()
+        self._event.set()
+        self._tasks = [asyncio.create_task(self._send_loop()),
+                       asyncio.create_task(self._receive_loop())]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def wait_closed(self):
+        await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+        self.close()
+        await asyncio.wait(self._tasks)
+
+        self._writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self._writer.wait_closed()
+
+    def send_patch(self, sequence, msg):
+        # patches included in pending snapshot are skipped
+        if self._resync or sequence <= self._sequence:
+            return
+
+        if len(self._queue) >= self._server._queue_size:
+            self._request_resync()
+            return
+
+        self._sequence = sequence
+        self._queue.append(msg)
+        self._event.set()
+
+    def _request_resync(self):
+        self._resync = True
+        self._queue.clear()
+        self._event.set()
+
+    async def _send_loop(self):
+        with contextlib.suppress(ConnectionError):
+            while True:
+                await self._event.wait()
+                self._event.clear()
+
+                if self._resync:
+                    self._resync = False
+                    self._queue.clear()
+                    self._sequence, data = self._server._state
+                    msg = _encode_msg({'type': 'snapshot',
+                                       'sequence': self._sequence,
+                                       'data': data})
+                    self._writer.write(msg)
+
+                while self._queue:
+                    self._writer.write(self._queue.popleft())
+
+                await self._writer.drain()
+
+    async def _receive_loop(self):
+        with contextlib.suppress(ConnectionError,
+                                 asyncio.IncompleteReadError,
+                                 ValueError):
+            while True:
+                msg = await _receive_msg(self._reader)
+
+                if msg['type'] == 'resync':
+                    self._request_resync()
+
+                else:
+                    raise ValueError('unsupported message type')
+
+
+def _encode_msg(msg):
+    msg_bytes = encode(msg, Format.JSON, indent=None).encode('utf-8')
+    return len(msg_bytes).to_bytes(4, 'big') + msg_bytes
+
+
+async def _send_msg(writer, msg):
+    writer.write(msg)
+    await writer.drain()
+
+
+async def _receive_msg(reader):
+    msg_size = int.from_bytes(await reader.readexactly(4), 'big')
+    msg_bytes = await reader.readexactly(msg_size)
+    return decode(str(msg_bytes, 'utf-8'), Format.JSON)
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from hat.json.aio import AsyncStorage, SubscriptionClosedError
+
+
+async def test_storage():
+    storage = AsyncStorage({'a': 1})
+    assert storage.data == {'a': 1}
+    assert storage.get('a') == 1
+    assert storage.get('b', 123) == 123
+
+    subscription = storage.subscribe()
+    a_subscription = storage.subscribe('a')
+    assert subscription.empty
+    assert a_subscription.empty
+
+    await storage.set('a', 2)
+    await storage.set('b', 3)
+    await storage.remove('a')
+
+    assert storage.data == {'b': 3}
+    assert await subscription.get() == {'a': 2}
+    assert await subscription.get() == {'a': 2, 'b': 3}
+    assert await subscription.get() == {'b': 3}
+    assert await a_subscription.get() == 2
+    assert await a_subscription.get() is None
+    assert subscription.empty
+    assert a_subscription.empty
+
+    with pytest.raises(asyncio.QueueEmpty):
+        subscription.get_nowait()
+
+
+async def test_get_wait():
+    storage = AsyncStorage()
+    subscription = storage.subscribe()
+
+    task = asyncio.create_task(subscription.get())
+    await asyncio.sleep(0)
+    assert not task.done()
+
+    await storage.set([], 1)
+    assert await task == 1
+
+
+async def test_close():
+    storage = AsyncStorage()
+    subscription = storage.subscribe()
+    assert not subscription.is_closed
+
+    task = asyncio.create_task(subscription.get())
+    await asyncio.sleep(0)
+
+    subscription.close()
+    assert subscription.is_closed
+
+    with pytest.raises(SubscriptionClosedError):
+        await task
+
+    await storage.set([], 1)
+    assert subscription.empty
+
+
+async def test_iterate():
+    storage = AsyncStorage(0)
+    subscription = storage.subscribe()
+
+    for i in range(1, 4):
+        await storage.set([], i)
+    subscription.close()
+
+    assert [i async for i in subscription] == [1, 2, 3]
+
+
+async def test_coalesce():
+    storage = AsyncStorage(0)
+    subscription = storage.subscribe(coalesce=True, queue_size=1)
+
+    for i in range(1, 100):
+        await storage.set([], i)
+
+    assert await subscription.get() == 99
+    assert subscription.empty
+
+
+async def test_debounce():
+    storage = AsyncStorage(0)
+    subscription = storage.subscribe(debounce=0.01)
+
+    for i in range(1, 10):
+        await storage.set([], i)
+
+    assert subscription.empty
+    assert await subscription.get() == 9
+
+    await storage.set([], 10)
+    subscription.close()
+    await asyncio.sleep(0.02)
+
+    assert subscription.empty
+
+
+async def test_back_pressure():
+    storage = AsyncStorage(0)
+    subscription = storage.subscribe(queue_size=2)
+    storage.subscribe(coalesce=True, queue_size=1)
+
+    await storage.set([], 1)
+    await storage.set([], 2)
+
+    task = asyncio.create_task(storage.set([], 3))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+    assert storage.data == 2
+
+    assert await subscription.get() == 1
+    await task
+    assert storage.data == 3
+
+    task = asyncio.create_task(storage.set([], 4))
+    await asyncio.sleep(0.01)
+    assert not task.done()
+
+    subscription.close()
+    await task
+    assert storage.data == 4
+
+    assert [i async for i in subscription] == [2, 3]
+
+
+async def test_slow_consumer():
+    storage = AsyncStorage(0)
+    subscription = storage.subscribe(queue_size=10)
+    received = []
+
+    async def consume():
+        async for data in subscription:
+            received.append(data)
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(consume())
+
+    for i in range(1, 1000):
+        await storage.set([], i)
+        assert len(subscription._queue) <= 10
+
+    subscription.close()
+    await task
+    assert received == list(range(1, 1000))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {'queue_size': 0},
+    {'debounce': -1}
+])
+async def test_invalid_subscribe(kwargs):
+    storage = AsyncStorage()
+
+    with pytest.raises(ValueError):
+        storage.subscribe(**kwargs)
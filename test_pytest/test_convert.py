@@ -0,0 +1,45 @@
+import sys
+
+import pytest
+
+from hat import json
+from hat.json import convert
+
+
+@pytest.mark.parametrize('in_suffix', ['.json', '.jsonl'])
+@pytest.mark.parametrize('out_suffix', ['.json', '.yaml', '.jsonl'])
+def test_convert(monkeypatch, tmp_path, in_suffix, out_suffix):
+    data = [{'a': 1}, {'b': [True, None]}]
+    in_path = tmp_path / f'input{in_suffix}'
+    out_path = tmp_path / f'output{out_suffix}'
+    json.encode_file(data, in_path)
+
+    monkeypatch.setattr(sys, 'argv', ['hat-json-convert', '-o',
+                                      str(out_path), str(in_path)])
+    convert.main()
+
+    assert json.decode_file(out_path) == data
+
+
+@pytest.mark.parametrize('in_suffix', ['.json', '.jsonl'])
+@pytest.mark.parametrize('out_suffix', ['.json', '.yaml', '.jsonl'])
+def test_convert_stats(monkeypatch, tmp_path, in_suffix, out_suffix):
+    data = [{'a': 1}, {'b': [True, None]}]
+    in_path = tmp_path / f'input{in_suffix}'
+    out_path = tmp_path / f'output{out_suffix}'
+    json.encode_file(data, in_path)
+
+    monkeypatch.setattr(sys, 'argv', ['hat-json-convert', '--stats', '-o',
+                                      str(out_path), str(in_path)])
+    convert.main()
+
+    result = json.decode_file(out_path)
+    if out_suffix == '.jsonl':
+        assert len(out_path.read_text().splitlines()) == 1
+        result, = result
+
+    # size depends on decoded instances
+    expected = json.stats(data)._asdict()
+    assert result.keys() == expected.keys()
+    for key in ['counts', 'max_depth', 'max_width', 'string_size']:
+        assert result[key] == expected[key]
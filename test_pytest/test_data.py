@@ -1,11 +1,15 @@
+import array
+import collections
 import itertools
+import sys
 
 import pytest
 
 from hat import json
+from hat.json.persistent import to_persistent
 
 
-@pytest.mark.parametrize("params, is_equal", [
+equals_params = [
     ((0, 0.0),
      True),
 
@@ -44,7 +48,10 @@ from hat import json
       {'a': False},
       {'a': ''}),
      False)
-])
+]
+
+
+@pytest.mark.parametrize("params, is_equal", equals_params)
 def test_equals(params, is_equal):
     for a, b in itertools.combinations(params, 2):
         assert json.equals(a, b) == is_equal
@@ -101,3 +108,427 @@ def test_flatten_example():
     data = [1, [], [2], {'a': [3]}]
     result = [1, 2, {'a': [3]}]
     assert list(json.flatten(data)) == result
+
+
+def test_equals_invalid_type():
+    with pytest.raises(TypeError):
+        json.equals(object(), None)
+
+    with pytest.raises(TypeError):
+        json.equals([object()], [None])
+
+    assert json.equals(None, object()) is False
+
+
+def test_non_json_containers():
+    for data in [(1, 2), range(2), collections.deque([1, 2])]:
+        with pytest.raises(TypeError):
+            json.equals(data, [1, 2])
+
+        with pytest.raises(TypeError):
+            json.equals([data], [[1, 2]])
+
+        assert json.clone(data) is data
+        assert list(json.flatten([data])) == [data]
+
+
+def test_library_containers():
+    data = {'a': [1, {'b': 2}]}
+
+    for container in [to_persistent(data),
+                      json.cow_clone(data),
+                      {'a': json.Table([{'c': 1}])}]:
+        result = json.clone(container)
+        assert type(result) is dict
+        assert json.equals(result, container)
+
+    assert json.equals(to_persistent(data), data)
+    assert json.equals(json.cow_clone(data), data)
+    assert json.equals(json.Table([{'b': 2}]), [{'b': 2}])
+
+
+def test_equals_identity():
+    x = {'a': [1, 2, {'b': 3}]}
+    assert json.equals(x, x) is True
+    assert json.equals([x, x], [x, json.clone(x)]) is True
+    assert json.equals({'a': 1}, {'b': 1}) is False
+
+
+def test_deeply_nested():
+    depth = 100_000
+
+    x = []
+    for _ in range(depth):
+        x = [{'a': x}]
+
+    y = json.clone(x)
+    assert json.equals(x, y)
+    assert not json.equals(x, json.set_(y, [0, 'a'], 1))
+
+    x = []
+    for _ in range(depth):
+        x = [1, x]
+
+    assert list(json.flatten(x)) == [1] * depth
+
+
+@pytest.mark.parametrize("params, is_equal", equals_params)
+def test_fingerprint(params, is_equal):
+    for a, b in itertools.combinations(params, 2):
+        result = json.fingerprint(a) == json.fingerprint(b)
+        assert result == is_equal
+
+
+def test_fingerprint_example():
+    assert (json.fingerprint({'a': 0, 'b': 1}) ==
+            json.fingerprint({'b': 1, 'a': 0.0}))
+    assert json.fingerprint(1) != json.fingerprint(True)
+
+
+@pytest.mark.parametrize("a, b", [
+    ('a', ['a']),
+    (['a', 'b'], ['ab']),
+    (['a', ['b']], [['a'], 'b']),
+    ({'a': 'b'}, ['a', 'b']),
+    ({'a': {}}, {'a': []}),
+    (1.5, '1.5'),
+    (1, '1'),
+    (float('inf'), float('-inf')),
+    (2 ** 60 + 1, float(2 ** 60 + 1))
+])
+def test_fingerprint_not_equal(a, b):
+    assert not json.equals(a, b)
+    assert json.fingerprint(a) != json.fingerprint(b)
+
+
+def test_fingerprint_stable():
+    data = {'a': [1, 2.5, True, None, 'x'], 'b': {'c': []}}
+    assert json.fingerprint(data) == json.fingerprint(json.clone(data))
+    assert len(json.fingerprint(data)) == 16
+
+
+def test_fingerprint_cache():
+    shared = {'x': [1, 2, 3]}
+    a = {'a': shared, 'b': 1}
+    b = {'a': shared, 'b': 2}
+
+    cache = {}
+    result_a = json.fingerprint(a, cache)
+    assert id(shared) in cache
+    assert id(a) in cache
+
+    cache[id(shared)] = shared, b'x' * 16
+    result_b = json.fingerprint(b, cache)
+    assert result_b != json.fingerprint(b)
+    assert json.fingerprint(a, cache) == result_a
+
+    cache[id(a)] = a.copy(), b'y' * 16
+    assert json.fingerprint(a, cache) != b'y' * 16
+
+
+def test_fingerprint_invalid_type():
+    with pytest.raises(TypeError):
+        json.fingerprint(object())
+
+    with pytest.raises(TypeError):
+        json.fingerprint({'a': [object()]})
+
+
+def test_intern_example():
+    x = {'a': [1, 2], 'b': [1, 2]}
+    y = json.intern(x)
+    assert json.equals(x, y)
+    assert y['a'] is y['b']
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    True,
+    123,
+    1.5,
+    'abc',
+    [],
+    {},
+    [0, 0.0, False, -0.0, '0', None, [], {}],
+    {'a': {'b': [1, 2]}, 'c': [{'b': [1, 2]}, 'a']},
+])
+def test_intern(data):
+    result = json.intern(data)
+    assert json.equals(data, result)
+    assert json.encode(data) == json.encode(result)
+
+
+def test_intern_exact():
+    x = [[0], [0.0], [False], {'a': 1, 'b': 2}, {'b': 2, 'a': 1}]
+    y = json.intern(x)
+    assert json.encode(x) == json.encode(y)
+    assert y[0] is not y[1]
+    assert y[0] is not y[2]
+    assert y[3] is not y[4]
+
+
+def test_interner():
+    interner = json.Interner()
+
+    x = interner.intern({'a': [1, 2, {'b': 'abc'}]})
+    assert interner.saved_count == 0
+    assert interner.saved_size == 0
+
+    y = interner.intern({'a': [1, 2, {'b': 'abc'}]})
+    assert x is y
+    assert interner.saved_count > 0
+    assert interner.saved_size > 0
+
+    z = interner.intern({'a': [1, 2, {'b': 'abc'}], 'c': 1})
+    assert z is not x
+    assert z['a'] is x['a']
+
+
+def test_interner_input_not_modified():
+    interner = json.Interner()
+    shared = [1, 2]
+    interner.intern({'x': shared})
+
+    data = {'y': [1, 2], 'z': {'x': [1, 2]}}
+    result = interner.intern(data)
+    assert result['y'] is shared
+    assert result['z']['x'] is shared
+    assert data['y'] is not shared
+    assert data['z']['x'] is not shared
+
+
+def test_intern_invalid_type():
+    with pytest.raises(TypeError):
+        json.intern(object())
+
+    with pytest.raises(TypeError):
+        json.intern([object()])
+
+
+def test_table_example():
+    data = [{'id': 1, 'value': 1.5}, {'id': 2, 'value': 2.5}]
+    table = json.Table(data)
+    assert table.column('id') == array.array('q', [1, 2])
+    assert table[1]['value'] == 2.5
+    assert json.equals(table, data)
+    assert table.to_array() == data
+
+
+@pytest.mark.parametrize("data", [
+    [],
+    [{}, {}],
+    [{'a': 1}, {'a': 2.5}, {'a': True}, {'a': None}],
+    [{'a': 1, 'b': 'x'}, {'b': 'y', 'a': 2 ** 70}],
+    [{'a': [1, {'b': 2}], 'c': 1.5}, {'a': {'c': []}, 'c': -0.0}],
+])
+def test_table(data):
+    table = json.Table(data)
+    assert len(table) == len(data)
+    assert json.equals(table, data)
+    assert json.equals(table.to_array(), data)
+    assert json.equals(list(table), data)
+    assert json.equals(table[::-1], data[::-1])
+    assert json.equals(json.clone(table), data)
+    assert json.fingerprint(table) == json.fingerprint(data)
+
+    for i, row in enumerate(table):
+        assert isinstance(row, json.TableRow)
+        assert json.equals(row, data[i])
+        assert json.equals(table[i - len(data)], data[i])
+
+
+def test_table_columns():
+    table = json.Table([{'a': 1, 'b': 1.5, 'c': True, 'd': 1},
+                        {'a': 2, 'b': 2.5, 'c': False, 'd': 1.0}])
+    assert table.keys == ['a', 'b', 'c', 'd']
+    assert isinstance(table.column('a'), array.array)
+    assert isinstance(table.column('b'), array.array)
+    assert table.column('c') == [True, False]
+    assert table[0]['c'] is True
+    assert table[1]['d'].__class__ is float
+
+
+@pytest.mark.parametrize("data", [
+    [1, 2],
+    [{'a': 1}, {'b': 1}],
+    [{'a': 1}, {'a': 1, 'b': 1}],
+])
+def test_table_invalid(data):
+    with pytest.raises(ValueError):
+        json.Table(data)
+
+
+def test_table_path():
+    data = [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+    table = json.Table(data)
+    assert json.get(table, [1, 'b']) == 'y'
+    assert json.equals(json.set_(table, [1, 'b'], 'z'),
+                       json.set_(data, [1, 'b'], 'z'))
+    assert json.equals(json.remove(table, [0, 'a']),
+                       json.remove(data, [0, 'a']))
+
+
+def test_cow_clone_example():
+    x = {'a': [1, 2], 'b': {'c': 3}}
+    y = json.cow_clone(x)
+    y['a'].append(3)
+    z = json.materialize(y)
+    assert x == {'a': [1, 2], 'b': {'c': 3}}
+    assert z == {'a': [1, 2, 3], 'b': {'c': 3}}
+    assert z['b'] is x['b']
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    123,
+    'abc',
+    [],
+    {},
+    {'a': [1, {'b': [2, 3]}], 'c': {'d': None}},
+])
+def test_cow_clone_unmodified(data):
+    proxy = json.cow_clone(data)
+    assert json.equals(proxy, data)
+    assert json.encode(proxy) == json.encode(data)
+    assert json.materialize(proxy) is data
+
+
+def test_cow_clone_modify():
+    data = {'a': [1, {'b': [2, 3]}], 'c': {'d': None}, 'e': [4]}
+    original = json.clone(data)
+
+    proxy = json.cow_clone(data)
+    proxy['a'][1]['b'].append(4)
+    proxy['a'][0] = 5
+    proxy['c']['x'] = {'y': 1}
+    proxy['c']['x']['y'] = 2
+    del proxy['a'][1]['b'][0]
+    proxy['f'] = proxy['e']
+    proxy['e'].append(6)
+
+    expected = {'a': [5, {'b': [3, 4]}],
+                'c': {'d': None, 'x': {'y': 2}},
+                'e': [4, 6],
+                'f': [4, 6]}
+
+    assert json.equals(data, original)
+    assert json.equals(proxy, expected)
+    assert json.decode(json.encode(proxy)) == expected
+
+    result = json.materialize(proxy)
+    assert result == expected
+    assert isinstance(result['a'], list)
+    assert isinstance(result['c']['x'], dict)
+    assert result['f'] is result['e']
+    assert json.equals(data, original)
+
+
+@pytest.mark.parametrize('owned', [False, True])
+def test_cow_clone_index(owned):
+    proxy = json.cow_clone([1, [2], 3])
+    if owned:
+        proxy.append(4)
+
+    assert proxy[-1] == proxy[len(proxy) - 1]
+    assert json.equals(proxy[1], [2])
+    assert json.equals(proxy[-2:], [3, 4] if owned else [[2], 3])
+
+    for index in [len(proxy), -len(proxy) - 1]:
+        with pytest.raises(IndexError):
+            proxy[index]
+
+
+def test_cow_clone_sharing():
+    data = {'a': {'b': [1]}, 'c': {'d': [2]}}
+
+    proxy = json.cow_clone(data)
+    proxy['a']['b'].append(3)
+    assert proxy['c']['d'] == [2]
+
+    result = json.materialize(proxy)
+    assert result == {'a': {'b': [1, 3]}, 'c': {'d': [2]}}
+    assert result['c'] is data['c']
+    assert result['a'] is not data['a']
+
+
+def test_cow_clone_path():
+    data = {'a': [1, {'b': 2}]}
+    proxy = json.cow_clone(data)
+
+    assert json.get(proxy, ['a', 1, 'b']) == 2
+    assert json.equals(json.set_(proxy, ['a', 1, 'b'], 3),
+                       {'a': [1, {'b': 3}]})
+    assert json.equals(json.remove(proxy, ['a', 0]),
+                       {'a': [{'b': 2}]})
+    assert json.materialize(proxy) is data
+
+
+def test_stats_example():
+    x = [1, 'abc']
+    result = json.stats({'a': x, 'b': x})
+    assert result.counts['object'] == 1
+    assert result.counts['array'] == 1
+    assert result.counts['number'] == 1
+    assert result.max_depth == 2
+    assert result.max_width == 2
+    assert result.string_size == 5
+
+
+@pytest.mark.parametrize("data, counts, max_depth, max_width", [
+    (None,
+     {'null': 1},
+     0,
+     0),
+
+    ([None, True, False, 1, 1.5, 'a', [], {}],
+     {'null': 1, 'boolean': 2, 'number': 2, 'string': 1, 'array': 2,
+      'object': 1},
+     2,
+     8),
+
+    ({'a': {'b': {'c': [1, 2, 3]}}, 'd': 'e'},
+     {'number': 3, 'string': 1, 'array': 1, 'object': 3},
+     4,
+     3),
+])
+def test_stats(data, counts, max_depth, max_width):
+    result = json.stats(data)
+    assert result.counts == {'null': 0,
+                             'boolean': 0,
+                             'number': 0,
+                             'string': 0,
+                             'array': 0,
+                             'object': 0,
+                             **counts}
+    assert result.max_depth == max_depth
+    assert result.max_width == max_width
+
+
+def test_stats_shared_depth():
+    x = [[1]]
+    for data in [[[[x]], x], [x, [[x]]]]:
+        result = json.stats(data)
+        assert result.max_depth == 5
+        assert result.counts['array'] == 5
+        assert result.counts['number'] == 1
+
+
+def test_stats_size():
+    value = 'x' * 1000
+    data = {'ž': [value, value], 'b': [value]}
+    result = json.stats(data)
+    assert result.string_size == 1000 + 2 + 1
+    assert result.size == (sys.getsizeof(data) +
+                           sys.getsizeof(data['ž']) +
+                           sys.getsizeof(data['b']) +
+                           sys.getsizeof(value) +
+                           sys.getsizeof('ž') +
+                           sys.getsizeof('b'))
+
+
+def test_stats_deeply_nested():
+    x = []
+    for _ in range(100_000):
+        x = [x]
+
+    assert json.stats(x).max_depth == 100_001
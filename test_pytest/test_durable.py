@@ -0,0 +1,233 @@
+import random
+
+import pytest
+
+from hat import json
+from hat.json import durable
+from hat.json.durable import DurableStorage
+
+
+def _random_path(rng):
+    return [rng.choice(['a', 'b', 'c']) if rng.random() < 0.5
+            else rng.randint(-4, 4)
+            for _ in range(rng.randint(0, 3))]
+
+
+def test_recover(tmp_path):
+    storage = DurableStorage(tmp_path / 'storage', default={'a': 1})
+    assert storage.data == {'a': 1}
+    assert storage.sequence == 0
+
+    storage.set('b', 2)
+    with storage.transaction():
+        storage.set(['c', 'd'], [1, 2, 3])
+        storage.remove(['c', 'd', 0])
+    storage.remove('x')
+    assert storage.sequence == 2
+    storage.close()
+
+    storage.set('e', 3)
+    assert storage.data == {'a': 1, 'b': 2, 'c': {'d': [2, 3]}, 'e': 3}
+
+    storage = DurableStorage(tmp_path / 'storage', default=123)
+    assert storage.data == {'a': 1, 'b': 2, 'c': {'d': [2, 3]}}
+    assert storage.sequence == 2
+    storage.close()
+
+
+def test_rollback(tmp_path):
+    storage = DurableStorage(tmp_path, default={})
+
+    with pytest.raises(Exception):
+        with storage.transaction():
+            storage.set('a', 1)
+            raise Exception()
+
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {}
+    storage.close()
+
+
+def test_reentrant_change(tmp_path):
+    storage = DurableStorage(tmp_path, default={'a': []})
+
+    def on_change(data):
+        if data == {'a': ['x']}:
+            storage.set(['a', 1], 'y')
+
+    storage.register_change_cb(on_change)
+    storage.set(['a', 0], 'x')
+    assert storage.sequence == 2
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': ['x', 'y']}
+    storage.close()
+
+
+def test_change_cb_exception(tmp_path):
+    storage = DurableStorage(tmp_path, default={})
+
+    def on_change(data):
+        raise Exception()
+
+    storage.register_change_cb(on_change)
+    with pytest.raises(Exception):
+        storage.set('a', 1)
+
+    assert storage.data == {'a': 1}
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': 1}
+    storage.close()
+
+
+def test_log_write_error(monkeypatch, tmp_path):
+    storage = DurableStorage(tmp_path, default={}, sync=True)
+    changes = []
+    storage.register_change_cb(changes.append)
+    storage.set('a', 1)
+
+    def fsync(fd):
+        raise OSError()
+
+    with monkeypatch.context() as m:
+        m.setattr(durable.os, 'fsync', fsync)
+
+        with pytest.raises(OSError):
+            storage.set('b', 2)
+
+        with pytest.raises(OSError):
+            with storage.transaction():
+                storage.set('c', 3)
+
+    assert storage.data == {'a': 1}
+    assert storage.sequence == 1
+    assert changes == [{'a': 1}]
+
+    storage.set('d', 4)
+    assert storage.sequence == 2
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': 1, 'd': 4}
+    assert storage.sequence == 2
+    storage.close()
+
+
+def test_undo(tmp_path):
+    storage = DurableStorage(tmp_path, default={}, history_size=1)
+    storage.set('a', 1)
+    storage.set('b', 2)
+    storage.undo()
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': 1}
+    storage.close()
+
+
+def test_compact(tmp_path):
+    storage = DurableStorage(tmp_path, default={}, compact_size=100)
+
+    for i in range(100):
+        storage.set(f'key{i}', i)
+        assert storage.log_size <= 100
+
+    storage.close()
+    assert (tmp_path / 'snapshot.json').exists()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {f'key{i}': i for i in range(100)}
+    assert storage.sequence == 100
+
+    storage.compact()
+    assert storage.log_size == 0
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {f'key{i}': i for i in range(100)}
+    assert storage.sequence == 100
+    storage.close()
+
+
+def test_interrupted_compact(tmp_path):
+    storage = DurableStorage(tmp_path, default=[])
+    storage.set(0, 'a')
+    storage.set(1, 'b')
+    log = (tmp_path / 'log.jsonl').read_bytes()
+
+    storage.compact()
+    storage.remove(0)
+    storage.close()
+
+    # log was not truncated after snapshot was written
+    (tmp_path / 'log.jsonl').write_bytes(
+        log + (tmp_path / 'log.jsonl').read_bytes())
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == ['b']
+    assert storage.sequence == 3
+    storage.close()
+
+
+def test_incomplete_record(tmp_path):
+    storage = DurableStorage(tmp_path, default={})
+    storage.set('a', 1)
+    storage.set('b', 2)
+    storage.close()
+
+    log_path = tmp_path / 'log.jsonl'
+    log_path.write_bytes(log_path.read_bytes()[:-5])
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': 1}
+
+    storage.set('c', 3)
+    storage.close()
+
+    storage = DurableStorage(tmp_path)
+    assert storage.data == {'a': 1, 'c': 3}
+    storage.close()
+
+
+def test_invalid_sequence(tmp_path):
+    storage = DurableStorage(tmp_path, default={})
+    storage.set('a', 1)
+    storage.set('b', 2)
+    storage.close()
+
+    log_path = tmp_path / 'log.jsonl'
+    log_path.write_bytes(log_path.read_bytes().split(b'\n', 1)[1])
+
+    with pytest.raises(ValueError):
+        DurableStorage(tmp_path)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random(tmp_path, seed):
+    rng = random.Random(seed)
+    storage = DurableStorage(tmp_path, default={}, compact_size=1000,
+                             history_size=5)
+
+    for _ in range(200):
+        if rng.random() < 0.05 and storage.versions[:-1]:
+            storage.undo()
+
+        elif rng.random() < 0.5:
+            storage.set(_random_path(rng), rng.choice([None, 1, 'x', []]))
+
+        else:
+            storage.remove(_random_path(rng))
+
+        if rng.random() < 0.1:
+            data = storage.data
+            storage.close()
+            storage = DurableStorage(tmp_path, compact_size=1000,
+                                     history_size=5)
+            assert json.equals(storage.data, data)
+
+    storage.close()
@@ -1,8 +1,22 @@
+import dataclasses
+import datetime
+import enum
+import io
+import json as std_json
+import math
 import pathlib
+import random
+import types
+import uuid
 
 import pytest
 
 from hat import json
+from hat.json.persistent import to_persistent
+
+
+backend_classes = [json.PyJsonBackend,
+                   json.RsJsonBackend]
 
 
 @pytest.mark.parametrize('format', list(json.Format))
@@ -21,16 +35,66 @@ def test_encode_decode(format, indent, data):
     if format == json.Format.TOML and not isinstance(data, dict):
         return
 
+    if format == json.Format.JSONL and not isinstance(data, list):
+        return
+
     encoded = json.encode(data, format, indent)
     decoded = json.decode(encoded, format)
     assert data == decoded
 
 
+@pytest.mark.parametrize('format', list(json.Format))
+@pytest.mark.parametrize('data', [
+    None,
+    1.5,
+    'abc\u010d',
+    [1, 'a\U0001f600', {'b': None}],
+    {'a': [[], [1], '\u010d', True, [1, 1.0]]}
+])
+def test_encode_decode_bytes(format, data):
+    if format == json.Format.TOML and not isinstance(data, dict):
+        return
+
+    if format == json.Format.JSONL and not isinstance(data, list):
+        return
+
+    encoded = json.encode_bytes(data, format)
+    assert isinstance(encoded, bytes)
+    assert encoded == json.encode(data, format).encode('utf-8')
+
+    assert json.decode_bytes(encoded, format) == data
+    assert json.decode_bytes(bytearray(encoded), format) == data
+    assert json.decode_bytes(memoryview(encoded), format) == data
+
+
+def test_decode_file_json(tmp_path):
+    path = tmp_path / 'data.json'
+
+    path.write_text('{"a": "\u010d"}', encoding='utf-8')
+    assert json.decode_file(path) == {'a': '\u010d'}
+
+    interner = json.Interner()
+    path.write_text('[[1, 2], [1, 2]]', encoding='utf-8')
+    result = json.decode_file(path, interner=interner)
+    assert result == [[1, 2], [1, 2]]
+    assert result[0] is result[1]
+
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        json.decode_file(path)
+
+    path.write_bytes(b'[1,')
+    with pytest.raises(ValueError):
+        json.decode_file(path)
+
+
 @pytest.mark.parametrize('path, format', [
     ('abc.json', json.Format.JSON),
     ('abc.yaml', json.Format.YAML),
     ('abc.yml', json.Format.YAML),
-    ('abc.toml', json.Format.TOML)
+    ('abc.toml', json.Format.TOML),
+    ('abc.jsonl', json.Format.JSONL),
+    ('abc.ndjson', json.Format.JSONL)
 ])
 def test_get_file_format_valid(path, format):
     result = json.get_file_format(pathlib.Path(path))
@@ -63,6 +127,9 @@ def test_encode_decode_file(tmp_path, format, indent, data):
     if format == json.Format.TOML and not isinstance(data, dict):
         return
 
+    if format == json.Format.JSONL and not isinstance(data, list):
+        return
+
     path = tmp_path / 'data'
     json.encode_file(data, path, format, indent)
     decoded = json.decode_file(path, format)
@@ -72,3 +139,487 @@ def test_encode_decode_file(tmp_path, format, indent, data):
     json.encode_file(data, path, None, indent)
     decoded = json.decode_file(path, None)
     assert data == decoded
+
+
+@pytest.mark.parametrize('format', [json.Format.JSON, json.Format.YAML])
+def test_decode_interner(tmp_path, format):
+    data = {'a': [1, 2, {'b': 'c'}]}
+    path = tmp_path / f'data.{format.value}'
+    json.encode_file(data, path)
+
+    interner = json.Interner()
+    result1 = json.decode_file(path, interner=interner)
+    result2 = json.decode(json.encode(data, format), format, interner)
+    assert json.equals(result1, data)
+    assert result1 is result2
+    assert interner.saved_size > 0
+
+
+@pytest.mark.parametrize('format', [json.Format.JSON, json.Format.YAML])
+@pytest.mark.parametrize('indent', [None, 0, 2, 4])
+@pytest.mark.parametrize('sort_keys', [False, True])
+@pytest.mark.parametrize('rows', [
+    [],
+    [{}, {}],
+    [{'b': 1, 'a': 1.5, 'c': 'x', '%s': None},
+     {'b': 2, 'a': 2.5, 'c': '\n', '%s': True}],
+    [{'a': [1, {'b': [2, {}]}], 'c': {}}, {'a': [], 'c': {'d': [[]]}}],
+])
+def test_encode_table(format, indent, sort_keys, rows):
+    data = {'x': rows, 'y': [1, rows, {'z': rows}]}
+    table = json.Table(rows)
+    table_data = {'x': table, 'y': [1, table, {'z': table}]}
+
+    if format == json.Format.JSON:
+        encoded = json.encode(data, format, indent, sort_keys)
+        table_encoded = json.encode(table_data, format, indent, sort_keys)
+        assert encoded == table_encoded
+
+    table_encoded = json.encode(table_data, format, indent, sort_keys)
+    assert json.equals(json.decode(table_encoded, format), data)
+
+
+def test_encode_table_nan():
+    table = json.Table([{'a': float('nan')}, {'a': 1.0}])
+    with pytest.raises(ValueError):
+        json.encode(table)
+
+
+def test_encode_decode_jsonl():
+    data = [{'a': 'x\ny'}, [1, 2], 'abc\u2028', None]
+    encoded = json.encode(data, json.Format.JSONL, indent=4)
+    lines = encoded.split('\n')
+    assert lines[-1] == ''
+    assert [json.decode(line) for line in lines[:-1]] == data
+
+    assert json.decode(encoded, json.Format.JSONL) == data
+    assert json.decode('\n1\n  \n2', json.Format.JSONL) == [1, 2]
+    assert json.decode('', json.Format.JSONL) == []
+
+    for data in [{'a': 1}, 'abc', 1, None]:
+        with pytest.raises(ValueError):
+            json.encode(data, json.Format.JSONL)
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_encode_decode_iter(tmp_path, binary):
+    path = tmp_path / 'data.ndjson'
+    items = ({'id': i, 'values': [i, str(i)]} for i in range(100))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.encode_iter(items, f)
+
+    with open(path, 'rb' if binary else 'r') as f:
+        decoded = json.decode_iter(f)
+        assert next(decoded) == {'id': 0, 'values': [0, '0']}
+        assert list(decoded) == [{'id': i, 'values': [i, str(i)]}
+                                 for i in range(1, 100)]
+
+    assert json.decode_file(path) == [{'id': i, 'values': [i, str(i)]}
+                                      for i in range(100)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100, 1024 * 1024])
+@pytest.mark.parametrize('ordered', [True, False])
+def test_decode_iter_parallel(tmp_path, chunk_size, ordered):
+    path = tmp_path / 'data.jsonl'
+    data = [{'id': i, 'value': 'x' * (i % 50)} for i in range(1000)]
+    json.encode_file(data, path)
+
+    result = list(json.decode_iter_parallel(path, 2, chunk_size, ordered))
+    if not ordered:
+        result.sort(key=lambda i: i['id'])
+
+    assert result == data
+
+
+@pytest.mark.parametrize('content, result', [
+    ('', []),
+    ('\n\n', []),
+    ('1', [1]),
+    ('1\r\n\r\n"a"\n[]', [1, 'a', []]),
+])
+def test_decode_iter_parallel_lines(tmp_path, content, result):
+    path = tmp_path / 'data.jsonl'
+    path.write_bytes(content.encode('utf-8'))
+
+    assert list(json.decode_iter_parallel(path, 2, 1)) == result
+
+
+def test_decode_iter_parallel_invalid(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_text('1\n[\n3\n')
+
+    with pytest.raises(ValueError):
+        list(json.decode_iter_parallel(path, 2, 1))
+
+
+def test_decode_iter_interner():
+    stream = io.StringIO('{"a": [1, 2]}\n{"a": [1, 2]}\n')
+    interner = json.Interner()
+
+    result1, result2 = json.decode_iter(stream, interner)
+    assert result1 is result2
+
+
+def test_convert_jsonl(tmp_path, monkeypatch):
+    from hat.json import convert
+
+    input_path = tmp_path / 'input.jsonl'
+    input_path.write_text('{"a": 1}\n\n[1, 2]\n')
+
+    output_path = tmp_path / 'output.ndjson'
+    monkeypatch.setattr('sys.argv', ['hat-json-convert', str(input_path),
+                                     '-o', str(output_path)])
+    convert.main()
+    assert output_path.read_text().split('\n') == [
+        json.encode(i, indent=None) for i in [{'a': 1}, [1, 2]]] + ['']
+
+    output_path = tmp_path / 'output.json'
+    monkeypatch.setattr('sys.argv', ['hat-json-convert', str(input_path),
+                                     '-o', str(output_path)])
+    convert.main()
+    assert json.decode_file(output_path) == [{'a': 1}, [1, 2]]
+
+    input_path = output_path
+    output_path = tmp_path / 'output.jsonl'
+    monkeypatch.setattr('sys.argv', ['hat-json-convert', str(input_path),
+                                     '-o', str(output_path)])
+    convert.main()
+    assert output_path.read_text().split('\n') == [
+        json.encode(i, indent=None) for i in [{'a': 1}, [1, 2]]] + ['']
+
+
+def _random_data(rng, depth=0):
+    if depth < 4 and rng.random() < 0.3:
+        return [_random_data(rng, depth + 1)
+                for _ in range(rng.randint(0, 4))]
+
+    if depth < 4 and rng.random() < 0.4:
+        return {rng.choice(['a', 'b', 'c"\\', '\u010d', '\U0001f600']):
+                _random_data(rng, depth + 1)
+                for _ in range(rng.randint(0, 4))}
+
+    return rng.choice([None, True, False, 0, -1, 1.5, -2.5e-10, 10 ** 30,
+                       '', 'a"b\\', '\u010d\U0001f600\n', '\\u1234'])
+
+
+def _events_to_data(events):
+    stack = [[]]
+    keys = []
+
+    for event_type, value in events:
+        if event_type in (json.EventType.START_MAP,
+                          json.EventType.START_ARRAY):
+            stack.append({} if event_type == json.EventType.START_MAP
+                         else [])
+            continue
+
+        if event_type == json.EventType.KEY:
+            keys.append(value)
+            continue
+
+        if event_type in (json.EventType.END_MAP, json.EventType.END_ARRAY):
+            value = stack.pop()
+
+        if isinstance(stack[-1], dict):
+            stack[-1][keys.pop()] = value
+        else:
+            stack[-1].append(value)
+
+    assert len(stack) == 1
+    return stack[0][0]
+
+
+def test_iter_events_example():
+    stream = io.StringIO('{"a": [1, true]}')
+    assert list(json.iter_events(stream)) == [
+        (json.EventType.START_MAP, None),
+        (json.EventType.KEY, 'a'),
+        (json.EventType.START_ARRAY, None),
+        (json.EventType.VALUE, 1),
+        (json.EventType.VALUE, True),
+        (json.EventType.END_ARRAY, None),
+        (json.EventType.END_MAP, None)]
+
+
+@pytest.mark.parametrize('seed', range(50))
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1024])
+@pytest.mark.parametrize('binary', [False, True])
+def test_iter_events(seed, chunk_size, binary):
+    rng = random.Random(seed)
+    data = _random_data(rng)
+    encoded = std_json.dumps(data,
+                             indent=rng.choice([None, 2]),
+                             ensure_ascii=rng.choice([False, True]))
+
+    stream = (io.BytesIO(encoded.encode('utf-8')) if binary
+              else io.StringIO(encoded))
+    events = json.iter_events(stream, chunk_size)
+    assert _events_to_data(events) == data
+
+
+@pytest.mark.parametrize('encoded', [
+    '',
+    ' ',
+    '{',
+    '[1,]',
+    '[1 2]',
+    '{"a" 1}',
+    '{"a": 1,}',
+    '{1: 2}',
+    '[1}',
+    '1 2',
+    'tru',
+    'truex',
+    '01',
+    '1.',
+    '"abc',
+    '"a\nb"',
+])
+@pytest.mark.parametrize('chunk_size', [1, 1024])
+def test_iter_events_invalid(encoded, chunk_size):
+    with pytest.raises(ValueError):
+        list(json.iter_events(io.StringIO(encoded), chunk_size))
+
+
+@pytest.mark.parametrize('data, path, result', [
+    ([1, 2, 3], [], [1, 2, 3]),
+    ({'a': 1, 'b': [{'c': [1]}, 2]}, 'b', [{'c': [1]}, 2]),
+    ({'a': {'x': [1]}, 'b': {'x': [2]}}, ['b', 'x'], [2]),
+    ([[1], [2, [3]], [4]], 1, [2, [3]]),
+    ([[1], [2, [3]], [4]], [1, 1], [3]),
+    ({'a': [1]}, 'b', []),
+    ({'a': [1]}, ['a', 1], []),
+    ({'a': {'b': 1}}, 'a', []),
+    ({'a': []}, 'a', []),
+    ([], 0, []),
+])
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+def test_iter_items(data, path, result, chunk_size):
+    encoded = json.encode(data)
+
+    stream = io.StringIO(encoded)
+    assert list(json.iter_items(stream, path, chunk_size)) == result
+
+    stream = io.BytesIO(encoded.encode('utf-8'))
+    assert list(json.iter_items(stream, path, chunk_size)) == result
+
+
+def test_iter_items_lazy():
+    stream = io.StringIO('{"a": [{"b": 1}, {"b": 2}, invalid')
+    items = json.iter_items(stream, 'a', 4)
+
+    assert next(items) == {'b': 1}
+    assert next(items) == {'b': 2}
+
+    with pytest.raises(ValueError):
+        next(items)
+
+
+@pytest.mark.parametrize('path', [-1, ['a', -1], None])
+def test_iter_items_invalid_path(path):
+    with pytest.raises(ValueError):
+        json.iter_items(io.StringIO('[]'), path)
+
+
+def test_default_json_backend():
+    assert issubclass(json.DefaultJsonBackend, json.JsonBackend)
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+@pytest.mark.parametrize('data', [
+    None,
+    True,
+    1,
+    -1.5,
+    'abc',
+    'a\u0000\u2028\U0001F600"\\',
+    '\ud800',
+    2 ** 64,
+    -2 ** 63,
+    [],
+    {},
+    [1, [2, [3, {}]], 'abc'],
+    {'a': [[], [1], 'abc', True, [1, 1.0]], 'b': {'c': None}}
+])
+def test_json_backend_encode_decode(backend_cls, indent, data):
+    backend = backend_cls()
+    encoded = backend.encode(data, indent)
+    assert std_json.loads(encoded) == data
+    assert backend.decode(encoded) == data
+
+    lines = encoded.split('\n')
+    if indent is None:
+        assert len(lines) == 1
+
+    # indentation is same as in standard library
+    std_lines = std_json.dumps(data, indent=indent).split('\n')
+    assert ([len(i) - len(i.lstrip(' ')) for i in lines] ==
+            [len(i) - len(i.lstrip(' ')) for i in std_lines])
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+def test_json_backend_encode_non_builtin(backend_cls, indent):
+    backend = backend_cls()
+    data = types.MappingProxyType({'a': (1, 2),
+                                   'b': json.Table([{'c': 1}, {'c': 2}])})
+    encoded = backend.encode(data, indent)
+    assert backend.decode(encoded) == {'a': [1, 2],
+                                       'b': [{'c': 1}, {'c': 2}]}
+
+    with pytest.raises(TypeError):
+        backend.encode({'a': object()}, indent)
+
+
+class _Enum(enum.Enum):
+    A = 'a'
+
+
+@dataclasses.dataclass
+class _Dataclass:
+    a: int
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+@pytest.mark.parametrize('value', [
+    datetime.datetime.now(),
+    datetime.date.today(),
+    datetime.time(),
+    _Enum.A,
+    uuid.uuid4(),
+    _Dataclass(1),
+    b'abc',
+    {1, 2},
+])
+def test_json_backend_encode_invalid_type(backend_cls, indent, value):
+    backend = backend_cls()
+    for data in [value, [None, value], {'a': value},
+                 json.cow_clone({'a': [value]}),
+                 to_persistent({'a': [None]}).set('b', value)]:
+        with pytest.raises(TypeError):
+            backend.encode(data, indent)
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2])
+def test_json_backend_encode_invalid_numpy_type(backend_cls, indent):
+    numpy = pytest.importorskip('numpy')
+    backend = backend_cls()
+    for value in [numpy.array([1, 2]), numpy.datetime64('2020-01-01')]:
+        with pytest.raises(TypeError):
+            backend.encode([value], indent)
+
+    # numpy scalars which subclass builtin types are encoded same as
+    # builtin values
+    for value in [numpy.float64(1.5), numpy.str_('a')]:
+        assert backend.decode(backend.encode([value], indent)) == [value]
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), -float('inf')])
+def test_json_backend_encode_nan(backend_cls, indent, value):
+    backend = backend_cls()
+    for data in [value, [None, value], {'a': value}]:
+        with pytest.raises(ValueError):
+            backend.encode(data, indent)
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+@pytest.mark.parametrize('sort_keys', [False, True])
+def test_json_backend_encode_table(monkeypatch, backend_cls, indent,
+                                   sort_keys):
+    backend = backend_cls()
+    rows = [{'b': 1, 'a': 1e16, 'c': 'x\u00e9', '%s': None, 'd': [1e-7]},
+            {'b': 2, 'a': 2.5, 'c': '\n', '%s': True, 'd': {'e': [None]}}]
+    data = {'x': rows, 'y': [1, rows, {'z': rows}], 'w': None}
+    table = json.Table(rows)
+    table_data = {'x': table, 'y': [1, table, {'z': table}], 'w': None}
+
+    encoded = backend.encode(data, indent, sort_keys)
+
+    # tables are encoded without creation of row objects
+    with monkeypatch.context() as m:
+        m.setattr(json.TableRow, '__init__', None)
+        m.setattr(json.Table, 'to_array', None)
+        assert backend.encode(table_data, indent, sort_keys) == encoded
+
+    assert backend.decode(encoded) == data
+
+    for rows in [[{'a': 1.5}, {'a': float('nan')}],
+                 [{'a': None}, {'a': [float('inf')]}]]:
+        with pytest.raises(ValueError):
+            backend.encode({'a': None, 'b': json.Table(rows)}, indent)
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('indent', [None, 2, 4])
+def test_json_backend_sort_keys(backend_cls, indent):
+    backend = backend_cls()
+    data = {'b': 1, 'a': {'d': 2, 'c': 3}}
+
+    encoded = backend.encode(data, indent, sort_keys=True)
+    decoded = backend.decode(encoded)
+    assert list(decoded) == ['a', 'b']
+    assert list(decoded['a']) == ['c', 'd']
+
+    encoded = backend.encode(data, indent, sort_keys=False)
+    decoded = backend.decode(encoded)
+    assert list(decoded) == ['b', 'a']
+    assert list(decoded['a']) == ['d', 'c']
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('encoded, data', [
+    ('[1, "a\\u00e9"]', [1, 'a\u00e9']),
+    ('{"a": 18446744073709551616}', {'a': 2 ** 64}),
+    ('[1.5e300, -0.0]', [1.5e300, -0.0]),
+    (' \n"\\ud83d\\ude00"\n', '\U0001F600')
+])
+def test_json_backend_decode(backend_cls, encoded, data):
+    backend = backend_cls()
+    encoded_bytes = encoded.encode('utf-8')
+
+    for i in [encoded,
+              encoded_bytes,
+              bytearray(encoded_bytes),
+              memoryview(encoded_bytes)]:
+        assert backend.decode(i) == data
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+def test_json_backend_decode_nan(backend_cls):
+    backend = backend_cls()
+    result = backend.decode('[NaN, Infinity, -Infinity]')
+    assert math.isnan(result[0])
+    assert result[1:] == [float('inf'), -float('inf')]
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('encoded', [
+    '',
+    '[1,',
+    '{"a" 1}',
+    '[1] 2',
+    b'"\xff"'
+])
+def test_json_backend_decode_invalid(backend_cls, encoded):
+    backend = backend_cls()
+    with pytest.raises(ValueError):
+        backend.decode(encoded)
+
+
+@pytest.mark.parametrize('backend_cls', backend_classes)
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+def test_json_backend_decode_long_number(monkeypatch, backend_cls,
+                                         chunk_size):
+    monkeypatch.setattr('hat.json.encoder._long_number_chunk_size',
+                        chunk_size)
+    backend = backend_cls()
+    data = [1, 10 ** 18, 2 ** 64, -2 ** 63 - 1, 'a', 10 ** 30]
+    assert backend.decode(std_json.dumps(data)) == data
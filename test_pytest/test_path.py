@@ -1,8 +1,13 @@
 import collections
+import functools
+import random
+import sys
+import threading
 
 import pytest
 
 from hat import json
+from hat.json.persistent import to_persistent
 
 
 @pytest.mark.parametrize("data, path, default, result", [
@@ -193,6 +198,174 @@ def test_remove_example():
     assert result == [1, 2, 3]
 
 
+def _random_path(rng):
+    return [rng.choice(['a', 'b', 'c']) if rng.random() < 0.5
+            else rng.randint(-4, 4)
+            for _ in range(rng.randint(0, 3))]
+
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("persistent", [False, True])
+def test_set_many_remove_many(seed, persistent):
+    rng = random.Random(seed)
+    data = {'a': [1, {'b': [2, 3]}, None], 'b': {'c': 4}, 'c': [[5]]}
+    if persistent:
+        data = to_persistent(data)
+    original = json.clone(data)
+
+    items = [(_random_path(rng), rng.choice([None, 1, 'x', [], {}]))
+             for _ in range(rng.randint(0, 10))]
+    paths = [_random_path(rng) for _ in range(rng.randint(0, 10))]
+
+    result = data
+    for path, value in items:
+        result = json.set_(result, path, value)
+    assert json.equals(json.set_many(data, items), result)
+
+    result = data
+    for path in paths:
+        result = json.remove(result, path)
+    assert json.equals(json.remove_many(data, paths), result)
+
+    assert json.equals(data, original)
+    for _, value in items:
+        assert value in (None, 1, 'x', [], {})
+
+
+def test_set_many_example():
+    data = {'a': [1, 2], 'b': 3}
+    result = json.set_many(data, [(['a', 0], 4), (['a', 1], 5), ('c', 6)])
+    assert result == {'a': [4, 5], 'b': 3, 'c': 6}
+    assert data == {'a': [1, 2], 'b': 3}
+
+    value = {'x': 1}
+    result = json.set_many({}, [('a', value), (['a', 'y'], 2)])
+    assert result == {'a': {'x': 1, 'y': 2}}
+    assert value == {'x': 1}
+
+
+def test_remove_many_example():
+    data = {'a': [1, 2, 3], 'b': 4}
+    result = json.remove_many(data, [['a', 0], ['a', 0], 'b'])
+    assert result == {'a': [3]}
+    assert data == {'a': [1, 2, 3], 'b': 4}
+
+    assert json.remove_many(data, ['c', ['a', 5]]) is data
+
+
+@pytest.mark.parametrize("path, segments", [
+    ([], []),
+    (1, [1]),
+    ('a', ['a']),
+    (['a', [1, ['b']], []], ['a', 1, 'b']),
+])
+def test_compile_path(path, segments):
+    compiled = json.compile_path(path)
+    assert compiled.segments == segments
+
+    data = json.set_(None, path, 123)
+    assert compiled.set(None, 123) == data
+    assert compiled.get(data) == 123
+    assert compiled.get(data) == json.get(data, path)
+    assert compiled.remove(data) == json.remove(data, path)
+
+
+@pytest.mark.parametrize("path", [
+    None,
+    True,
+    1.0,
+    ['a', False],
+    ['a', {}],
+])
+def test_compile_path_invalid(path):
+    with pytest.raises(ValueError):
+        json.compile_path(path)
+
+    with pytest.raises(ValueError):
+        json.get(None, path)
+
+
+def test_compile_path_cache():
+    assert json.compile_path(['a', 1]) is json.compile_path(['a', 1])
+
+    assert json.get([1, 2], 1) == 2
+    with pytest.raises(ValueError):
+        json.get([1, 2], True)
+
+    path = ['a', ['b']]
+    assert json.get({'a': {'b': 1}}, path) == 1
+    path[1].append('c')
+    assert json.get({'a': {'b': {'c': 2}}}, path) == 2
+
+
+def test_create_selector():
+    calls = []
+
+    def fn(*args):
+        calls.append(args)
+        return list(args)
+
+    selector = json.create_selector(['a', ['b', 0]], fn)
+    assert (selector.hits, selector.misses) == (0, 0)
+
+    data = {'a': {'x': 1}, 'b': [[1], 2], 'c': 3}
+    assert selector.get(data) == [{'x': 1}, [1]]
+    assert (selector.hits, selector.misses) == (0, 1)
+
+    result = selector.get(data)
+    assert result is selector.get(json.set_(data, 'c', 4))
+    assert result is selector.get(json.set_(data, ['b', 1], 3))
+    assert (selector.hits, selector.misses) == (3, 1)
+    assert len(calls) == 1
+
+    assert selector.get(json.set_(data, ['a', 'x'], 2)) == [{'x': 2}, [1]]
+    assert selector.get({}) == [None, None]
+    assert (selector.hits, selector.misses) == (3, 3)
+
+    with pytest.raises(ValueError):
+        json.create_selector([None], fn)
+
+
+def test_create_selector_composition():
+    total = json.create_selector(['a'], sum)
+    count = json.create_selector(['a'], len)
+    mean = json.create_selector([total, count], lambda x, y: x / y)
+    result = json.create_selector([mean, 'b'], lambda x, y: [x, y])
+
+    data = {'a': [1, 2, 3], 'b': 1}
+    assert result.get(data) == [2, 1]
+
+    data = json.set_(data, 'b', 2)
+    assert result.get(data) == [2, 2]
+    assert (total.hits, total.misses) == (1, 1)
+    assert (mean.hits, mean.misses) == (1, 1)
+    assert (result.hits, result.misses) == (0, 2)
+
+    data = json.set_(data, ['a', 0], 4)
+    assert result.get(data) == [3, 2]
+    assert (total.hits, total.misses) == (1, 2)
+    assert (count.hits, count.misses) == (1, 2)
+    assert (mean.hits, mean.misses) == (1, 2)
+
+
+def test_storage_select():
+    storage = json.Storage({'a': [1, 2], 'b': 1})
+    selector = json.create_selector(['a'], sum)
+
+    assert storage.select(selector) == 3
+
+    storage.set('b', 2)
+    assert storage.select(selector) == 3
+    assert (selector.hits, selector.misses) == (1, 1)
+
+    with storage.transaction():
+        storage.set(['a', 2], 3)
+        assert storage.select(selector) == 6
+
+    assert storage.select(selector) == 6
+    assert (selector.hits, selector.misses) == (2, 2)
+
+
 def test_storage():
     data_queue = collections.deque()
     storage = json.Storage(123)
@@ -214,3 +387,557 @@ def test_storage():
     assert data_queue.pop() == {'a': {'b': {}}}
 
     assert not data_queue
+
+
+def test_storage_transaction():
+    data_queue = collections.deque()
+    storage = json.Storage({'a': 1})
+    storage.register_change_cb(data_queue.append)
+
+    with storage.transaction():
+        for i in range(200):
+            storage.set('a', i)
+        storage.set('b', 2)
+        assert storage.data == {'a': 199, 'b': 2}
+        assert not data_queue
+
+    assert storage.data == {'a': 199, 'b': 2}
+    assert data_queue.popleft() == {'a': 199, 'b': 2}
+    assert not data_queue
+
+    with storage.transaction():
+        pass
+
+    assert not data_queue
+
+    with pytest.raises(Exception):
+        with storage.transaction():
+            storage.set('a', 1)
+            storage.remove('b')
+            raise Exception()
+
+    assert storage.data == {'a': 199, 'b': 2}
+    assert not data_queue
+
+
+def test_storage_nested_transaction():
+    data_queue = collections.deque()
+    storage = json.Storage({})
+    storage.register_change_cb(data_queue.append)
+
+    with storage.transaction():
+        storage.set('a', 1)
+
+        with storage.transaction():
+            storage.set('b', 2)
+
+        assert not data_queue
+
+        with pytest.raises(Exception):
+            with storage.transaction():
+                storage.set('c', 3)
+                raise Exception()
+
+        assert storage.data == {'a': 1, 'b': 2}
+
+    assert data_queue.popleft() == {'a': 1, 'b': 2}
+    assert not data_queue
+
+    with storage.transaction():
+        with pytest.raises(Exception):
+            with storage.transaction():
+                storage.set('c', 3)
+                raise Exception()
+
+    assert storage.data == {'a': 1, 'b': 2}
+    assert not data_queue
+
+
+def test_storage_path_change_cb():
+    storage = json.Storage({'a': {'b': 1}, 'c': [1, 2]})
+    a_queue = collections.deque()
+    b_queue = collections.deque()
+    c_queue = collections.deque()
+    c0_queue = collections.deque()
+
+    storage.register_change_cb(a_queue.append, 'a')
+    storage.register_change_cb(b_queue.append, ['a', 'b'])
+    storage.register_change_cb(c_queue.append, 'c')
+    handle = storage.register_change_cb(c0_queue.append, ['c', 0])
+
+    storage.set(['a', 'b'], 2)
+    assert a_queue.popleft() == {'b': 2}
+    assert b_queue.popleft() == 2
+    assert not c_queue
+    assert not c0_queue
+
+    storage.set(['a', 'x'], 3)
+    assert a_queue.popleft() == {'b': 2, 'x': 3}
+    assert not b_queue
+
+    storage.remove(['c', 0])
+    assert c_queue.popleft() == [2]
+    assert c0_queue.popleft() == 2
+
+    storage.remove('a')
+    assert a_queue.popleft() is None
+    assert b_queue.popleft() is None
+
+    storage.remove('a')
+    assert not a_queue
+    assert not b_queue
+
+    handle.cancel()
+    storage.set('c', [3])
+    assert c_queue.popleft() == [3]
+    assert not c0_queue
+
+    storage.set([], [[4]])
+    assert c_queue.popleft() is None
+
+    assert not a_queue
+    assert not b_queue
+    assert not c_queue
+    assert not c0_queue
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_storage_path_change_cb_random(seed):
+    rng = random.Random(seed)
+    storage = json.Storage({'a': [1, {'b': [2, 3]}, None], 'b': {'c': 4}})
+
+    notifications = []
+    paths = [_random_path(rng) for _ in range(30)]
+    for i, path in enumerate(paths):
+        storage.register_change_cb(
+            functools.partial(lambda i, x: notifications.append((i, x)), i),
+            path)
+
+    for _ in range(50):
+        old_data = storage.data
+
+        with storage.transaction():
+            for _ in range(rng.randint(1, 3)):
+                path = _random_path(rng)
+                if rng.random() < 0.5:
+                    storage.set(path, rng.choice([None, 1, [], {}]))
+                else:
+                    storage.remove(path)
+
+        new_data = storage.data
+        missing = object()
+        expected = [(i, json.get(new_data, path))
+                    for i, path in enumerate(paths)
+                    if not path or
+                    json.get(old_data, path, missing) is not
+                    json.get(new_data, path, missing)]
+
+        assert sorted(notifications, key=lambda i: i[0]) == expected
+        notifications.clear()
+
+
+def test_storage_patch_cb():
+    storage = json.Storage({'a': [1], 'b/~': {}})
+    patch_queue = collections.deque()
+    storage.register_patch_cb(lambda data, ops: patch_queue.append((data,
+                                                                    ops)))
+
+    storage.set(['a', 1], 2)
+    assert patch_queue.popleft() == (
+        {'a': [1, 2], 'b/~': {}},
+        [{'op': 'add', 'path': '/a/1', 'value': 2}])
+
+    storage.set(['a', -1], 3)
+    assert patch_queue.popleft()[1] == [
+        {'op': 'replace', 'path': '/a/1', 'value': 3}]
+
+    storage.set(['b/~', 'c', 'd'], 4)
+    assert patch_queue.popleft()[1] == [
+        {'op': 'add', 'path': '/b~1~0/c', 'value': {'d': 4}}]
+
+    storage.remove(['a', 0])
+    assert patch_queue.popleft()[1] == [
+        {'op': 'remove', 'path': '/a/0'}]
+
+    storage.remove(['a', 5])
+    assert patch_queue.popleft()[1] == []
+
+    with storage.transaction():
+        storage.set(['a', 2], 5)
+        storage.remove('b/~')
+
+    assert patch_queue.popleft() == (
+        {'a': [3, None, 5]},
+        [{'op': 'add', 'path': '/a/1', 'value': None},
+         {'op': 'add', 'path': '/a/2', 'value': 5},
+         {'op': 'remove', 'path': '/b~1~0'}])
+
+    assert not patch_queue
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_storage_patch_cb_random(seed):
+    rng = random.Random(seed)
+    storage = json.Storage({'a': [1, {'b': [2, 3]}, None], 'b': {'c': 4}})
+    patch_queue = collections.deque()
+
+    for i in range(50):
+        old_data = storage.data
+
+        with storage.transaction():
+            if i == 25:
+                storage.set('c', 1)
+                storage.register_patch_cb(
+                    lambda data, ops: patch_queue.append((data, ops)))
+
+            for _ in range(rng.randint(1, 3)):
+                path = _random_path(rng)
+                if rng.random() < 0.5:
+                    storage.set(path, rng.choice([None, 1, [], {}]))
+                else:
+                    storage.remove(path)
+
+        if i < 25:
+            continue
+
+        data, ops = patch_queue.popleft()
+        assert data is storage.data
+        assert json.equals(json.patch(old_data, ops), data)
+        assert not patch_queue
+
+
+def test_storage_reentrant_change():
+    storage = json.Storage({'a': []})
+    data_queue = collections.deque()
+    patch_queue = collections.deque()
+
+    def on_change(data):
+        data_queue.append(data)
+        if data == {'a': ['x']}:
+            storage.set(['a', 1], 'y')
+
+    storage.register_change_cb(on_change)
+    storage.register_change_cb(data_queue.append, ['a', 1])
+    storage.register_patch_cb(lambda data, ops: patch_queue.append((data,
+                                                                    ops)))
+
+    storage.set(['a', 0], 'x')
+    assert storage.data == {'a': ['x', 'y']}
+
+    assert list(data_queue) == [{'a': ['x']},
+                                {'a': ['x', 'y']},
+                                'y']
+    assert list(patch_queue) == [
+        ({'a': ['x']}, [{'op': 'add', 'path': '/a/0', 'value': 'x'}]),
+        ({'a': ['x', 'y']}, [{'op': 'add', 'path': '/a/1', 'value': 'y'}])]
+
+    data = {'a': []}
+    for _, ops in patch_queue:
+        data = json.patch(data, ops)
+    assert data == storage.data
+
+
+def test_storage_history():
+    data_queue = collections.deque()
+    storage = json.Storage({'a': 1}, history_size=3)
+    storage.register_change_cb(data_queue.append)
+    assert storage.version == 0
+    assert storage.versions == [0]
+    assert storage.history_memory_usage == 0
+
+    storage.set('a', 2)
+    storage.set('b', 3)
+    with storage.transaction():
+        storage.set('c', 4)
+        storage.remove('a')
+
+    assert storage.version == 3
+    assert storage.versions == [0, 1, 2, 3]
+    assert storage.at(0) == {'a': 1}
+    assert storage.at(1) == {'a': 2}
+    assert storage.at(2) == {'a': 2, 'b': 3}
+    assert storage.at(3) == {'b': 3, 'c': 4}
+    assert storage.history_memory_usage > 0
+
+    storage.set('d', 5)
+    assert storage.versions == [1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        storage.at(0)
+
+    data_queue.clear()
+    storage.undo()
+    assert storage.version == 3
+    assert storage.data == {'b': 3, 'c': 4}
+    assert data_queue.popleft() == {'b': 3, 'c': 4}
+
+    storage.undo()
+    storage.undo()
+    assert storage.data == {'a': 2}
+    assert storage.versions == [1]
+
+    with pytest.raises(ValueError):
+        storage.undo()
+
+    storage.set('a', 6)
+    assert storage.versions == [1, 5]
+    assert storage.at(5) == {'a': 6}
+    with pytest.raises(ValueError):
+        storage.at(2)
+
+    with storage.transaction():
+        with pytest.raises(ValueError):
+            storage.undo()
+
+
+def test_storage_history_memory():
+    data = {f'key{i}': [str(i) * 100] for i in range(100)}
+    storage = json.Storage(data, history_size=1000, history_memory=100_000)
+
+    for i in range(100):
+        storage.set(f'key{i}', None)
+
+        versions = storage.versions
+        history = [storage.at(version) for version in versions[:-1]]
+        retained_size = (json.stats([storage.data, history]).size -
+                         json.stats([storage.data, []]).size)
+
+        assert storage.history_memory_usage <= 100_000
+        assert retained_size <= storage.history_memory_usage * 1.1
+
+    assert len(storage.versions) < 100
+    assert storage.history_memory_usage > 0
+
+
+def test_storage_index():
+    storage = json.Storage({'devices': [{'id': 'a', 'x': 1},
+                                        {'id': 'b', 'x': 2},
+                                        {'id': 1, 'x': 3},
+                                        {'x': 4}]})
+
+    with pytest.raises(ValueError):
+        storage.index_get('devices', 'id', 'a')
+
+    storage.add_index('devices', 'id')
+    storage.add_index('devices', 'id')
+
+    assert storage.index_get('devices', 'id', 'a') == ({'id': 'a', 'x': 1},
+                                                       ['devices', 0])
+    assert storage.index_get('devices', 'id', 1) == ({'id': 1, 'x': 3},
+                                                     ['devices', 2])
+    assert storage.index_get('devices', 'id', True) is None
+    assert storage.index_get('devices', 'id', None) is None
+    assert storage.index_get('devices', 'id', 'c') is None
+
+    storage.set(['devices', 4], {'id': 'c'})
+    assert storage.index_get('devices', 'id', 'c') == ({'id': 'c'},
+                                                       ['devices', 4])
+
+    storage.set(['devices', 1, 'id'], 'a')
+    assert storage.index_get('devices', 'id', 'b') is None
+    assert storage.index_get('devices', 'id', 'a') == ({'id': 'a', 'x': 1},
+                                                       ['devices', 0])
+
+    storage.remove(['devices', 0])
+    assert storage.index_get('devices', 'id', 'a') == ({'id': 'a', 'x': 2},
+                                                       ['devices', 0])
+    assert storage.index_get('devices', 'id', 'c') == ({'id': 'c'},
+                                                       ['devices', 3])
+
+    with storage.transaction():
+        storage.set(['devices', 0, 'id'], 'd')
+        assert storage.index_get('devices', 'id', 'd') is None
+
+    assert storage.index_get('devices', 'id', 'd') == ({'id': 'd', 'x': 2},
+                                                       ['devices', 0])
+
+    storage.set('devices', {'e': {'id': 'e'}})
+    assert storage.index_get('devices', 'id', 'd') is None
+    assert storage.index_get('devices', 'id', 'e') == ({'id': 'e'},
+                                                       ['devices', 'e'])
+
+    storage.remove_index('devices', 'id')
+    with pytest.raises(ValueError):
+        storage.index_get('devices', 'id', 'e')
+
+
+def test_storage_index_array_shift():
+    storage = json.Storage({'devices': [{'id': 'a'}, {'id': 'b'},
+                                        {'id': 'c'}]})
+    storage.add_index('devices', 'id')
+
+    with storage.transaction():
+        storage.remove(['devices', 0])
+        storage.set(['devices', 2], {'id': 'd'})
+
+    assert storage.index_get('devices', 'id', 'a') is None
+    assert storage.index_get('devices', 'id', 'b') == ({'id': 'b'},
+                                                       ['devices', 0])
+    assert storage.index_get('devices', 'id', 'c') == ({'id': 'c'},
+                                                       ['devices', 1])
+    assert storage.index_get('devices', 'id', 'd') == ({'id': 'd'},
+                                                       ['devices', 2])
+
+
+def test_storage_index_array_padding():
+    storage = json.Storage({'values': [1]})
+    storage.add_index('values', [])
+
+    assert storage.index_get('values', [], None) is None
+
+    storage.set(['values', 3], 2)
+    assert storage.index_get('values', [], None) == (None, ['values', 1])
+    assert storage.index_get('values', [], 2) == (2, ['values', 3])
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("history_size", [0, 5])
+def test_storage_index_random(seed, history_size):
+    rng = random.Random(seed)
+    storage = json.Storage({'a': [{'b': 1}, {'b': 2}, {'c': 1}]},
+                           history_size=history_size)
+
+    indexes = [(['a'], 'b'), (['a'], ['b', 0]), ([], 'b'), (['a', 1], []),
+               (['b'], [])]
+    missing = object()
+    for path, key in indexes:
+        storage.add_index(path, key)
+
+    def random_path():
+        return [rng.choice(['a', 'b', 'c', 0, 1, 2, 3, -1])
+                for _ in range(rng.randint(0, 3))]
+
+    for _ in range(100):
+        if history_size and rng.random() < 0.1 and len(storage.versions) > 1:
+            storage.undo()
+
+        else:
+            with storage.transaction():
+                for _ in range(rng.randint(1, 3)):
+                    path = random_path()
+                    if rng.random() < 0.7:
+                        value = rng.choice([None, 1, 2, True, 'b', [1],
+                                            {'b': 1}, {'b': 2}, [{'b': 1}]])
+                        storage.set(path, value)
+                    else:
+                        storage.remove(path)
+
+        for path, key in indexes:
+            container = json.get(storage.data, path)
+            if isinstance(container, dict):
+                children = list(container.items())
+            elif isinstance(container, list):
+                children = list(enumerate(container))
+            else:
+                children = []
+
+            for value in [None, 1, 2, True, 'b']:
+                matches = sorted(
+                    (segment, child) for segment, child in children
+                    if json.get(child, key, missing) is not missing and
+                    json.equals(json.get(child, key), value))
+                expected = ((matches[0][1], [*json.flatten(path),
+                                             matches[0][0]])
+                            if matches else None)
+                assert storage.index_get(path, key, value) == expected
+
+
+@pytest.fixture
+def switch_interval():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    try:
+        yield
+
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def _run_threads(count, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i, ))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+
+
+def test_storage_threads_set(switch_interval):
+    storage = json.Storage({})
+    data_queue = collections.deque()
+    patch_queue = collections.deque()
+    storage.register_change_cb(data_queue.append)
+    storage.register_patch_cb(lambda _, ops: patch_queue.append(ops))
+
+    def target(i):
+        for j in range(1000):
+            storage.set([f'thread{i}', 'value'], j)
+
+    _run_threads(8, target)
+
+    assert storage.data == {f'thread{i}': {'value': 999} for i in range(8)}
+    assert storage.version == 8000
+    assert len(data_queue) == 8000
+    assert data_queue[-1] is storage.data
+
+    data = {}
+    for ops in patch_queue:
+        data = json.patch(data, ops)
+    assert data == storage.data
+
+
+def test_storage_threads_transaction(switch_interval):
+    storage = json.Storage({'a': 0, 'b': 0})
+    finished_writers = collections.deque()
+
+    def target(i):
+        if i % 2:
+            while len(finished_writers) < 4:
+                data = storage.data
+                assert data['a'] == data['b']
+            return
+
+        try:
+            for _ in range(1000):
+                with storage.transaction():
+                    value = storage.get('a')
+                    storage.set('a', value + 1)
+                    storage.set('b', value + 1)
+
+        finally:
+            finished_writers.append(i)
+
+    _run_threads(8, target)
+
+    assert storage.data == {'a': 4000, 'b': 4000}
+
+
+def test_storage_threads_callback_order(switch_interval):
+    storage = json.Storage(0)
+    versions = []
+
+    def on_change(data):
+        versions.append((storage.version, data))
+
+    storage.register_change_cb(on_change)
+
+    def target(i):
+        for _ in range(1000):
+            with storage.transaction():
+                storage.set([], storage.get([]) + 1)
+
+    _run_threads(8, target)
+
+    assert versions == [(i, i) for i in range(1, 8001)]
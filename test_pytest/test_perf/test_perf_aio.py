@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from hat.json.aio import AsyncStorage
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+@pytest.mark.parametrize('coalesce', [False, True])
+async def test_burst(duration, count, coalesce):
+    storage = AsyncStorage({'a': 0})
+    subscription = storage.subscribe('a', queue_size=100, coalesce=coalesce)
+    received = 0
+
+    async def consume():
+        nonlocal received
+        async for _ in subscription:
+            received += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(consume())
+
+    with duration(f'burst - count: {count}; coalesce: {coalesce}'):
+        for i in range(count):
+            await storage.set('a', i)
+        subscription.close()
+        await task
+
+    assert received <= count
@@ -0,0 +1,160 @@
+import pytest
+
+from hat import json
+
+
+pytestmark = pytest.mark.perf
+
+
+def recursive_equals(a, b):
+    if a is None:
+        return b is None
+
+    if isinstance(a, bool):
+        return isinstance(b, bool) and a == b
+
+    if isinstance(a, (int, float)):
+        return (isinstance(b, (int, float)) and
+                not isinstance(b, bool) and
+                a == b)
+
+    if isinstance(a, str):
+        return isinstance(b, str) and a == b
+
+    if isinstance(a, list):
+        return (isinstance(b, list) and
+                len(a) == len(b) and
+                all(recursive_equals(i, j) for i, j in zip(a, b)))
+
+    if isinstance(a, dict):
+        return (isinstance(b, dict) and
+                len(a) == len(b) and
+                all(recursive_equals(a[key], b[key]) for key in a.keys()))
+
+    raise TypeError('invalid json type')
+
+
+def recursive_clone(data):
+    if isinstance(data, list):
+        return [recursive_clone(i) for i in data]
+
+    if isinstance(data, dict):
+        return {k: recursive_clone(v) for k, v in data.items()}
+
+    return data
+
+
+def recursive_flatten(data):
+    if isinstance(data, list):
+        for i in data:
+            yield from recursive_flatten(i)
+
+    else:
+        yield data
+
+
+def create_data(count):
+    return {f'device_{i}': {'id': i,
+                            'name': f'device {i}',
+                            'enabled': bool(i % 2),
+                            'value': i / 3,
+                            'tags': ['a', 'b', None],
+                            'params': {'x': [i, i + 1, [i + 2]]}}
+            for i in range(count)}
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000])
+@pytest.mark.parametrize('impl', ['recursive', 'iterative'])
+def test_equals(duration, count, impl):
+    equals = recursive_equals if impl == 'recursive' else json.equals
+    a = create_data(count)
+    b = create_data(count)
+
+    with duration(f'{impl} equals - count: {count}'):
+        assert equals(a, b)
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000])
+@pytest.mark.parametrize('impl', ['recursive', 'iterative'])
+def test_equals_shared(duration, count, impl):
+    equals = recursive_equals if impl == 'recursive' else json.equals
+    a = create_data(count)
+    b = json.set_(a, ['device_0', 'id'], 0)
+
+    with duration(f'{impl} equals shared - count: {count}'):
+        assert equals(a, b)
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000])
+@pytest.mark.parametrize('impl', ['recursive', 'iterative'])
+def test_clone(duration, count, impl):
+    clone = recursive_clone if impl == 'recursive' else json.clone
+    data = create_data(count)
+
+    with duration(f'{impl} clone - count: {count}'):
+        clone(data)
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+@pytest.mark.parametrize('impl', ['recursive', 'iterative'])
+def test_flatten(duration, count, impl):
+    flatten = recursive_flatten if impl == 'recursive' else json.flatten
+    data = [[i, [i, [i]]] for i in range(count)]
+
+    with duration(f'{impl} flatten - count: {count}'):
+        for _ in flatten(data):
+            pass
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000])
+@pytest.mark.parametrize('cached', [False, True])
+def test_fingerprint(duration, count, cached):
+    data = create_data(count)
+    cache = {} if cached else None
+
+    json.fingerprint(data, cache)
+    data = json.set_(data, ['device_0', 'id'], 1)
+
+    with duration(f'fingerprint - count: {count}; cached: {cached}'):
+        json.fingerprint(data, cache)
+
+
+@pytest.mark.parametrize('doc_count', [10, 100])
+def test_intern(duration, doc_count):
+    docs = [json.decode(json.encode(create_data(100)))
+            for _ in range(doc_count)]
+    interner = json.Interner()
+
+    with duration(f'intern - doc count: {doc_count}'):
+        for doc in docs:
+            interner.intern(doc)
+
+    assert interner.saved_size > 0
+
+
+@pytest.mark.parametrize('count', [10_000, 100_000])
+@pytest.mark.parametrize('columnar', [False, True])
+def test_table_encode(duration, count, columnar):
+    data = [{'id': i, 'value': i / 3, 'name': f'row {i}', 'valid': True}
+            for i in range(count)]
+    if columnar:
+        data = json.Table(data)
+
+    with duration(f'encode - count: {count}; columnar: {columnar}'):
+        json.encode(data)
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000])
+@pytest.mark.parametrize('lazy', [False, True])
+def test_clone_modify(duration, count, lazy):
+    data = create_data(count)
+
+    with duration(f'clone and modify - count: {count}; lazy: {lazy}'):
+        if lazy:
+            result = json.cow_clone(data)
+            result['device_0']['params']['x'].append(1)
+            result = json.materialize(result)
+
+        else:
+            result = json.clone(data)
+            result['device_0']['params']['x'].append(1)
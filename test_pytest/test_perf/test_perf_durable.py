@@ -0,0 +1,50 @@
+import pytest
+
+from hat import json
+from hat.json.durable import DurableStorage
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+@pytest.mark.parametrize('sync', [False, True])
+def test_append(duration, tmp_path, count, sync):
+    data = {f'key{i}': {'value': i, 'text': 'abc' * 10}
+            for i in range(count)}
+    storage = DurableStorage(tmp_path / 'storage', default=data, sync=sync)
+
+    with duration(f'append - count: {count}; sync: {sync}'):
+        for i in range(100):
+            storage.set([f'key{i}', 'value'], -i)
+
+    storage.close()
+
+    snapshot_path = tmp_path / 'snapshot.json'
+
+    with duration(f'encode_file - count: {count}; sync: {sync}'):
+        for i in range(100):
+            data = json.set_(data, [f'key{i}', 'value'], -i)
+            json.encode_file(data, snapshot_path)
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_recover(duration, tmp_path, count):
+    storage = DurableStorage(tmp_path, default={},
+                             compact_size=1024 * 1024 * 1024)
+
+    for i in range(count):
+        storage.set(f'key{i % 1000}', i)
+
+    storage.close()
+
+    with duration(f'recover log - count: {count}'):
+        storage = DurableStorage(tmp_path)
+
+    storage.compact()
+    storage.close()
+
+    with duration(f'recover snapshot - count: {count}'):
+        storage = DurableStorage(tmp_path)
+
+    storage.close()
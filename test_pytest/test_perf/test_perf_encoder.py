@@ -0,0 +1,165 @@
+import tracemalloc
+
+import pytest
+
+from hat import json
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_iter_items(duration, tmp_path, count):
+    path = tmp_path / 'data.json'
+    data = {'header': {'count': count},
+            'items': [{'id': i, 'name': f'item{i}', 'values': [i, i / 2]}
+                      for i in range(count)]}
+    json.encode_file(data, path, indent=None)
+    del data
+
+    tracemalloc.start()
+
+    with duration(f'decode_file - count: {count}'):
+        json.decode_file(path)
+
+    decode_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+
+    with duration(f'iter_items - count: {count}'):
+        with open(path, 'rb') as f:
+            for _ in json.iter_items(f, 'items'):
+                pass
+
+    iter_items_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if count >= 100_000:
+        assert iter_items_peak < decode_peak / 10
+
+
+@pytest.mark.parametrize('count', [1_000, 300_000])
+def test_decode_file(duration, tmp_path, count):
+    path = tmp_path / 'data.json'
+    json.encode_file({'items': [{'id': i, 'name': f'item{i}',
+                                 'values': [i, i / 2]}
+                                for i in range(count)]},
+                     path, indent=None)
+
+    with duration(f'decode_stream text - count: {count}'):
+        with open(path, 'r', encoding='utf-8') as f:
+            json.decode_stream(f)
+
+    with duration(f'decode_file mmap - count: {count}'):
+        json.decode_file(path)
+
+    with duration(f'decode_bytes - count: {count}'):
+        json.decode_bytes(path.read_bytes())
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_encode_bytes(duration, count):
+    data = {'items': [{'id': i, 'name': f'item{i}', 'values': [i, i / 2]}
+                      for i in range(count)]}
+
+    with duration(f'encode - count: {count}'):
+        json.encode(data)
+
+    with duration(f'encode_bytes - count: {count}'):
+        json.encode_bytes(data)
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_jsonl(duration, tmp_path, count):
+    path = tmp_path / 'data.jsonl'
+    data = [{'id': i, 'name': f'item{i}', 'values': [i, i / 2]}
+            for i in range(count)]
+
+    with duration(f'encode_file json - count: {count}'):
+        json.encode_file(data, path.with_suffix('.json'), indent=None)
+
+    with duration(f'encode_iter - count: {count}'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.encode_iter(iter(data), f)
+
+    with duration(f'decode_file json - count: {count}'):
+        json.decode_file(path.with_suffix('.json'))
+
+    with duration(f'decode_iter - count: {count}'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for _ in json.decode_iter(f):
+                pass
+
+
+@pytest.mark.parametrize('max_workers', [1, 2, 4, 8])
+def test_decode_iter_parallel(duration, tmp_path, max_workers):
+    path = tmp_path / 'data.jsonl'
+    count = 200_000
+    json.encode_file([{'id': i, 'name': f'item{i}',
+                       'values': [i, i / 2, {'a': 'b' * (i % 20)}]}
+                      for i in range(count)],
+                     path)
+
+    if max_workers == 1:
+        with duration(f'decode_iter - count: {count}'):
+            with open(path, 'r', encoding='utf-8') as f:
+                for _ in json.decode_iter(f):
+                    pass
+
+    for ordered in [True, False]:
+        with duration(f'decode_iter_parallel - count: {count}; '
+                      f'workers: {max_workers}; ordered: {ordered}'):
+            for _ in json.decode_iter_parallel(path, max_workers,
+                                               chunk_size=1024 * 1024,
+                                               ordered=ordered):
+                pass
+
+
+@pytest.mark.parametrize('backend_cls', [json.PyJsonBackend,
+                                         json.RsJsonBackend])
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_json_backend(duration, backend_cls, count):
+    backend = backend_cls()
+    name = backend_cls.__name__
+    data = [{'id': i, 'name': f'item{i}', 'values': [i, i / 2],
+             'flags': {'b': i % 2 == 0, 'a': 'x' * (i % 10)}}
+            for i in range(count)]
+    data_with_null = [{'id': i, 'value': None} for i in range(count)]
+
+    for indent in [None, 2, 4]:
+        with duration(f'{name} encode - count: {count}; indent: {indent}'):
+            encoded = backend.encode(data, indent)
+
+        with duration(f'{name} decode - count: {count}; indent: {indent}'):
+            backend.decode(encoded)
+
+    with duration(f'{name} encode sort_keys - count: {count}'):
+        backend.encode(data, sort_keys=True)
+
+    with duration(f'{name} encode null - count: {count}'):
+        backend.encode(data_with_null)
+
+    encoded_bytes = backend.encode(data).encode('utf-8')
+    with duration(f'{name} decode bytes - count: {count}'):
+        backend.decode(encoded_bytes)
+
+    table = json.Table({'id': i, 'value': i / 3, 'name': f'row {i}'}
+                       for i in range(count))
+    with duration(f'{name} encode table - count: {count}'):
+        backend.encode(table)
+
+
+@pytest.mark.parametrize('count', [10_000, 100_000])
+def test_encode_table_default_backend(duration, count):
+    name = json.DefaultJsonBackend.__name__
+    rows = [{'id': i, 'value': i / 3, 'name': f'row {i}', 'valid': True}
+            for i in range(count)]
+    table = json.Table(rows)
+
+    with duration(f'{name} encode rows - count: {count}'):
+        json.encode(rows)
+
+    with duration(f'{name} encode table - count: {count}'):
+        json.encode(table)
+
+    with duration(f'{name} encode table to_array - count: {count}'):
+        json.encode(table.to_array())
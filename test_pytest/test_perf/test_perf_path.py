@@ -0,0 +1,186 @@
+import collections
+import threading
+
+import pytest
+
+from hat import json
+from hat.json.persistent import to_persistent
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('depth', [1, 5, 20])
+def test_get(duration, depth):
+    path = [f'key{i}' for i in range(depth)]
+    data = json.set_(None, path, 123)
+    compiled = json.compile_path(path)
+
+    with duration(f'get - depth: {depth}; compiled: False'):
+        for _ in range(100_000):
+            json.get(data, path)
+
+    with duration(f'get - depth: {depth}; compiled: True'):
+        for _ in range(100_000):
+            compiled.get(data)
+
+    with duration(f'get - depth: {depth}; uncached'):
+        for _ in range(100_000):
+            json.CompiledPath(path).get(data)
+
+
+@pytest.mark.parametrize('count', [100, 1_000, 10_000])
+def test_set_many(duration, count):
+    data = {'a': {'b': list(range(count))}}
+    items = [(['a', 'b', i], -i) for i in range(count)]
+
+    with duration(f'set_ - count: {count}'):
+        result = data
+        for path, value in items:
+            result = json.set_(result, path, value)
+
+    with duration(f'set_many - count: {count}'):
+        json.set_many(data, items)
+
+
+@pytest.mark.parametrize('count', [0, 10, 1_000, 100_000])
+def test_storage_path_change_cb(duration, count):
+    # same data (100 000 values in 1000 groups) is used for all subscriber
+    # counts - copying of changed groups has constant cost
+    paths = [[f'group{i % 1000}', f'key{i // 1000}', 'value']
+             for i in range(100_000)]
+    storage = json.Storage(json.set_many(None, ((path, i) for i, path
+                                                in enumerate(paths))))
+    for path in paths[:count]:
+        storage.register_change_cb(lambda _: None, path)
+
+    with duration(f'storage set - subscribers: {count}'):
+        for i in range(1000):
+            storage.set(['group0', 'key0', 'value'], i)
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+def test_storage_patch(duration, count):
+    data = {f'key{i}': {'value': i} for i in range(count)}
+
+    storage = json.Storage(data)
+    storage.register_patch_cb(lambda _, ops: None)
+
+    with duration(f'storage patch cb - count: {count}'):
+        for i in range(10):
+            storage.set(['key0', 'value'], i)
+
+    storage = json.Storage(data)
+    old_data = data
+
+    def on_change(new_data):
+        nonlocal old_data
+        json.diff(old_data, new_data)
+        old_data = new_data
+
+    storage.register_change_cb(on_change)
+
+    with duration(f'storage diff - count: {count}'):
+        for i in range(10):
+            storage.set(['key0', 'value'], i)
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+@pytest.mark.parametrize('history_size', [0, 100])
+def test_storage_history(duration, count, history_size):
+    data = to_persistent({'items': [{'value': i} for i in range(count)]})
+    storage = json.Storage(data, history_size=history_size)
+
+    with duration(f'storage set - count: {count}; '
+                  f'history size: {history_size}'):
+        for i in range(100):
+            storage.set(['items', i, 'value'], -i)
+
+    assert storage.history_memory_usage <= 1000 * history_size
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+def test_clone_history(duration, count):
+    data = {'items': [{'value': i} for i in range(count)]}
+    history = collections.deque(maxlen=100)
+
+    with duration(f'clone history - count: {count}'):
+        for i in range(100):
+            history.append(json.clone(data))
+            data = json.set_(data, ['items', i, 'value'], -i)
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+def test_storage_index(duration, count):
+    data = to_persistent({'devices': [{'id': f'id{i}', 'value': i}
+                                      for i in range(count)]})
+    storage = json.Storage(data)
+
+    with duration(f'storage linear search - count: {count}'):
+        for i in range(100):
+            device_id = f'id{count - i - 1}'
+            next(device for device in storage.get('devices')
+                 if device['id'] == device_id)
+
+    with duration(f'storage add index - count: {count}'):
+        storage.add_index('devices', 'id')
+
+    with duration(f'storage index get - count: {count}'):
+        for i in range(100):
+            storage.index_get('devices', 'id', f'id{count - i - 1}')
+
+    with duration(f'storage set with index - count: {count}'):
+        for i in range(100):
+            storage.set(['devices', i, 'id'], f'new{i}')
+
+    assert storage.index_get('devices', 'id', 'new0') is not None
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+def test_storage_select(duration, count):
+    storage = json.Storage({'items': [{'value': i} for i in range(count)],
+                            'counter': 0})
+
+    def fn(items):
+        return sum(i['value'] for i in items)
+
+    selector = json.create_selector(['items'], fn)
+
+    with duration(f'storage select - count: {count}; memoized: False'):
+        for i in range(100):
+            storage.set('counter', i)
+            fn(storage.get('items'))
+
+    with duration(f'storage select - count: {count}; memoized: True'):
+        for i in range(100):
+            storage.set('counter', i)
+            storage.select(selector)
+
+    assert selector.misses == 1
+
+
+def _run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize('thread_count', [1, 2, 4, 8])
+def test_storage_threads(duration, thread_count):
+    storage = json.Storage({f'key{i}': {'value': i} for i in range(100)})
+
+    def read():
+        for i in range(100_000):
+            storage.get([f'key{i % 100}', 'value'])
+
+    def write():
+        for i in range(10_000):
+            storage.set([f'key{i % 100}', 'value'], -i)
+
+    with duration(f'storage get - threads: {thread_count}'):
+        _run_threads(thread_count, read)
+
+    with duration(f'storage set - threads: {thread_count}'):
+        _run_threads(thread_count, write)
@@ -0,0 +1,49 @@
+import pytest
+
+from hat import json
+from hat.json.persistent import to_persistent
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000, 100_000])
+@pytest.mark.parametrize('persistent', [False, True])
+def test_storage_set_object(duration, count, persistent):
+    data = {f'key{i}': i for i in range(count)}
+    if persistent:
+        data = to_persistent(data)
+
+    storage = json.Storage(data)
+
+    with duration(f'storage set object - count: {count}; '
+                  f'persistent: {persistent}'):
+        for i in range(1000):
+            storage.set(f'key{i}', -i)
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000, 100_000])
+@pytest.mark.parametrize('persistent', [False, True])
+def test_storage_set_array(duration, count, persistent):
+    data = {'a': list(range(count))}
+    if persistent:
+        data = to_persistent(data)
+
+    storage = json.Storage(data)
+
+    with duration(f'storage set array - count: {count}; '
+                  f'persistent: {persistent}'):
+        for i in range(1000):
+            storage.set(['a', i], -i)
+
+
+@pytest.mark.parametrize('count', [1_000, 10_000, 100_000])
+@pytest.mark.parametrize('persistent', [False, True])
+def test_get(duration, count, persistent):
+    data = {f'key{i}': [i] for i in range(count)}
+    if persistent:
+        data = to_persistent(data)
+
+    with duration(f'get - count: {count}; persistent: {persistent}'):
+        for i in range(1000):
+            json.get(data, [f'key{i}', 0])
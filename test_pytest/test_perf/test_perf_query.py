@@ -0,0 +1,25 @@
+import pytest
+
+from hat import json
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [1_000, 100_000])
+def test_query(duration, count):
+    data = {'items': [{'id': i, 'value': {'x': i % 10}}
+                      for i in range(count)]}
+    query = json.compile_query([json.QuerySelector.RECURSIVE, 'x'])
+    first_query = json.compile_query(['items', lambda x: x['id'] == 9])
+
+    with duration(f'recursive values - count: {count}'):
+        for _ in query.values(data):
+            pass
+
+    with duration(f'recursive paths - count: {count}'):
+        for _ in query.paths(data):
+            pass
+
+    with duration(f'first - count: {count}'):
+        first_query.first(data)
@@ -0,0 +1,26 @@
+import pytest
+
+from hat import json
+from hat.json import replication
+
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.mark.parametrize('count', [100, 10_000])
+async def test_replication(duration, count):
+    storage = json.Storage({f'key{i}': {'value': i} for i in range(count)})
+    server = await replication.listen(storage, ('127.0.0.1', 0))
+
+    with duration(f'connect - count: {count}'):
+        replica = await replication.connect(server.address)
+
+    with duration(f'replicate 1000 changes - count: {count}'):
+        for i in range(1000):
+            storage.set([f'key{i % count}', 'value'], -i)
+        await replica.wait_sequence(1000)
+
+    assert replica.data == storage.data
+
+    server.close()
+    await server.wait_closed()
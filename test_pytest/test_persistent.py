@@ -0,0 +1,268 @@
+import collections
+import random
+
+import pytest
+
+from hat import json
+from hat.json.persistent import (PersistentArray,
+                                 PersistentObject,
+                                 to_persistent,
+                                 from_persistent)
+
+
+class CollidingKey(str):
+
+    def __hash__(self):
+        return 42
+
+
+def test_object_example():
+    x = PersistentObject({'a': 1})
+    y = x.set('b', 2)
+    assert dict(x) == {'a': 1}
+    assert dict(y) == {'a': 1, 'b': 2}
+
+
+def test_array_example():
+    x = PersistentArray([1, 2])
+    y = x.append(3)
+    assert list(x) == [1, 2]
+    assert list(y) == [1, 2, 3]
+
+
+@pytest.mark.parametrize('count', [0, 1, 31, 32, 33, 1000, 5000])
+def test_object(count):
+    rnd = random.Random(count)
+    keys = [f'key{i}' for i in range(count)]
+    rnd.shuffle(keys)
+
+    expected = {}
+    obj = PersistentObject()
+    versions = []
+
+    for i, key in enumerate(keys):
+        expected[key] = i
+        obj = obj.set(key, i)
+        if i % 97 == 0:
+            versions.append((obj, dict(expected)))
+
+    assert len(obj) == count
+    assert dict(obj) == expected
+    assert obj == expected
+    assert 'xyz' not in obj
+    assert obj.get('xyz', 123) == 123
+
+    for key in keys[:count // 2]:
+        del expected[key]
+        obj = obj.remove(key)
+        assert key not in obj
+
+    assert len(obj) == len(expected)
+    assert dict(obj) == expected
+    assert dict(obj.items()) == expected
+
+    for version, version_expected in versions:
+        assert dict(version) == version_expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_object_order(seed):
+    rnd = random.Random(seed)
+    expected = {}
+    obj = PersistentObject()
+
+    for _ in range(2000):
+        key = f'key{rnd.randrange(100)}'
+        if rnd.random() < 0.4:
+            expected.pop(key, None)
+            obj = obj.remove(key)
+
+        else:
+            value = rnd.randrange(10)
+            expected[key] = value
+            obj = obj.set(key, value)
+
+        assert len(obj) == len(expected)
+
+    assert list(obj) == list(expected)
+    assert list(obj.items()) == list(expected.items())
+    assert len(obj._leaves) <= 2 * max(len(obj), 32) + 1
+
+
+def test_object_conversion_order():
+    data = {'z': 1, 'a': {'y': 2, 'b': 3}, 'm': [{'x': 4, 'c': 5}]}
+    result = from_persistent(to_persistent(data))
+    assert list(result) == ['z', 'a', 'm']
+    assert list(result['a']) == ['y', 'b']
+    assert list(result['m'][0]) == ['x', 'c']
+    assert json.encode(to_persistent(data)) == json.encode(data)
+
+    obj = PersistentObject([('b', 1), ('a', 2), ('b', 3)])
+    assert list(obj.items()) == [('b', 3), ('a', 2)]
+
+
+def test_object_set_remove_same():
+    obj = PersistentObject({'a': 1})
+    assert obj.set('a', 1) is obj
+    assert obj.remove('b') is obj
+
+    with pytest.raises(KeyError):
+        obj['b']
+
+
+def test_object_collisions():
+    keys = [CollidingKey(f'key{i}') for i in range(5)]
+    obj = PersistentObject((key, i) for i, key in enumerate(keys))
+    obj = obj.set('other', 5)
+
+    assert len(obj) == 6
+    assert {str(k): v for k, v in obj.items()} == {
+        **{str(key): i for i, key in enumerate(keys)},
+        'other': 5}
+
+    obj = obj.set(keys[0], 10)
+    assert obj[keys[0]] == 10
+    assert len(obj) == 6
+
+    for key in keys:
+        obj = obj.remove(key)
+
+    assert {str(k): v for k, v in obj.items()} == {'other': 5}
+
+
+@pytest.mark.parametrize('count', [0, 1, 31, 32, 33, 64, 1024, 1056, 40000])
+def test_array(count):
+    expected = []
+    arr = PersistentArray()
+    versions = []
+
+    for i in range(count):
+        expected.append(i)
+        arr = arr.append(i)
+        if i % 97 == 0:
+            versions.append((arr, list(expected)))
+
+    assert len(arr) == count
+    assert list(arr) == expected
+    assert arr == expected
+    assert list(PersistentArray(expected)) == expected
+
+    for i in range(0, count, 7):
+        expected[i] = -i
+        arr = arr.set(i, -i)
+        assert arr[i] == -i
+        assert arr[i - count] == -i
+
+    assert list(arr) == expected
+
+    while expected:
+        expected.pop()
+        arr = arr.remove()
+        assert len(arr) == len(expected)
+        if len(expected) % 997 == 0:
+            assert list(arr) == expected
+
+    for version, version_expected in versions:
+        assert list(version) == version_expected
+
+
+def test_array_index():
+    arr = PersistentArray(range(100))
+    assert arr[-1] == 99
+    assert list(arr[10:20]) == list(range(10, 20))
+    assert list(arr[::-10]) == list(range(99, -1, -10))
+    assert list(arr.remove(50)) == [i for i in range(100) if i != 50]
+    assert list(arr.set(100, 100)) == list(range(101))
+
+    with pytest.raises(IndexError):
+        arr[100]
+
+    with pytest.raises(IndexError):
+        arr.set(101, 1)
+
+    with pytest.raises(IndexError):
+        arr.remove(-101)
+
+
+def test_conversion():
+    data = {'a': [1, {'b': [2, 3]}, []], 'c': {}, 'd': 'abc'}
+
+    result = to_persistent(data)
+    assert isinstance(result, PersistentObject)
+    assert isinstance(result['a'], PersistentArray)
+    assert isinstance(result['a'][1], PersistentObject)
+    assert json.equals(result, data)
+
+    result = from_persistent(result)
+    assert isinstance(result, dict)
+    assert isinstance(result['a'], list)
+    assert isinstance(result['a'][1], dict)
+    assert json.equals(result, data)
+
+    assert to_persistent(123) == 123
+    assert from_persistent('abc') == 'abc'
+
+
+@pytest.mark.parametrize("data, path, value", [
+    ({'a': [1, 2], 'b': 3}, ['a', 1], 4),
+    ({'a': [1, 2], 'b': 3}, ['a', 5], 4),
+    ({'a': [1, 2], 'b': 3}, ['a', -5], 4),
+    ({'a': [1, 2], 'b': 3}, ['c', 'd'], 4),
+    ({'a': [1, 2], 'b': 3}, ['b', 'c'], 4),
+    ([1, 2, 3], [], 4),
+])
+def test_path(data, path, value):
+    persistent = to_persistent(data)
+
+    assert json.equals(json.get(persistent, path), json.get(data, path))
+
+    result = json.set_(persistent, path, value)
+    assert json.equals(result, json.set_(data, path, value))
+    assert json.equals(persistent, data)
+
+    result = json.remove(persistent, path)
+    assert json.equals(result, json.remove(data, path))
+    assert json.equals(persistent, data)
+
+
+def test_structural_sharing():
+    data = to_persistent({'a': {'b': [1, 2]}, 'c': list(range(1000))})
+
+    result = json.set_(data, ['a', 'b', 0], 3)
+    assert isinstance(result, PersistentObject)
+    assert isinstance(result['a']['b'], PersistentArray)
+    assert result['c'] is data['c']
+
+    result = json.remove(data, ['c', 999])
+    assert isinstance(result['c'], PersistentArray)
+    assert result['a'] is data['a']
+    assert list(result['c']) == list(range(999))
+
+
+@pytest.mark.parametrize('format', list(json.Format))
+def test_encode(format):
+    data = {'a': [1, {'b': [2, 3]}, []], 'c': {}, 'd': 'abc'}
+    if format == json.Format.JSONL:
+        data = [data]
+    persistent = to_persistent(data)
+
+    encoded = json.encode(persistent, format)
+    assert json.equals(json.decode(encoded, format), data)
+
+    assert (json.encode(persistent, sort_keys=True) ==
+            json.encode(data, sort_keys=True))
+
+
+def test_storage():
+    data_queue = collections.deque()
+    storage = json.Storage(to_persistent({'a': [1, 2]}))
+    storage.register_change_cb(data_queue.append)
+
+    storage.set(['a', 0], 3)
+    storage.remove(['a', 1])
+    storage.set('b', {'c': 4})
+
+    assert json.equals(storage.data, {'a': [3], 'b': {'c': 4}})
+    assert isinstance(storage.data, PersistentObject)
+    assert isinstance(storage.get('a'), PersistentArray)
+    assert len(data_queue) == 3
@@ -0,0 +1,119 @@
+import pytest
+
+from hat import json
+from hat.json.persistent import to_persistent
+
+
+data = {'a': [{'b': 1}, {'b': 2}, {'c': 3}],
+        'b': {'c': [4, 5, 6]}}
+
+
+@pytest.mark.parametrize("query, items", [
+    ([],
+     [([], data)]),
+
+    ('a',
+     [(['a'], data['a'])]),
+
+    (['a', -1, 'c'],
+     [(['a', 2, 'c'], 3)]),
+
+    (['a', 5],
+     []),
+
+    (['x', 0],
+     []),
+
+    (['a', json.QuerySelector.WILDCARD, 'b'],
+     [(['a', 0, 'b'], 1),
+      (['a', 1, 'b'], 2)]),
+
+    ([json.QuerySelector.WILDCARD, json.QuerySelector.WILDCARD],
+     [(['a', 0], {'b': 1}),
+      (['a', 1], {'b': 2}),
+      (['a', 2], {'c': 3}),
+      (['b', 'c'], [4, 5, 6])]),
+
+    ([json.QuerySelector.RECURSIVE, 'c'],
+     [(['a', 2, 'c'], 3),
+      (['b', 'c'], [4, 5, 6])]),
+
+    (['b', json.QuerySelector.RECURSIVE],
+     [(['b'], {'c': [4, 5, 6]}),
+      (['b', 'c'], [4, 5, 6]),
+      (['b', 'c', 0], 4),
+      (['b', 'c', 1], 5),
+      (['b', 'c', 2], 6)]),
+
+    (['b', 'c', slice(None, None, -2)],
+     [(['b', 'c', 2], 6),
+      (['b', 'c', 0], 4)]),
+
+    (['a', slice(1, None), json.QuerySelector.WILDCARD],
+     [(['a', 1, 'b'], 2),
+      (['a', 2, 'c'], 3)]),
+
+    ([json.QuerySelector.RECURSIVE,
+      lambda x: isinstance(x, dict) and 'b' in x],
+     [(['a', 0], {'b': 1}),
+      (['a', 1], {'b': 2})]),
+
+    ([[json.QuerySelector.RECURSIVE], [[lambda x: x == 5]]],
+     [(['b', 'c', 1], 5)]),
+])
+def test_query(query, items):
+    compiled = json.compile_query(query)
+
+    assert list(compiled.items(data)) == items
+    assert list(compiled.values(data)) == [value for _, value in items]
+    assert list(compiled.paths(data)) == [path for path, _ in items]
+    assert compiled.first(data, 123) == (items[0][1] if items else 123)
+
+    for path, value in compiled.items(data):
+        assert json.get(data, path) is value
+
+
+@pytest.mark.parametrize("query", [
+    None,
+    True,
+    1.5,
+    ['a', {}],
+])
+def test_invalid(query):
+    with pytest.raises(ValueError):
+        json.compile_query(query)
+
+
+def test_lazy():
+    visited = []
+
+    def predicate(x):
+        visited.append(x)
+        return x > 2
+
+    data = list(range(100))
+    query = json.compile_query([json.QuerySelector.RECURSIVE, predicate])
+
+    assert query.first(data) == 3
+    assert visited == [0, 1, 2, 3]
+
+
+def test_deep_recursive():
+    data = []
+    for _ in range(10_000):
+        data = [data]
+
+    query = json.compile_query([json.QuerySelector.RECURSIVE, []])
+    assert len(list(query.values(data))) == 10_001
+
+
+@pytest.mark.parametrize("data", [
+    to_persistent({'a': [1, {'b': 2}], 'c': 'xyz'}),
+    json.cow_clone({'a': [1, {'b': 2}], 'c': {'d': 3}}),
+    json.Table([{'a': 1}, {'a': 2}]),
+])
+def test_containers(data):
+    query = json.compile_query([json.QuerySelector.RECURSIVE])
+
+    for path, value in query.items(data):
+        assert json.equals(json.get(data, path), value)
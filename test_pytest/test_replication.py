@@ -0,0 +1,183 @@
+import asyncio
+import threading
+
+import pytest
+
+from hat import json
+from hat.json import replication
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def address(request, tmp_path):
+    if request.param == 'tcp':
+        return '127.0.0.1', 0
+
+    return tmp_path / 'replication.sock'
+
+
+async def test_replication(address):
+    storage = json.Storage({'a': 1})
+    server = await replication.listen(storage, address)
+    assert server.sequence == 0
+    assert server.client_count == 0
+
+    replica = await replication.connect(server.address)
+    assert replica.data == {'a': 1}
+    assert replica.get('a') == 1
+    assert replica.sequence == 0
+    assert server.client_count == 1
+
+    changes = []
+    replica.register_change_cb(changes.append, 'b')
+
+    storage.set('a', 2)
+    storage.set(['b', 1], 3)
+    with storage.transaction():
+        storage.set('c', [1, 2])
+        storage.remove(['b', 0])
+
+    await replica.wait_sequence(3)
+    assert server.sequence == 3
+    assert replica.sequence == 3
+    assert replica.data == storage.data == {'a': 2, 'b': [3], 'c': [1, 2]}
+    assert changes == [[None, 3], [3]]
+
+    replica.close()
+    await replica.wait_closed()
+    assert replica.is_closed
+
+    storage.set('a', 3)
+    assert replica.data == {'a': 2, 'b': [3], 'c': [1, 2]}
+
+    server.close()
+    await server.wait_closed()
+    assert server.client_count == 0
+
+
+async def test_late_replica(address):
+    storage = json.Storage({'a': 1})
+    server = await replication.listen(storage, address)
+    storage.set('a', 2)
+
+    replica1 = await replication.connect(server.address)
+    storage.set('b', 3)
+    replica2 = await replication.connect(server.address)
+    storage.set('c', 4)
+
+    await replica1.wait_sequence(3)
+    await replica2.wait_sequence(3)
+    assert replica1.data == replica2.data == storage.data
+
+    server.close()
+    await server.wait_closed()
+    await replica1.wait_closed()
+    await replica2.wait_closed()
+
+    with pytest.raises(ConnectionError):
+        await replica1.wait_sequence(4)
+
+
+async def test_reentrant_change(address):
+    storage = json.Storage({'a': []})
+    server = await replication.listen(storage, address)
+
+    def on_change(data):
+        if data == {'a': ['x']}:
+            storage.set(['a', 1], 'y')
+
+    storage.register_change_cb(on_change)
+    storage.set(['a', 0], 'x')
+    assert storage.data == {'a': ['x', 'y']}
+    assert server.sequence == 2
+
+    replica1 = await replication.connect(server.address)
+    assert replica1.data == storage.data
+
+    storage.set(['a', 0], 'z')
+    replica2 = await replication.connect(server.address)
+
+    await replica1.wait_sequence(3)
+    await replica2.wait_sequence(3)
+    assert replica1.data == replica2.data == storage.data
+
+    server.close()
+    await server.wait_closed()
+
+
+async def test_queue_overflow(address):
+    storage = json.Storage({'a': []})
+    server = await replication.listen(storage, address, queue_size=3)
+    replica = await replication.connect(server.address)
+
+    sequences = []
+    replica.register_change_cb(lambda _: sequences.append(replica.sequence))
+
+    for i in range(100):
+        storage.set(['a', i], i)
+
+    await replica.wait_sequence(100)
+    assert replica.data == storage.data
+    assert len(sequences) < 100
+
+    server.close()
+    await server.wait_closed()
+
+
+async def test_threads(address):
+    storage = json.Storage({})
+    server = await replication.listen(storage, address)
+    replica = await replication.connect(server.address)
+
+    def target(i):
+        for j in range(100):
+            storage.set([f'thread{i}', j], j)
+
+    threads = [threading.Thread(target=target, args=(i, ))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        await asyncio.to_thread(thread.join)
+
+    await replica.wait_sequence(400)
+    assert replica.data == storage.data
+
+    server.close()
+    await server.wait_closed()
+
+
+async def test_resync_on_gap(tmp_path):
+    address = tmp_path / 'replication.sock'
+    received = asyncio.Queue()
+
+    async def on_connection(reader, writer):
+        for msg in [{'type': 'snapshot', 'sequence': 1, 'data': 1},
+                    {'type': 'patch', 'sequence': 3, 'ops': []}]:
+            writer.write(replication._encode_msg(msg))
+
+        received.put_nowait(await replication._receive_msg(reader))
+
+        for msg in [{'type': 'patch', 'sequence': 4, 'ops': []},
+                    {'type': 'snapshot', 'sequence': 5, 'data': 2},
+                    {'type': 'patch',
+                     'sequence': 6,
+                     'ops': [{'op': 'replace', 'path': '', 'value': 3}]}]:
+            writer.write(replication._encode_msg(msg))
+
+        await reader.read()
+        writer.close()
+
+    srv = await asyncio.start_unix_server(on_connection, address)
+    replica = await replication.connect(address)
+    assert replica.data == 1
+
+    assert await received.get() == {'type': 'resync'}
+
+    await replica.wait_sequence(6)
+    assert replica.data == 3
+
+    replica.close()
+    await replica.wait_closed()
+
+    srv.close()
+    await srv.wait_closed()